@@ -0,0 +1,4 @@
+"""
+Benchmarks of the plotting entry points on synthetic tracks. Run the scripts
+as modules from the repository root, e.g. ``python -m benchmarks.bench_track``.
+"""
@@ -0,0 +1,66 @@
+'''
+Compare the single-pass pandas reader against the astropy ASCII reader for
+plotms txt exports of increasing size.
+
+Usage::
+
+    python -m benchmarks.bench_read_casa_txt --nrows 100000 1000000 10000000
+'''
+
+import os
+import time
+import argparse
+import tempfile
+
+from qaplotter.utils.read_data import read_casa_txt_fast, read_casa_txt_astropy
+
+from .synthetic import write_plotms_txt
+
+
+def time_reader(func, filename, nrepeat=1):
+
+    best = float('inf')
+
+    for _ in range(nrepeat):
+        t0 = time.perf_counter()
+        tab, _ = func(filename)
+        best = min(best, time.perf_counter() - t0)
+
+    return best, len(tab)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--nrows', type=int, nargs='+',
+                        default=[100000, 1000000, 10000000])
+    parser.add_argument('--nrepeat', type=int, default=1)
+    parser.add_argument('--skip-astropy-above', type=int, default=None,
+                        help='Skip the (slow) astropy reader above this many rows.')
+    args = parser.parse_args()
+
+    print(f"{'nrows':>10} {'size (MB)':>10} {'astropy (s)':>12} {'fast (s)':>10} {'speedup':>8}")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+
+        for nrows in args.nrows:
+
+            filename = os.path.join(tmpdir, f"field_bench_amp_time.scan_{nrows}.txt")
+            write_plotms_txt(filename, nrows, scan=1)
+
+            size_mb = os.path.getsize(filename) / 1024**2
+
+            fast_time, _ = time_reader(read_casa_txt_fast, filename, args.nrepeat)
+
+            if args.skip_astropy_above is not None and nrows > args.skip_astropy_above:
+                print(f"{nrows:>10} {size_mb:>10.1f} {'--':>12} {fast_time:>10.3f} {'--':>8}")
+            else:
+                astropy_time, _ = time_reader(read_casa_txt_astropy, filename, args.nrepeat)
+                print(f"{nrows:>10} {size_mb:>10.1f} {astropy_time:>12.3f} {fast_time:>10.3f} "
+                      f"{astropy_time / fast_time:>7.1f}x")
+
+            os.remove(filename)
+
+
+if __name__ == "__main__":
+    main()
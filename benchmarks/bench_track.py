@@ -0,0 +1,178 @@
+'''
+Time the plotting entry points on synthetic tracks of increasing size and
+compare against a stored baseline.
+
+Usage::
+
+    # Record a baseline on this machine
+    python -m benchmarks.bench_track --scales small medium --save-baseline baseline.json
+
+    # Later, fail (exit code 1) if any timing is more than 25% slower
+    python -m benchmarks.bench_track --scales small medium --baseline baseline.json
+
+Run from the repository root. The table cache is disabled so the txt files are
+parsed on every run. Baselines are only comparable on the same machine.
+benchmarks/baseline.json holds the timings of the default scales on the
+development machine as a reference; record a new one before comparing on
+another machine.
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import warnings
+from contextlib import redirect_stdout
+
+from qaplotter import make_field_plots, make_all_cal_plots, make_all_quicklook_plots
+
+from .synthetic import make_synthetic_track
+
+
+# Keyword arguments for `make_synthetic_track` at each scale.
+scales = {'small': dict(ntargets=2, ncalibrators=1, nscans=2, nspw=4, nant=10,
+                        nrows=4000, ncal_rows=500, npix=32),
+          'medium': dict(ntargets=6, ncalibrators=2, nscans=4, nspw=8, nant=27,
+                         nrows=40000, ncal_rows=2000, npix=64),
+          'large': dict(ntargets=20, ncalibrators=3, nscans=8, nspw=16, nant=27,
+                        nrows=400000, ncal_rows=10000, npix=128)}
+
+
+def entry_points(msname):
+    '''
+    Name -> (function, kwargs) for the timed entry points. Paths are relative to
+    the products folder.
+    '''
+
+    return {'make_field_plots': (make_field_plots,
+                                 dict(msname=msname, folder="scan_plots_txt",
+                                      output_folder="scan_plots_QAplots",
+                                      use_cache=False)),
+            'make_all_cal_plots': (make_all_cal_plots,
+                                   dict(flagging_sheet_link=None,
+                                        folder="final_caltable_txt",
+                                        output_folder="final_caltable_QAplots",
+                                        use_cache=False)),
+            'make_all_quicklook_plots': (make_all_quicklook_plots,
+                                         dict(flagging_sheet_link=None,
+                                              folder="quicklook_imaging",
+                                              output_folder="quicklook_imaging_figures"))}
+
+
+def time_entry_point(func, kwargs, nrepeat=1):
+    '''
+    Best wall time of `nrepeat` calls with the printed output and warnings hidden.
+    '''
+
+    best = float('inf')
+
+    for _ in range(nrepeat):
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), \
+                warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+
+            t0 = time.perf_counter()
+            func(**kwargs)
+            best = min(best, time.perf_counter() - t0)
+
+    return best
+
+
+def run_benchmarks(scale_names, nrepeat=1):
+    '''
+    Return scale -> entry point -> best wall time in seconds.
+    '''
+
+    timings = {}
+
+    cwd = os.getcwd()
+
+    for scale in scale_names:
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+
+            t0 = time.perf_counter()
+            msname = make_synthetic_track(tmpdir, **scales[scale])
+            print(f"Generated the {scale} track in {time.perf_counter() - t0:.1f} s")
+
+            # The entry points expect to run from within the products folder.
+            os.chdir(tmpdir)
+
+            try:
+                timings[scale] = {}
+
+                for name, (func, kwargs) in entry_points(msname).items():
+                    timings[scale][name] = time_entry_point(func, kwargs, nrepeat=nrepeat)
+
+                    print(f"  {name:>26}: {timings[scale][name]:8.2f} s")
+
+            finally:
+                os.chdir(cwd)
+
+    return timings
+
+
+def compare_to_baseline(timings, baseline, tolerance=0.25):
+    '''
+    Return a list of the (scale, entry point, time, baseline time) that are more
+    than `tolerance` slower than the baseline.
+    '''
+
+    regressions = []
+
+    for scale, scale_timings in timings.items():
+        for name, wall_time in scale_timings.items():
+
+            base_time = baseline.get(scale, {}).get(name)
+
+            if base_time is None:
+                continue
+
+            if wall_time > base_time * (1 + tolerance):
+                regressions.append((scale, name, wall_time, base_time))
+
+    return regressions
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'],
+                        choices=list(scales.keys()))
+    parser.add_argument('--nrepeat', type=int, default=1)
+    parser.add_argument('--baseline', default=None,
+                        help='JSON file with baseline timings to compare to.')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed fractional slow down relative to the baseline.')
+    parser.add_argument('--save-baseline', default=None,
+                        help='Save the timings to this JSON file.')
+    args = parser.parse_args()
+
+    timings = run_benchmarks(args.scales, nrepeat=args.nrepeat)
+
+    if args.save_baseline is not None:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(timings, f, indent=1)
+
+        print(f"Saved the timings to {args.save_baseline}")
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+        regressions = compare_to_baseline(timings, baseline, tolerance=args.tolerance)
+
+        for scale, name, wall_time, base_time in regressions:
+            print(f"REGRESSION {scale} {name}: {wall_time:.2f} s vs. {base_time:.2f} s baseline")
+
+        if len(regressions) > 0:
+            sys.exit(1)
+
+        print(f"No regressions above {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
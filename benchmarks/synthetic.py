@@ -0,0 +1,236 @@
+'''
+Generators for synthetic CASA plotms txt exports used by the benchmarks.
+
+The files follow the layout expected by `qaplotter.utils.read_casa_txt`:
+"# name: value" meta-data lines, a "# From plot 0" line, then the column
+name and unit lines followed by the whitespace-separated data.
+
+`make_synthetic_track` writes a full products folder with per-field and
+caltable txt exports, continuum quicklook images and the weblog source table,
+named as the pipeline does.
+'''
+
+import os
+
+import numpy as np
+import pandas as pd
+from astropy.io import fits
+
+from qaplotter.utils.file_index import field_tab_types
+from qaplotter.parse_weblog import source_table_filename
+
+
+colnames = ['x', 'y', 'chan', 'scan', 'field', 'ant1', 'ant2', 'ant1name',
+            'ant2name', 'time', 'freq', 'spw', 'corr', 'obs']
+
+colunits = ['None', 'Jy', 'None', 'None', 'None', 'None', 'None', 'None',
+            'None', 'MJD(seconds)', 'GHz', 'None', 'None', 'None']
+
+
+def make_plotms_dataframe(nrows, nspw=8, nant=27, nscan=10, scan=None,
+                          corrs=['RR', 'LL'], seed=0, spw=None, ant=None):
+    '''
+    Random visibility summary rows with the plotms column names. `scan`, `spw`
+    and `ant` (antenna 1) fix those columns to a single value.
+    '''
+
+    rng = np.random.default_rng(seed)
+
+    if spw is None:
+        spw = rng.integers(0, nspw, nrows)
+    else:
+        spw = np.full(nrows, spw)
+
+    if ant is None:
+        ant1 = rng.integers(0, nant - 1, nrows)
+    else:
+        ant1 = np.full(nrows, ant)
+
+    ant2 = ant1 + 1 + rng.integers(0, nant - 1 - ant1)
+
+    if scan is None:
+        scans = rng.integers(1, nscan + 1, nrows)
+    else:
+        scans = np.full(nrows, scan)
+
+    time = 5.1e9 + 30. * scans + rng.random(nrows) * 30.
+
+    data = {'x': np.round(rng.random(nrows) * 1000., 4),
+            'y': np.round(rng.random(nrows), 6),
+            'chan': rng.integers(0, 64, nrows),
+            'scan': scans,
+            'field': np.zeros(nrows, dtype=int),
+            'ant1': ant1,
+            'ant2': ant2,
+            'ant1name': np.char.add('ea', np.char.zfill(ant1.astype(str), 2)),
+            'ant2name': np.char.add('ea', np.char.zfill(ant2.astype(str), 2)),
+            'time': np.round(time, 3),
+            'freq': np.round(1.0 + 0.128 * spw + 0.002 * rng.random(nrows), 6),
+            'spw': spw,
+            'corr': np.array(corrs)[rng.integers(0, len(corrs), nrows)],
+            'obs': np.zeros(nrows, dtype=int)}
+
+    return pd.DataFrame(data, columns=colnames)
+
+
+def write_plotms_txt(filename, nrows, field='3C286', vis='synthetic.ms',
+                     chan_avg=1, **kwargs):
+    '''
+    Write a synthetic plotms txt export with `nrows` data rows.
+    '''
+
+    df = make_plotms_dataframe(nrows, **kwargs)
+
+    with open(filename, 'w') as f:
+        f.write(f"# vis: {vis}\n")
+        f.write(f"# field: {field}\n")
+        f.write(f"# channel average: {chan_avg}\n")
+        f.write("# time average: 1e+06\n")
+        f.write("# From plot 0\n")
+        f.write(f"# {' '.join(colnames)}\n")
+        f.write(f"# {' '.join(colunits)}\n")
+
+        df.to_csv(f, sep=' ', header=False, index=False)
+
+    return filename
+
+
+# Caltable name patterns written by `write_caltable_txts`. The bandpass tables
+# are per SPW, the others per antenna.
+bandpass_patterns = ['finalBPcal_freq_amp', 'finalBPcal_freq_phase']
+
+gain_patterns = ['finalphasegaincal_time_phase', 'finalampgaincal_time_amp',
+                 'finalampgaincal_freq_amp', 'finaldelay_freq_delay',
+                 'phaseshortgaincal_time_phase', 'finalBPinitialgain_time_phase']
+
+# The table types exported for targets. Calibrators have all `field_tab_types`.
+target_tab_types = ["amp_chan", "amp_time", "amp_uvdist"]
+
+
+def write_field_txts(folder, targets, calibrators, nscans=4, nspw=8, nant=27,
+                     nrows=10000, vis='synthetic.ms'):
+    '''
+    Write the per-scan txt exports for each target and calibrator field, named
+    "field_{field}_{tab_type}.scan_{scan}.txt". `nrows` is the number of rows per
+    field and table type, split over the scans.
+    '''
+
+    os.makedirs(folder, exist_ok=True)
+
+    nrows_scan = max(nrows // nscans, 1)
+
+    seed = 0
+
+    for field in list(targets) + list(calibrators):
+        tab_types = target_tab_types if field in targets else field_tab_types
+
+        for tab_type in tab_types:
+            for scan in range(1, nscans + 1):
+                write_plotms_txt(f"{folder}/field_{field}_{tab_type}.scan_{scan}.txt",
+                                 nrows_scan, field=field, vis=vis, nspw=nspw,
+                                 nant=nant, scan=scan, seed=seed)
+                seed += 1
+
+
+def write_caltable_txts(folder, nspw=8, nant=27, nrows=2000, vis='synthetic.ms'):
+    '''
+    Write the bandpass txt exports per SPW and the gain and delay exports per
+    antenna, named "{vis}.{pattern}_spw{spw}.txt" and "{vis}.{pattern}_ant{ant}.txt".
+    '''
+
+    os.makedirs(folder, exist_ok=True)
+
+    seed = 0
+
+    for pattern in bandpass_patterns:
+        for spw in range(nspw):
+            write_plotms_txt(f"{folder}/{vis}.{pattern}_spw{spw}.txt", nrows,
+                             vis=vis, nspw=nspw, nant=nant, spw=spw, seed=seed)
+            seed += 1
+
+    for pattern in gain_patterns:
+        for ant in range(nant - 1):
+            write_plotms_txt(f"{folder}/{vis}.{pattern}_ant{ant}.txt", nrows,
+                             vis=vis, nspw=nspw, nant=nant, ant=ant, seed=seed)
+            seed += 1
+
+
+def write_quicklook_fits(folder, targets, nspw=8, npix=64, vis='synthetic.ms',
+                         seed=0):
+    '''
+    Write a noise-only continuum image per target and SPW, named
+    "quicklook-{target}-spw{spw}-continuum-{vis}.image.fits".
+    '''
+
+    os.makedirs(folder, exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+
+    for target in targets:
+        for spw in range(nspw):
+            data = rng.normal(0., 1e-4, (1, 1, npix, npix)).astype(np.float32)
+
+            header = fits.Header()
+            header['CTYPE1'], header['CUNIT1'] = 'RA---SIN', 'deg'
+            header['CRVAL1'], header['CDELT1'], header['CRPIX1'] = 10., -1e-4, npix // 2
+            header['CTYPE2'], header['CUNIT2'] = 'DEC--SIN', 'deg'
+            header['CRVAL2'], header['CDELT2'], header['CRPIX2'] = 41., 1e-4, npix // 2
+            header['CTYPE3'], header['CUNIT3'] = 'FREQ', 'Hz'
+            header['CRVAL3'], header['CDELT3'], header['CRPIX3'] = 1e9 + 1.28e8 * spw, 1e6, 1
+            header['CTYPE4'] = 'STOKES'
+            header['CRVAL4'], header['CDELT4'], header['CRPIX4'] = 1, 1, 1
+            header['BUNIT'] = 'Jy/beam'
+            header['BMAJ'], header['BMIN'], header['BPA'] = 5e-4, 4e-4, 0.
+
+            fits.writeto(f"{folder}/quicklook-{target}-spw{spw}-continuum-{vis}.image.fits",
+                         data, header, overwrite=True)
+
+
+def write_weblog_source_table(folder, vis, targets, calibrators):
+    '''
+    Write the weblog page with the source names and intents read by
+    `get_field_intents`.
+    '''
+
+    filename = os.path.join(folder, source_table_filename(vis))
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    rows = [(field, "OBSERVE_TARGET") for field in targets]
+    rows += [(field, "CALIBRATE_BANDPASS,CALIBRATE_PHASE") for field in calibrators]
+
+    # The weblog table has two header rows.
+    header = "<tr><th>Source Name</th><th>Intent</th></tr>"
+
+    with open(filename, 'w') as f:
+        f.write(f"<html><body><table><thead>{header}{header}</thead><tbody>\n")
+
+        for field, intent in rows:
+            f.write(f"<tr><td>{field}</td><td>{intent}</td></tr>\n")
+
+        f.write("</tbody></table></body></html>\n")
+
+
+def make_synthetic_track(folder, ntargets=2, ncalibrators=1, nscans=4, nspw=8, nant=27,
+                         nrows=10000, ncal_rows=2000, npix=64,
+                         vis='20A-346.sb1.eb2.59000.1234.ms'):
+    '''
+    Write a products folder with "scan_plots_txt", "final_caltable_txt",
+    "quicklook_imaging" and the weblog source table. Returns the MS name.
+    '''
+
+    targets = [f"target{ii}" for ii in range(ntargets)]
+    calibrators = [f"J{ii:04d}+0000" for ii in range(ncalibrators)]
+
+    write_field_txts(os.path.join(folder, "scan_plots_txt"), targets, calibrators,
+                     nscans=nscans, nspw=nspw, nant=nant, nrows=nrows, vis=vis)
+
+    write_caltable_txts(os.path.join(folder, "final_caltable_txt"), nspw=nspw,
+                        nant=nant, nrows=ncal_rows, vis=vis)
+
+    write_quicklook_fits(os.path.join(folder, "quicklook_imaging"), targets,
+                         nspw=nspw, npix=npix, vis=vis)
+
+    write_weblog_source_table(folder, vis, targets, calibrators)
+
+    return vis
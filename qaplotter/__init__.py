@@ -3,7 +3,10 @@
 from .version import version as __version__
 
 from .track_set import (make_all_plots, make_field_plots, make_all_cal_plots,
-                        make_all_quicklook_plots)
+                        make_all_quicklook_plots, join_full_resolution)
+from .batch import make_batch_plots
+from .watch import watch_track
 
 __all__ = ['make_all_plots', 'make_field_plots', 'make_all_cal_plots',
-           'make_all_quicklook_plots']
+           'make_all_quicklook_plots', 'join_full_resolution', 'make_batch_plots',
+           'watch_track']
@@ -6,13 +6,17 @@ from plotly.subplots import make_subplots
 import numpy as np
 
 
-from .utils.time_conversion import make_casa_timestring, telescope_time_conversion
+from .utils.time_conversion import telescope_time_conversion
+from .utils.categorical import category_mask, decode_column
+from .utils.hover import scan_hover
+from .utils.trace_batch import TraceBatch
 
 
 def phase_gain_figures(table_dict, meta_dict,
                         nant_per_figure=8,
                         scatter_plot=go.Scattergl,
                         telescope='vla',
+                        validate=False,
                         ):
     '''
     Create an plot for each Antenna. Will create several figures based
@@ -33,8 +37,6 @@ def phase_gain_figures(table_dict, meta_dict,
     # There should be 1 field:
     # exp_keys = {'amp': {'x': 'freq', 'y': 'y'}}
 
-    hovertemplate = 'Scan: %{customdata[0]}<br>SPW: %{customdata[1]}<br>Chan: %{customdata[2]}<br>Freq: %{customdata[3]}<br>Corr: %{customdata[4]}<br>Ant1: %{customdata[5]}<br>Ant2: %{customdata[6]}<br>Time: %{customdata[7]}'
-
     for key in exp_keys:
         if key not in table_dict.keys():
             raise KeyError(f"Required dict key {key} not found.")
@@ -76,7 +78,8 @@ def phase_gain_figures(table_dict, meta_dict,
                 # Extract the first ant1name from the data (if it exists):
 
                 try:
-                    ant1_vals = table_dict[list(exp_keys.keys())[0]][ant_num]['ant1name']
+                    ant1_vals = decode_column(table_dict[list(exp_keys.keys())[0]][ant_num],
+                                              'ant1name')
                 except KeyError:
                     subplot_titles.append(f"Ant (Flagged)")
                     continue
@@ -95,6 +98,9 @@ def phase_gain_figures(table_dict, meta_dict,
                             subplot_titles=subplot_titles,
                             shared_xaxes=False, shared_yaxes=False)
 
+        # Add all of the traces at once at the end. See `TraceBatch`.
+        traces = TraceBatch(fig, scatter_plot=scatter_plot)
+
         # Loop through for each antenna
         for ii in range(this_nant_per_figure):
 
@@ -106,11 +112,11 @@ def phase_gain_figures(table_dict, meta_dict,
 
                 tab_data = table_dict[key][ant_num]
 
-                corrs = np.unique(tab_data['corr'].tolist())
+                corrs = np.unique(decode_column(tab_data, 'corr'))
 
                 for nc, (corr, marker) in enumerate(zip(corrs, markers)):
 
-                    corr_mask = (tab_data['corr'] == corr).tolist()
+                    corr_mask = category_mask(tab_data, 'corr', corr)
 
                     # Colour by SPW
                     spw_data = tab_data['spw'][corr_mask].tolist()
@@ -130,29 +136,23 @@ def phase_gain_figures(table_dict, meta_dict,
 
                         combined_mask = np.logical_and(np.array(corr_mask), np.array(spw_mask))
 
-                        custom_data = np.vstack((tab_data['scan'][combined_mask].tolist(),
-                                                tab_data['spw'][combined_mask].tolist(),
-                                                tab_data['chan'][combined_mask].tolist(),
-                                                tab_data['freq'][combined_mask].tolist(),
-                                                tab_data['corr'][combined_mask].tolist(),
-                                                tab_data['ant1name'][combined_mask].tolist(),
-                                                tab_data['ant2name'][combined_mask].tolist(),
-                                                make_casa_timestring(tab_data['time'][combined_mask].tolist(),
-                                                                     lambda x: telescope_time_conversion(x, telescope=telescope)))).T
-
-                        fig.append_trace(scatter_plot(x=telescope_time_conversion(tab_data['time'][combined_mask].tolist(),
-                                                                                  telescope=telescope),
-                                                    y=tab_data[exp_keys[key]['y']][combined_mask],
-                                                    mode='lines+markers',
-                                                    marker=dict(symbol=marker,
-                                                                size=8,
-                                                                color=spw_colors[kk]),
-                                                    customdata=custom_data,
-                                                    hovertemplate=hovertemplate,
-                                                    showlegend=False),
-                                        row=ii // ncols + 1,
-                                        col=ii % ncols + 1,
-                                        )
+                        # The x values are the times.
+                        custom_data, hovertemplate = scan_hover(tab_data, combined_mask, spw, corr,
+                                                                time_format='x',
+                                                                telescope=telescope)
+
+                        time_vals = tab_data['time'][combined_mask].tolist()
+
+                        traces.append(row=ii // ncols + 1, col=ii % ncols + 1,
+                                      x=telescope_time_conversion(time_vals, telescope=telescope),
+                                      y=tab_data[exp_keys[key]['y']][combined_mask],
+                                      mode='lines+markers',
+                                      marker=dict(symbol=marker,
+                                                  size=8,
+                                                  color=spw_colors[kk]),
+                                      customdata=custom_data,
+                                      hovertemplate=hovertemplate,
+                                      showlegend=False)
 
                         fig.update_xaxes(rangeslider_visible=False,
                                         tickformatstops=[dict(dtickrange=[None, 1000], value="%H:%M:%S"),
@@ -163,6 +163,8 @@ def phase_gain_figures(table_dict, meta_dict,
 
             ant_num += 1
 
+        fig = traces.figure(validate=validate)
+
         fig.update_xaxes(nticks=8)
         fig.update_yaxes(nticks=8)
 
@@ -207,6 +209,7 @@ def amp_gain_time_figures(table_dict, meta_dict,
                           nant_per_figure=8,
                           scatter_plot=go.Scattergl,
                           telescope='vla',
+                          validate=False,
                           ):
     '''
     Create a plot for each Antenna. Will create several figures based
@@ -222,8 +225,6 @@ def amp_gain_time_figures(table_dict, meta_dict,
     # There should be 1 field:
     # exp_keys = {'amp': {'x': 'freq', 'y': 'y'}}
 
-    hovertemplate = 'Scan: %{customdata[0]}<br>SPW: %{customdata[1]}<br>Chan: %{customdata[2]}<br>Freq: %{customdata[3]}<br>Corr: %{customdata[4]}<br>Ant1: %{customdata[5]}<br>Ant2: %{customdata[6]}<br>Time: %{customdata[7]}'
-
     for key in exp_keys:
         if key not in table_dict.keys():
             raise KeyError(f"Required dict key {key} not found.")
@@ -277,7 +278,8 @@ def amp_gain_time_figures(table_dict, meta_dict,
                 # Extract the first ant1name from the data (if it exists):
 
                 try:
-                    ant1_vals = table_dict[list(exp_keys.keys())[0]][ant_num]['ant1name']
+                    ant1_vals = decode_column(table_dict[list(exp_keys.keys())[0]][ant_num],
+                                              'ant1name')
                 except KeyError:
                     subplot_titles.append(f"Ant (Flagged)")
                     continue
@@ -296,6 +298,9 @@ def amp_gain_time_figures(table_dict, meta_dict,
                             subplot_titles=subplot_titles,
                             shared_xaxes=False, shared_yaxes=False)
 
+        # Add all of the traces at once at the end. See `TraceBatch`.
+        traces = TraceBatch(fig, scatter_plot=scatter_plot)
+
         # Loop through for each antenna
         for ii in range(this_nant_per_figure):
 
@@ -307,11 +312,11 @@ def amp_gain_time_figures(table_dict, meta_dict,
 
                 tab_data = table_dict[key][ant_num]
 
-                corrs = np.unique(tab_data['corr'].tolist())
+                corrs = np.unique(decode_column(tab_data, 'corr'))
 
                 for nc, (corr, marker) in enumerate(zip(corrs, markers)):
 
-                    corr_mask = (tab_data['corr'] == corr).tolist()
+                    corr_mask = category_mask(tab_data, 'corr', corr)
 
                     # Colour by Ant 1
                     spw_data = tab_data['spw'][corr_mask].tolist()
@@ -331,29 +336,23 @@ def amp_gain_time_figures(table_dict, meta_dict,
 
                         combined_mask = np.logical_and(np.array(corr_mask), np.array(spw_mask))
 
-                        custom_data = np.vstack((tab_data['scan'][combined_mask].tolist(),
-                                                tab_data['spw'][combined_mask].tolist(),
-                                                tab_data['chan'][combined_mask].tolist(),
-                                                tab_data['freq'][combined_mask].tolist(),
-                                                tab_data['corr'][combined_mask].tolist(),
-                                                tab_data['ant1name'][combined_mask].tolist(),
-                                                tab_data['ant2name'][combined_mask].tolist(),
-                                                make_casa_timestring(tab_data['time'][combined_mask].tolist(),
-                                                                     lambda x: telescope_time_conversion(x, telescope=telescope)))).T
-
-                        fig.append_trace(scatter_plot(x=telescope_time_conversion(tab_data['time'][combined_mask].tolist(),
-                                                                                  telescope=telescope),
-                                                    y=tab_data[exp_keys[key]['y']][combined_mask],
-                                                    mode='lines+markers',
-                                                    marker=dict(symbol=marker,
-                                                                size=8,
-                                                                color=spw_colors[kk]),
-                                                    customdata=custom_data,
-                                                    hovertemplate=hovertemplate,
-                                                    showlegend=False),
-                                        row=ii // ncols + 1,
-                                        col=ii % ncols + 1,
-                                        )
+                        # The x values are the times.
+                        custom_data, hovertemplate = scan_hover(tab_data, combined_mask, spw, corr,
+                                                                time_format='x',
+                                                                telescope=telescope)
+
+                        time_vals = tab_data['time'][combined_mask].tolist()
+
+                        traces.append(row=ii // ncols + 1, col=ii % ncols + 1,
+                                      x=telescope_time_conversion(time_vals, telescope=telescope),
+                                      y=tab_data[exp_keys[key]['y']][combined_mask],
+                                      mode='lines+markers',
+                                      marker=dict(symbol=marker,
+                                                  size=8,
+                                                  color=spw_colors[kk]),
+                                      customdata=custom_data,
+                                      hovertemplate=hovertemplate,
+                                      showlegend=False)
 
                         fig.update_xaxes(rangeslider_visible=False,
                                         tickformatstops=[dict(dtickrange=[None, 1000], value="%H:%M:%S"),
@@ -364,6 +363,8 @@ def amp_gain_time_figures(table_dict, meta_dict,
 
             ant_num += 1
 
+        fig = traces.figure(validate=validate)
+
         fig.update_xaxes(nticks=8)
         fig.update_yaxes(nticks=8)
 
@@ -406,6 +407,7 @@ def amp_gain_time_figures(table_dict, meta_dict,
 def delay_freq_figures(table_dict, meta_dict,
                        nant_per_figure=8,
                        scatter_plot=go.Scattergl,
+                       validate=False,
                        ):
     '''
     Create a plot for each Antenna. Will create several figures based
@@ -421,8 +423,6 @@ def delay_freq_figures(table_dict, meta_dict,
     # There should be 1 field:
     # exp_keys = {'amp': {'x': 'freq', 'y': 'y'}}
 
-    hovertemplate = 'Scan: %{customdata[0]}<br>SPW: %{customdata[1]}<br>Chan: %{customdata[2]}<br>Freq: %{customdata[3]}<br>Corr: %{customdata[4]}<br>Ant1: %{customdata[5]}<br>Ant2: %{customdata[6]}<br>Time: %{customdata[7]}'
-
     for key in exp_keys:
         if key not in table_dict.keys():
             raise KeyError(f"Required dict key {key} not found.")
@@ -480,7 +480,8 @@ def delay_freq_figures(table_dict, meta_dict,
                 # Extract the first ant1name from the data (if it exists):
 
                 try:
-                    ant1_vals = table_dict[list(exp_keys.keys())[0]][ant_num]['ant1name']
+                    ant1_vals = decode_column(table_dict[list(exp_keys.keys())[0]][ant_num],
+                                              'ant1name')
                 except KeyError:
                     subplot_titles.append(f"Ant (Flagged)")
                     continue
@@ -499,6 +500,9 @@ def delay_freq_figures(table_dict, meta_dict,
                             subplot_titles=subplot_titles,
                             shared_xaxes=False, shared_yaxes=False)
 
+        # Add all of the traces at once at the end. See `TraceBatch`.
+        traces = TraceBatch(fig, scatter_plot=scatter_plot)
+
         # Loop through for each antenna
         for ii in range(this_nant_per_figure):
 
@@ -510,11 +514,11 @@ def delay_freq_figures(table_dict, meta_dict,
 
                 tab_data = table_dict[key][ant_num]
 
-                corrs = np.unique(tab_data['corr'].tolist())
+                corrs = np.unique(decode_column(tab_data, 'corr'))
 
                 for nc, (corr, marker) in enumerate(zip(corrs, markers)):
 
-                    corr_mask = (tab_data['corr'] == corr).tolist()
+                    corr_mask = category_mask(tab_data, 'corr', corr)
 
                     # Colour by Ant 1
                     spw_data = tab_data['spw'][corr_mask].tolist()
@@ -534,30 +538,25 @@ def delay_freq_figures(table_dict, meta_dict,
 
                         combined_mask = np.logical_and(np.array(corr_mask), np.array(spw_mask))
 
-                        custom_data = np.vstack((tab_data['scan'][combined_mask].tolist(),
-                                                tab_data['spw'][combined_mask].tolist(),
-                                                tab_data['chan'][combined_mask].tolist(),
-                                                tab_data['freq'][combined_mask].tolist(),
-                                                tab_data['corr'][combined_mask].tolist(),
-                                                tab_data['ant1name'][combined_mask].tolist(),
-                                                tab_data['ant2name'][combined_mask].tolist(),
-                                                tab_data['time'][combined_mask].tolist())).T
-
-                        fig.append_trace(scatter_plot(x=tab_data['freq'][combined_mask],
-                                                    y=tab_data[exp_keys[key]['y']][combined_mask],
-                                                    mode='lines+markers',
-                                                    marker=dict(symbol=marker,
-                                                                size=8,
-                                                                color=spw_colors[kk]),
-                                                    customdata=custom_data,
-                                                    hovertemplate=hovertemplate,
-                                                    showlegend=False),
-                                        row=ii // ncols + 1,
-                                        col=ii % ncols + 1,
-                                        )
+                        # These figures show the time as the MJD seconds in the table.
+                        custom_data, hovertemplate = scan_hover(tab_data, combined_mask, spw, corr,
+                                                                time_format='mjd')
+
+                        traces.append(row=ii // ncols + 1, col=ii % ncols + 1,
+                                      x=tab_data['freq'][combined_mask],
+                                      y=tab_data[exp_keys[key]['y']][combined_mask],
+                                      mode='lines+markers',
+                                      marker=dict(symbol=marker,
+                                                  size=8,
+                                                  color=spw_colors[kk]),
+                                      customdata=custom_data,
+                                      hovertemplate=hovertemplate,
+                                      showlegend=False)
 
             ant_num += 1
 
+        fig = traces.figure(validate=validate)
+
         fig.update_xaxes(nticks=8)
         fig.update_yaxes(nticks=8)
 
@@ -600,6 +599,7 @@ def delay_freq_figures(table_dict, meta_dict,
 def amp_gain_freq_figures(table_dict, meta_dict,
                           nant_per_figure=8,
                           scatter_plot=go.Scattergl,
+                          validate=False,
                           ):
     '''
     Create a plot for each Antenna. Will create several figures based
@@ -615,8 +615,6 @@ def amp_gain_freq_figures(table_dict, meta_dict,
     # There should be 1 field:
     # exp_keys = {'amp': {'x': 'freq', 'y': 'y'}}
 
-    hovertemplate = 'Scan: %{customdata[0]}<br>SPW: %{customdata[1]}<br>Chan: %{customdata[2]}<br>Freq: %{customdata[3]}<br>Corr: %{customdata[4]}<br>Ant1: %{customdata[5]}<br>Ant2: %{customdata[6]}<br>Time: %{customdata[7]}'
-
     for key in exp_keys:
         if key not in table_dict.keys():
             raise KeyError(f"Required dict key {key} not found.")
@@ -670,7 +668,8 @@ def amp_gain_freq_figures(table_dict, meta_dict,
                 # Extract the first ant1name from the data (if it exists):
 
                 try:
-                    ant1_vals = table_dict[list(exp_keys.keys())[0]][ant_num]['ant1name']
+                    ant1_vals = decode_column(table_dict[list(exp_keys.keys())[0]][ant_num],
+                                              'ant1name')
                 except KeyError:
                     subplot_titles.append(f"Ant (Flagged)")
                     continue
@@ -689,6 +688,9 @@ def amp_gain_freq_figures(table_dict, meta_dict,
                             subplot_titles=subplot_titles,
                             shared_xaxes=False, shared_yaxes=False)
 
+        # Add all of the traces at once at the end. See `TraceBatch`.
+        traces = TraceBatch(fig, scatter_plot=scatter_plot)
+
         # Loop through for each antenna
         for ii in range(this_nant_per_figure):
 
@@ -700,11 +702,11 @@ def amp_gain_freq_figures(table_dict, meta_dict,
 
                 tab_data = table_dict[key][ant_num]
 
-                corrs = np.unique(tab_data['corr'].tolist())
+                corrs = np.unique(decode_column(tab_data, 'corr'))
 
                 for nc, (corr, marker) in enumerate(zip(corrs, markers)):
 
-                    corr_mask = (tab_data['corr'] == corr).tolist()
+                    corr_mask = category_mask(tab_data, 'corr', corr)
 
                     # Colour by Ant 1
                     spw_data = tab_data['spw'][corr_mask].tolist()
@@ -724,30 +726,25 @@ def amp_gain_freq_figures(table_dict, meta_dict,
 
                         combined_mask = np.logical_and(np.array(corr_mask), np.array(spw_mask))
 
-                        custom_data = np.vstack((tab_data['scan'][combined_mask].tolist(),
-                                                tab_data['spw'][combined_mask].tolist(),
-                                                tab_data['chan'][combined_mask].tolist(),
-                                                tab_data['freq'][combined_mask].tolist(),
-                                                tab_data['corr'][combined_mask].tolist(),
-                                                tab_data['ant1name'][combined_mask].tolist(),
-                                                tab_data['ant2name'][combined_mask].tolist(),
-                                                tab_data['time'][combined_mask].tolist())).T
-
-                        fig.append_trace(scatter_plot(x=tab_data['freq'][combined_mask],
-                                                    y=tab_data[exp_keys[key]['y']][combined_mask],
-                                                    mode='lines+markers',
-                                                    marker=dict(symbol=marker,
-                                                                size=8,
-                                                                color=spw_colors[kk]),
-                                                    customdata=custom_data,
-                                                    hovertemplate=hovertemplate,
-                                                    showlegend=False),
-                                        row=ii // ncols + 1,
-                                        col=ii % ncols + 1,
-                                        )
+                        # These figures show the time as the MJD seconds in the table.
+                        custom_data, hovertemplate = scan_hover(tab_data, combined_mask, spw, corr,
+                                                                time_format='mjd')
+
+                        traces.append(row=ii // ncols + 1, col=ii % ncols + 1,
+                                      x=tab_data['freq'][combined_mask],
+                                      y=tab_data[exp_keys[key]['y']][combined_mask],
+                                      mode='lines+markers',
+                                      marker=dict(symbol=marker,
+                                                  size=8,
+                                                  color=spw_colors[kk]),
+                                      customdata=custom_data,
+                                      hovertemplate=hovertemplate,
+                                      showlegend=False)
 
             ant_num += 1
 
+        fig = traces.figure(validate=validate)
+
         fig.update_xaxes(nticks=8)
         fig.update_yaxes(nticks=8)
 
@@ -0,0 +1,263 @@
+'''
+Run `make_all_plots` over many track products folders.
+
+The tracks are shared out to a pool of processes with one track per task. The
+result of each track (done or failed, wall time, stage times and the error) is
+saved to a JSON state file after each track finishes, so an interrupted batch
+skips the finished tracks when started again with the same state file.
+
+When a worker process dies (e.g. killed for running out of memory), the pool
+cannot tell which of its running tracks caused it. Those tracks are marked as
+interrupted and each is run again alone in a new single process pool. Only a
+track that also ends its worker when run alone is marked as failed.
+'''
+
+import os
+import json
+import time
+import traceback
+import warnings
+from glob import glob
+from contextlib import redirect_stdout, redirect_stderr
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from .track_set import make_all_plots, join_full_resolution
+
+
+def load_batch_state(state_filename):
+    '''
+    Return the saved state dict of track folder -> result, or an empty dict.
+    '''
+
+    if not os.path.exists(state_filename):
+        return {}
+
+    try:
+        with open(state_filename, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as exc:
+        warnings.warn(f"Unable to read batch state {state_filename}: {exc}. "
+                      "Starting a new batch.")
+        return {}
+
+
+def save_batch_state(state_filename, state):
+    '''
+    Write the state dict. A temporary file is written first so an interruption
+    never leaves a partial state file.
+    '''
+
+    tmp_filename = f"{state_filename}.tmp{os.getpid()}"
+
+    with open(tmp_filename, 'w') as f:
+        json.dump(state, f, indent=1)
+
+    os.replace(tmp_filename, state_filename)
+
+
+def run_track(track_folder, plot_kwargs, log_filename="qaplotter_batch.log"):
+    '''
+    Run `make_all_plots` in `track_folder` and return a result dict. Exceptions
+    are caught and returned in the result so one track cannot stop the batch.
+    The printed output and warnings go to `log_filename` in the track folder.
+    '''
+
+    result = {'status': 'failed', 'wall_time': None, 'stage_times': None,
+              'error': None}
+
+    t0 = time.perf_counter()
+
+    try:
+        os.chdir(track_folder)
+
+        with open(log_filename, 'w') as log:
+            with redirect_stdout(log), redirect_stderr(log):
+                try:
+                    stage_times = make_all_plots(**plot_kwargs)
+
+                    # Wait for a background full resolution pass so the track
+                    # is only done once all of its figures are.
+                    if isinstance(stage_times, tuple):
+                        stage_times, full_process = stage_times
+                        join_full_resolution(full_process)
+
+                    result['stage_times'] = stage_times
+                    result['status'] = 'done'
+                except Exception as exc:
+                    traceback.print_exc()
+                    result['error'] = f"{type(exc).__name__}: {exc}"
+
+    except Exception as exc:
+        result['error'] = f"{type(exc).__name__}: {exc}"
+
+    result['wall_time'] = time.perf_counter() - t0
+
+    return result
+
+
+def run_tracks_in_pool(track_folders, n_workers, on_result, **run_kwargs):
+    '''
+    Run `run_track` for each of `track_folders` in one pool of `n_workers`
+    processes. `on_result(track_folder, result)` is called as each track finishes.
+
+    Returns the tracks that were running when a worker process died and the
+    tracks that were not started. Both are empty when all of the tracks ran.
+    '''
+
+    # Next track to start is at the end.
+    tracks_to_submit = list(track_folders)[::-1]
+
+    pending = {}
+    interrupted = []
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+
+        def submit_next():
+            # Stop starting tracks once the pool is broken.
+            if len(tracks_to_submit) == 0 or len(interrupted) > 0:
+                return
+
+            track_folder = tracks_to_submit.pop()
+
+            try:
+                future = executor.submit(run_track, track_folder, **run_kwargs)
+            except BrokenProcessPool:
+                tracks_to_submit.append(track_folder)
+                return
+
+            pending[future] = track_folder
+
+        for _ in range(n_workers):
+            submit_next()
+
+        while len(pending) > 0:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                track_folder = pending.pop(future)
+
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    interrupted.append(track_folder)
+                    continue
+
+                on_result(track_folder, result)
+
+                submit_next()
+
+    return interrupted, tracks_to_submit[::-1]
+
+
+def make_batch_plots(track_folders, n_workers=4, state_filename="qaplotter_batch_state.json",
+                     retry_failed=False, log_filename="qaplotter_batch.log",
+                     **plot_kwargs):
+    '''
+    Make the QA plots for many tracks with a pool of processes.
+
+    Parameters
+    ----------
+    track_folders : str or list
+        Products folders to run `make_all_plots` in, or a glob pattern
+        (e.g. "tracks/*/products").
+    n_workers : int, optional
+        Number of tracks to run at the same time.
+    state_filename : str, optional
+        JSON file with the result of each track. Tracks already finished in this
+        file are skipped, so an interrupted batch continues where it stopped.
+    retry_failed : bool, optional
+        Run the tracks that failed in an earlier batch again. By default, they
+        are skipped. Tracks left interrupted by an earlier batch are always run
+        again, each alone.
+    log_filename : str, optional
+        Name of the log file written in each track folder with the output of
+        `make_all_plots`.
+    plot_kwargs : dict
+        Passed to `make_all_plots` for every track.
+
+    Returns
+    -------
+    state : dict
+        Track folder -> result dict with "status" ("done" or "failed"),
+        "wall_time", "stage_times" and "error". A track is only "interrupted"
+        in the state file while it waits to be run again alone.
+    '''
+
+    if isinstance(track_folders, str):
+        track_folders = sorted(glob(track_folders))
+
+    # The workers change directory, so keep absolute paths.
+    track_folders = [os.path.abspath(track_folder) for track_folder in track_folders]
+    state_filename = os.path.abspath(state_filename)
+
+    state = load_batch_state(state_filename)
+
+    skip_status = ['done'] if retry_failed else ['done', 'failed']
+
+    tracks_to_run = [track_folder for track_folder in track_folders
+                     if state.get(track_folder, {}).get('status') not in skip_status]
+
+    print(f"Running {len(tracks_to_run)} of {len(track_folders)} tracks. "
+          f"{len(track_folders) - len(tracks_to_run)} were already run.")
+
+    def record_result(track_folder, result):
+        state[track_folder] = result
+        save_batch_state(state_filename, state)
+
+        print(f"{result['status']}: {track_folder} ({result['wall_time']:.1f} s)")
+
+        if result['error'] is not None:
+            print(f"  {result['error']}")
+
+    run_kwargs = dict(plot_kwargs=plot_kwargs, log_filename=log_filename)
+
+    # Tracks interrupted in an earlier batch are run alone straight away.
+    tracks_to_isolate = [track_folder for track_folder in tracks_to_run
+                         if state.get(track_folder, {}).get('status') == 'interrupted']
+    tracks_to_share = [track_folder for track_folder in tracks_to_run
+                       if track_folder not in tracks_to_isolate]
+
+    while len(tracks_to_share) > 0:
+
+        interrupted, tracks_to_share = run_tracks_in_pool(tracks_to_share, n_workers,
+                                                          record_result, **run_kwargs)
+
+        # A worker died. With one worker, the track was already running alone.
+        status = 'failed' if n_workers == 1 else 'interrupted'
+
+        for track_folder in interrupted:
+            state[track_folder] = {'status': status, 'wall_time': None,
+                                   'stage_times': None,
+                                   'error': "Worker process ended unexpectedly."}
+
+            print(f"{status}: {track_folder} (worker process ended unexpectedly)")
+
+        save_batch_state(state_filename, state)
+
+        if status == 'interrupted':
+            tracks_to_isolate.extend(interrupted)
+
+    for track_folder in tracks_to_isolate:
+
+        print(f"Running {track_folder} alone.")
+
+        interrupted, _ = run_tracks_in_pool([track_folder], 1, record_result, **run_kwargs)
+
+        if len(interrupted) > 0:
+            state[track_folder] = {'status': 'failed', 'wall_time': None,
+                                   'stage_times': None,
+                                   'error': "Worker process ended unexpectedly "
+                                            "when run alone."}
+
+            save_batch_state(state_filename, state)
+
+            print(f"failed: {track_folder} (worker process ended unexpectedly when run alone)")
+
+    nfailed = sum(state.get(track_folder, {}).get('status') == 'failed'
+                  for track_folder in track_folders)
+
+    print(f"Finished {len(track_folders) - nfailed} of {len(track_folders)} tracks. "
+          f"{nfailed} failed. See {state_filename}")
+
+    return state
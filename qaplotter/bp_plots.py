@@ -4,9 +4,12 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import numpy as np
 
+from .utils import category_mask, decode_column, scan_hover, TraceBatch
+
 
 def bp_amp_phase_figures(table_dict, meta_dict,
-                         nspw_per_figure=4, scatter_plot=go.Scattergl):
+                         nspw_per_figure=4, scatter_plot=go.Scattergl,
+                         validate=False):
     '''
     Create an amp and phase plot for each SPW. Will create several figures based
     on total # of SPW vs. # SPW per figure (default is 4).
@@ -16,8 +19,6 @@ def bp_amp_phase_figures(table_dict, meta_dict,
     exp_keys = {'amp': {'x': 'freq', 'y': 'y'},
                 'phase': {'x': 'freq', 'y': 'y'}}
 
-    hovertemplate = 'Scan: %{customdata[0]}<br>SPW: %{customdata[1]}<br>Chan: %{customdata[2]}<br>Freq: %{customdata[3]}<br>Corr: %{customdata[4]}<br>Ant1: %{customdata[5]}<br>Ant2: %{customdata[6]}'
-
     for key in exp_keys:
         if key not in table_dict.keys():
             raise KeyError(f"Required dict key {key} not found.")
@@ -59,6 +60,9 @@ def bp_amp_phase_figures(table_dict, meta_dict,
         fig = make_subplots(rows=2, cols=ncols,
                             subplot_titles=subplot_titles)
 
+        # Add all of the traces at once at the end. See `TraceBatch`.
+        traces = TraceBatch(fig, scatter_plot=scatter_plot)
+
         # Loop through for each SPW
         for ii in range(ncols):
 
@@ -70,21 +74,16 @@ def bp_amp_phase_figures(table_dict, meta_dict,
 
                 tab_data = table_dict[key][spw_num]
 
-                corrs = np.unique(tab_data['corr'].tolist())
+                corrs = np.unique(decode_column(tab_data, 'corr'))
 
                 for nc, (corr, marker) in enumerate(zip(corrs, markers)):
 
-                    corr_mask = (tab_data['corr'] == corr).tolist()
+                    corr_mask = category_mask(tab_data, 'corr', corr)
 
-                    custom_data = np.vstack((tab_data['scan'][corr_mask].tolist(),
-                                             tab_data['spw'][corr_mask].tolist(),
-                                             tab_data['chan'][corr_mask].tolist(),
-                                             tab_data['freq'][corr_mask].tolist(),
-                                             tab_data['corr'][corr_mask].tolist(),
-                                             tab_data['ant1name'][corr_mask].tolist(),
-                                             tab_data['ant2name'][corr_mask].tolist())).T
+                    custom_data, hovertemplate = scan_hover(tab_data, corr_mask, None, corr,
+                                                            time_format=None)
 
-                    # Colour by Ant 1
+                    # Colour by Ant 1. The codes sort in the same order as the names.
                     ant_data = tab_data['ant1name'][corr_mask].tolist()
 
                     ant1_map_dict = {}
@@ -94,24 +93,25 @@ def bp_amp_phase_figures(table_dict, meta_dict,
                     ant_colors = [px.colors.qualitative.Safe[ant1_map_dict[ant] % 11]
                                   for ant in ant_data]
 
-                    fig.append_trace(scatter_plot(x=tab_data[exp_keys[key]['x']][corr_mask],
-                                                  y=tab_data[exp_keys[key]['y']][corr_mask],
-                                                  mode='markers',
-                                                  marker=dict(symbol=marker,
-                                                              size=3,
-                                                              color=ant_colors),
-                                                  customdata=custom_data,
-                                                  hovertemplate=hovertemplate,
-                                                  # title=f"SPW {spw_keys[spw_num]}",
-                                                  # name=f"SPW {spw}",
-                                                  # legendgroup=str(spw),
-                                                  # showlegend=True if (nc == 0) else False),
-                                                  showlegend=False),
-                                     row=1 if key == 'amp' else 2, col=ii + 1,
-                                     )
+                    traces.append(row=1 if key == 'amp' else 2, col=ii + 1,
+                                  x=tab_data[exp_keys[key]['x']][corr_mask],
+                                  y=tab_data[exp_keys[key]['y']][corr_mask],
+                                  mode='markers',
+                                  marker=dict(symbol=marker,
+                                              size=3,
+                                              color=ant_colors),
+                                  customdata=custom_data,
+                                  hovertemplate=hovertemplate,
+                                  # title=f"SPW {spw_keys[spw_num]}",
+                                  # name=f"SPW {spw}",
+                                  # legendgroup=str(spw),
+                                  # showlegend=True if (nc == 0) else False),
+                                  showlegend=False)
 
             spw_num += 1
 
+        fig = traces.figure(validate=validate)
+
         fig.update_xaxes(nticks=8)
         fig.update_yaxes(nticks=8)
 
@@ -1,24 +1,47 @@
 
 import plotly.graph_objects as go
-import plotly.express as px
 from plotly.subplots import make_subplots
 import numpy as np
 
-from .utils import telescope_time_conversion
+from .utils import telescope_time_conversion, category_code, decode_column, group_rows
+from .utils import color_codes, color_mode_marker, palette_color
+from .utils import scan_hover, TraceBatch
+from .utils import decimate_rows, panel_point_budget, note_decimation
 
 # Define a common set of markers to plot for different correlations
 # e.g. RR, LL, RL, LR
 markers = ['circle', 'cross', 'triangle-up', 'triangle-down']
 
 
+def panel_points(tab_data, group_slices, spw_nums, corrs):
+    '''
+    Number of rows of `tab_data` in the traces of one panel: the (spw, corr)
+    groups from `group_rows` for the `spw_nums` and `corrs` that are plotted.
+    '''
+
+    if corrs is None:
+        corr_codes = None
+    else:
+        corr_codes = [category_code(tab_data, 'corr', corr) for corr in corrs[:len(markers)]]
+
+    return sum(rows.stop - rows.start for (spw, corr_code), rows in group_slices.items()
+               if spw in spw_nums and (corr_codes is None or corr_code in corr_codes))
+
+
 def target_scan_figure(table_dict, meta_dict, show=False,
                        scatter_plot=go.Scattergl,
                        corrs=['RR', 'LL'],
                        spw_dict=None,
                        show_linesonly=False,
-                       telescope='vla'):
+                       telescope='vla',
+                       validate=False,
+                       max_points_per_panel=None):
     '''
     Make a 3-panel figure for target scans.
+
+    With `max_points_per_panel`, each panel is reduced to about that many points
+    with `bin_extremes`, keeping the extremes in y across x. The panel titles
+    show the decimation ratio.
     '''
 
     # There should be 3 fields:
@@ -38,7 +61,8 @@ def target_scan_figure(table_dict, meta_dict, show=False,
 
     fig = make_subplots(rows=1, cols=3, subplot_titles=subplot_titles)
 
-    hovertemplate = 'Scan: %{customdata[0]}<br>SPW: %{customdata[1]}<br>Chan: %{customdata[2]}<br>Freq: %{customdata[3]}<br>Corr: %{customdata[4]}<br>Ant1: %{customdata[5]}<br>Ant2: %{customdata[6]}<br>Time: %{customdata[7]}'
+    # Add all of the traces at once at the end. See `TraceBatch`.
+    traces = TraceBatch(fig, scatter_plot=scatter_plot)
 
     spw_nums = np.unique(table_dict['amp_chan']['spw'].tolist())
 
@@ -66,19 +90,15 @@ def target_scan_figure(table_dict, meta_dict, show=False,
 
         spw_nums = line_spw_nums
 
-    def make_casa_timestring(x):
-
-        datetime_vals = telescope_time_conversion(x, telescope=telescope)
-
-        return [dtime.strftime("%Y/%m/%d/%H:%M:%S.%f")[:-5]
-                for dtime in datetime_vals]
-
     colors_dict = {"SPW": [],
                    "Scan": [],
                    "Ant1": [],
                    "Ant2": [],
                    "Corr": []}
 
+    # key -> [points kept, points in the panel]
+    panel_counts = {}
+
     for nn, key in enumerate(exp_keys):
 
         # Convert the time axis values to strings
@@ -88,23 +108,18 @@ def target_scan_figure(table_dict, meta_dict, show=False,
                 datetime_vals = telescope_time_conversion(x, telescope=telescope)
 
                 return datetime_vals
+
+            # The hover labels show the x values as the time.
+            time_format = 'x'
         else:
             def format_xvals(x):
                 return x
 
-        # Make channel strings that can account for channel averaging used in the plotms output:
-        chan_avg = int(meta_dict[key]['channel average'])
-        # No averaging = do nothing
-        if chan_avg == 1:
-            def make_channel_string(x):
-                return x
-        else:
-            def make_channel_string(x):
-                '''
-                Output a string with the channel range in the average
-                '''
-                return [f"{chan_avg * val}~{chan_avg * (val+1) - 1}" for val in x]
+            time_format = 'offset'
 
+        # Channel averaging used in the plotms output. The hover labels show
+        # the range of channels in each average.
+        chan_avg = int(meta_dict[key]['channel average'])
 
         tab_data = table_dict[key]
 
@@ -113,83 +128,77 @@ def target_scan_figure(table_dict, meta_dict, show=False,
             print("Empty data table found. Skipping")
             continue
 
-        for nspw, spw in enumerate(spw_nums):
+        # Sort by SPW and correlation once so each trace is a slice of the
+        # sorted table instead of a mask over all of the rows.
+        sorted_data, group_slices = group_rows(tab_data, ['spw', 'corr'])
+
+        # Number of points kept and in total for the panel title.
+        panel_counts[key] = [0, panel_points(tab_data, group_slices, spw_nums, corrs)]
 
-            spw_mask = tab_data['spw'] == spw
+        for nspw, spw in enumerate(spw_nums):
 
             if corrs is None:
-                corrs = np.unique(tab_data['corr'][spw_mask].tolist())
+                corrs = np.unique(decode_column(tab_data, 'corr', tab_data['spw'] == spw))
 
             for nc, (corr, marker) in enumerate(zip(corrs, markers)):
 
-                corr_mask = (tab_data['corr'] == corr).tolist()
-
-                custom_data = np.vstack((tab_data['scan'][spw_mask & corr_mask].tolist(),
-                                         tab_data['spw'][spw_mask & corr_mask].tolist(),
-                                         make_channel_string(tab_data['chan'][spw_mask & corr_mask].tolist()),
-                                         tab_data['freq'][spw_mask & corr_mask].tolist(),
-                                         tab_data['corr'][spw_mask & corr_mask].tolist(),
-                                         tab_data['ant1name'][spw_mask & corr_mask].tolist(),
-                                         tab_data['ant2name'][spw_mask & corr_mask].tolist(),
-                                         make_casa_timestring(tab_data['time'][spw_mask & corr_mask].tolist()))).T
-
-                # We're also going to record colors based on Scan and SPW
-                # SPW are unique and the colour palette has 11 colours.
-                spw_data = tab_data['spw'][spw_mask & corr_mask].tolist()
+                rows = group_slices.get((spw, category_code(tab_data, 'corr', corr)),
+                                        slice(0, 0))
 
-                colors_dict['SPW'].append([px.colors.qualitative.Safe[nspw % 11] for _ in range(len(spw_data))])
+                # Share the point budget of the panel between its traces.
+                if max_points_per_panel is not None:
+                    budget = panel_point_budget(rows.stop - rows.start, panel_counts[key][1],
+                                                max_points_per_panel)
+                    rows = decimate_rows(rows, sorted_data[exp_keys[key]['x']],
+                                         sorted_data[exp_keys[key]['y']], budget)
 
-                # Want to map to unique scan values, not the scan numbers themselves
-                # (i.e., 50, 60, 70 -> 0, 1, 2)
-                scan_data = tab_data['scan'][spw_mask & corr_mask].tolist()
+                panel_counts[key][0] += len(sorted_data['y'][rows])
 
-                scan_map_dict = {}
-                for n_uniq, scan in enumerate(np.unique(scan_data)):
-                    scan_map_dict[scan] = n_uniq
+                # Numeric hover values, formatted by the hovertemplate.
+                custom_data, hovertemplate = scan_hover(sorted_data, rows, spw, corr,
+                                                        chan_avg=chan_avg,
+                                                        time_format=time_format,
+                                                        telescope=telescope)
 
-                colors_dict['Scan'].append([px.colors.qualitative.Safe[scan_map_dict[scan] % 11]
-                                            for scan in scan_data])
+                # We're also going to record colors based on Scan and SPW.
+                # SPW and corr are the same for the whole trace.
+                colors_dict['SPW'].append(palette_color(nspw))
 
-                # And antennas for colours. Same approach as scans
-                ant_data = tab_data['ant1name'][spw_mask & corr_mask].tolist()
+                # Map to the unique scan values, not the scan numbers themselves
+                # (i.e., 50, 60, 70 -> 0, 1, 2). The codes are mapped onto the
+                # palette by the marker colorscale.
+                colors_dict['Scan'].append(color_codes(sorted_data['scan'][rows]))
 
-                ant1_map_dict = {}
-                for n_uniq, ant in enumerate(np.unique(ant_data)):
-                    ant1_map_dict[ant] = n_uniq
-
-                colors_dict['Ant1'].append([px.colors.qualitative.Safe[ant1_map_dict[ant] % 11]
-                                            for ant in ant_data])
-
-                ant_data = tab_data['ant2name'][spw_mask & corr_mask].tolist()
-
-                ant2_map_dict = {}
-                for n_uniq, ant in enumerate(np.unique(ant_data)):
-                    ant2_map_dict[ant] = n_uniq
-
-                colors_dict['Ant2'].append([px.colors.qualitative.Safe[ant2_map_dict[ant] % 11]
-                                            for ant in ant_data])
+                # And antennas for colours. Same approach as scans.
+                # The antenna names are integer codes in the same sort order as the names.
+                colors_dict['Ant1'].append(color_codes(sorted_data['ant1name'][rows]))
+                colors_dict['Ant2'].append(color_codes(sorted_data['ant2name'][rows]))
 
                 # And corr
-                colors_dict['Corr'].append([px.colors.qualitative.Safe[nc % 11]
-                                            for _ in range(len(spw_data))])
+                colors_dict['Corr'].append(palette_color(nc))
 
                 spw_str = f"SPW {spw}"
                 if spw in spw_labels:
                     spw_str += f"<br>({spw_labels[spw]})"
 
-                fig.append_trace(scatter_plot(x=format_xvals(tab_data[exp_keys[key]['x']][spw_mask & corr_mask]),
-                                              y=tab_data[exp_keys[key]['y']][spw_mask & corr_mask],
-                                              mode='markers',
-                                              marker=dict(symbol=marker,
-                                                          size=7,
-                                                          color=colors_dict['SPW'][-1]),
-                                              customdata=custom_data,
-                                              hovertemplate=hovertemplate,
-                                              name=spw_str,
-                                              legendgroup=str(spw),
-                                              showlegend=True if (nn == 0 and nc == 0) else False),
-                                 row=exp_keys[key]['row'], col=exp_keys[key]['col'],
-                                 )
+                traces.append(row=exp_keys[key]['row'], col=exp_keys[key]['col'],
+                              x=format_xvals(sorted_data[exp_keys[key]['x']][rows]),
+                              y=sorted_data[exp_keys[key]['y']][rows],
+                              mode='markers',
+                              marker=dict(symbol=marker,
+                                          size=7,
+                                          color=colors_dict['SPW'][-1],
+                                          **color_mode_marker),
+                              customdata=custom_data,
+                              hovertemplate=hovertemplate,
+                              name=spw_str,
+                              legendgroup=str(spw),
+                              showlegend=True if (nn == 0 and nc == 0) else False)
+
+    fig = traces.figure(validate=validate)
+
+    for key, (nkept, ntotal) in panel_counts.items():
+        note_decimation(fig, exp_keys[key]['title'], nkept, ntotal)
 
     # Here's what needs to be updated for the colors
     # fig['data'][0]['marker']['color']
@@ -271,9 +280,13 @@ def target_scan_figure(table_dict, meta_dict, show=False,
 
 def calibrator_scan_figure(table_dict, meta_dict, show=False, scatter_plot=go.Scattergl,
                            corrs=['RR', 'LL'], spw_dict=None,
-                           telescope='vla'):
+                           telescope='vla',
+                           validate=False,
+                           max_points_per_panel=None):
     '''
     Make a 12-panel (4x3) figure for calibrator scans.
+
+    See `target_scan_figure` for `max_points_per_panel`.
     '''
 
     # There should be 10 fields:
@@ -325,7 +338,8 @@ def calibrator_scan_figure(table_dict, meta_dict, show=False, scatter_plot=go.Sc
 
     fig = make_subplots(rows=3, cols=4, subplot_titles=subplot_titles)
 
-    hovertemplate = 'Scan: %{customdata[0]}<br>SPW: %{customdata[1]}<br>Chan: %{customdata[2]}<br>Freq: %{customdata[3]}<br>Corr: %{customdata[4]}<br>Ant1: %{customdata[5]}<br>Ant2: %{customdata[6]}<br>Time: %{customdata[7]}'
+    # Add all of the traces at once at the end. See `TraceBatch`.
+    traces = TraceBatch(fig, scatter_plot=scatter_plot)
 
     spw_nums = np.unique(table_dict['amp_chan']['spw'].tolist())
 
@@ -337,19 +351,20 @@ def calibrator_scan_figure(table_dict, meta_dict, show=False, scatter_plot=go.Sc
                 continue
             spw_labels[key] = spw_dict[key]['label']
 
-    def make_casa_timestring(x):
-
-        datetime_vals = telescope_time_conversion(x, telescope=telescope)
-
-        return [dtime.strftime("%Y/%m/%d/%H:%M:%S.%f")[:-5]
-                for dtime in datetime_vals]
-
     colors_dict = {"SPW": [],
                    "Scan": [],
                    "Ant1": [],
                    "Ant2": [],
                    "Corr": []}
 
+    # Sort each table by SPW and correlation once so each trace is a slice of
+    # the sorted table instead of a mask over all of the rows.
+    grouped_data = {key: group_rows(table_dict[key], ['spw', 'corr']) for key in exp_keys}
+
+    # key -> [points kept, points in the panel] for the panel titles.
+    panel_counts = {key: [0, panel_points(table_dict[key], grouped_data[key][1], spw_nums, corrs)]
+                    for key in exp_keys}
+
     for nspw, spw in enumerate(spw_nums):
 
         for nn, key in enumerate(exp_keys):
@@ -361,101 +376,85 @@ def calibrator_scan_figure(table_dict, meta_dict, show=False, scatter_plot=go.Sc
                     datetime_vals = telescope_time_conversion(x, telescope=telescope)
 
                     return datetime_vals
+
+                # The hover labels show the x values as the time.
+                time_format = 'x'
             else:
                 def format_xvals(x):
                     return x
 
-            # Make channel strings that can account for channel averaging used in the plotms output:
-            chan_avg = int(meta_dict[key]['channel average'])
-            # No averaging = do nothing
-            if chan_avg == 1:
-                def make_channel_string(x):
-                    return x
-            else:
-                def make_channel_string(x):
-                    '''
-                    Output a string with the channel range in the average
-                    '''
-                    return [f"{chan_avg * val}~{chan_avg * (val+1) - 1}" for val in x]
+                time_format = 'offset'
 
+            # Channel averaging used in the plotms output. The hover labels show
+            # the range of channels in each average.
+            chan_avg = int(meta_dict[key]['channel average'])
 
             tab_data = table_dict[key]
 
-            spw_mask = tab_data['spw'] == spw
+            sorted_data, group_slices = grouped_data[key]
 
             if corrs is None:
-                corrs = np.unique(tab_data['corr'][spw_mask].tolist())
+                corrs = np.unique(decode_column(tab_data, 'corr', tab_data['spw'] == spw))
 
             for nc, (corr, marker) in enumerate(zip(corrs, markers)):
 
-                corr_mask = (tab_data['corr'] == corr).tolist()
-
-                custom_data = np.vstack((tab_data['scan'][spw_mask & corr_mask].tolist(),
-                                         tab_data['spw'][spw_mask & corr_mask].tolist(),
-                                         make_channel_string(tab_data['chan'][spw_mask & corr_mask].tolist()),
-                                         tab_data['freq'][spw_mask & corr_mask].tolist(),
-                                         tab_data['corr'][spw_mask & corr_mask].tolist(),
-                                         tab_data['ant1name'][spw_mask & corr_mask].tolist(),
-                                         tab_data['ant2name'][spw_mask & corr_mask].tolist(),
-                                         make_casa_timestring(tab_data['time'][spw_mask & corr_mask].tolist()))).T
-
-                # We're also going to record colors based on Scan and SPW
-                # SPW are unique and the colour palette has 11 colours.
-                spw_data = tab_data['spw'][spw_mask & corr_mask].tolist()
-
-                colors_dict['SPW'].append([px.colors.qualitative.Safe[nspw % 11] for _ in range(len(spw_data))])
-
-                # Want to map to unique scan values, not the scan numbers themselves
-                # (i.e., 50, 60, 70 -> 0, 1, 2)
-                scan_data = tab_data['scan'][spw_mask & corr_mask].tolist()
-
-                scan_map_dict = {}
-                for n_uniq, scan in enumerate(np.unique(scan_data)):
-                    scan_map_dict[scan] = n_uniq
-
-                colors_dict['Scan'].append([px.colors.qualitative.Safe[scan_map_dict[scan] % 11]
-                                            for scan in scan_data])
+                rows = group_slices.get((spw, category_code(tab_data, 'corr', corr)),
+                                        slice(0, 0))
 
-                # And antennas for colours. Same approach as scans
-                ant_data = tab_data['ant1name'][spw_mask & corr_mask].tolist()
+                # Share the point budget of the panel between its traces.
+                if max_points_per_panel is not None:
+                    budget = panel_point_budget(rows.stop - rows.start, panel_counts[key][1],
+                                                max_points_per_panel)
+                    rows = decimate_rows(rows, sorted_data[exp_keys[key]['x']],
+                                         sorted_data[exp_keys[key]['y']], budget)
 
-                ant1_map_dict = {}
-                for n_uniq, ant in enumerate(np.unique(ant_data)):
-                    ant1_map_dict[ant] = n_uniq
+                panel_counts[key][0] += len(sorted_data['y'][rows])
 
-                colors_dict['Ant1'].append([px.colors.qualitative.Safe[ant1_map_dict[ant] % 11]
-                                            for ant in ant_data])
+                # Numeric hover values, formatted by the hovertemplate.
+                custom_data, hovertemplate = scan_hover(sorted_data, rows, spw, corr,
+                                                        chan_avg=chan_avg,
+                                                        time_format=time_format,
+                                                        telescope=telescope)
 
-                ant_data = tab_data['ant2name'][spw_mask & corr_mask].tolist()
+                # We're also going to record colors based on Scan and SPW.
+                # SPW and corr are the same for the whole trace.
+                colors_dict['SPW'].append(palette_color(nspw))
 
-                ant2_map_dict = {}
-                for n_uniq, ant in enumerate(np.unique(ant_data)):
-                    ant2_map_dict[ant] = n_uniq
+                # Map to the unique scan values, not the scan numbers themselves
+                # (i.e., 50, 60, 70 -> 0, 1, 2). The codes are mapped onto the
+                # palette by the marker colorscale.
+                colors_dict['Scan'].append(color_codes(sorted_data['scan'][rows]))
 
-                colors_dict['Ant2'].append([px.colors.qualitative.Safe[ant2_map_dict[ant] % 11]
-                                            for ant in ant_data])
+                # And antennas for colours. Same approach as scans.
+                # The antenna names are integer codes in the same sort order as the names.
+                colors_dict['Ant1'].append(color_codes(sorted_data['ant1name'][rows]))
+                colors_dict['Ant2'].append(color_codes(sorted_data['ant2name'][rows]))
 
                 # And corr
-                colors_dict['Corr'].append([px.colors.qualitative.Safe[nc % 11]
-                                            for _ in range(len(spw_data))])
+                colors_dict['Corr'].append(palette_color(nc))
 
                 spw_str = f"SPW {spw}"
                 if spw in spw_labels:
                     spw_str += f"<br>({spw_labels[spw]})"
 
-                fig.append_trace(scatter_plot(x=format_xvals(tab_data[exp_keys[key]['x']][spw_mask & corr_mask]),
-                                              y=tab_data[exp_keys[key]['y']][spw_mask & corr_mask],
-                                              mode='markers',
-                                              marker=dict(symbol=marker,
-                                                          size=7,
-                                                          color=px.colors.qualitative.Safe[nspw % 11]),
-                                              customdata=custom_data,
-                                              hovertemplate=hovertemplate,
-                                              name=spw_str,
-                                              legendgroup=str(spw),
-                                              showlegend=True if (nn == 0 and nc == 0) else False),
-                                 row=exp_keys[key]['row'], col=exp_keys[key]['col'],
-                                 )
+                traces.append(row=exp_keys[key]['row'], col=exp_keys[key]['col'],
+                              x=format_xvals(sorted_data[exp_keys[key]['x']][rows]),
+                              y=sorted_data[exp_keys[key]['y']][rows],
+                              mode='markers',
+                              marker=dict(symbol=marker,
+                                          size=7,
+                                          color=colors_dict['SPW'][-1],
+                                          **color_mode_marker),
+                              customdata=custom_data,
+                              hovertemplate=hovertemplate,
+                              name=spw_str,
+                              legendgroup=str(spw),
+                              showlegend=True if (nn == 0 and nc == 0) else False)
+
+    fig = traces.figure(validate=validate)
+
+    for key, (nkept, ntotal) in panel_counts.items():
+        note_decimation(fig, exp_keys[key]['title'], nkept, ntotal)
 
     # Make custom time ticks in a nicer format.
     # Also scale with zoom to stop tick labels from overlapping in different subplots.
@@ -51,7 +51,7 @@ def generate_webserver_track_link(flagging_sheet_link):
 
 
 def make_index_html_homepage(folder, ms_info_dict, flagging_sheet_link=None,
-                             manualflag_tablename=None):
+                             manualflag_tablename=None, report_filename=None):
     '''
     Home page for the track with links to the weblogs, QA plots, etc.
     '''
@@ -61,6 +61,10 @@ def make_index_html_homepage(folder, ms_info_dict, flagging_sheet_link=None,
 
     link_locations = generate_webserver_track_link(flagging_sheet_link)
 
+    # Timing and memory report of the QA plot run, if made.
+    if report_filename is not None:
+        link_locations['Run Report'] = report_filename
+
     html_string += '<div class="navbar">\n'
 
     for linkname in link_locations:
@@ -110,7 +114,8 @@ def make_index_html_homepage(folder, ms_info_dict, flagging_sheet_link=None,
 
 
 def make_html_homepage(folder, ms_info_dict, flagging_sheet_link=None,
-                       manualflag_tablename='manualflag_check.html'):
+                       manualflag_tablename='manualflag_check.html',
+                       report_filename=None):
 
     mypath = Path(folder)
 
@@ -130,10 +135,73 @@ def make_html_homepage(folder, ms_info_dict, flagging_sheet_link=None,
 
     print(make_index_html_homepage(folder, ms_info_dict,
                                    flagging_sheet_link=flagging_sheet_link,
-                                   manualflag_tablename=manualflag_tablename),
+                                   manualflag_tablename=manualflag_tablename,
+                                   report_filename=report_filename),
           file=open(index_file, 'a'))
 
 
+def make_report_html_page(report):
+    '''
+    Page with the summary and records of an instrumentation report (see
+    `make_report`). Uses the track homepage style.
+    '''
+
+    html_string = make_html_preamble()
+
+    html_string += '<div class="content" id="basic">\n'
+    html_string += '<h2>QAPlotter run report</h2>\n'
+    html_string += f'<p>qaplotter {report["qaplotter"]}, created {report["created"]}</p>\n'
+
+    for key, value in report['info'].items():
+        html_string += f'<p>{key}: {value}</p>\n'
+
+    def to_mb(nbytes):
+        return "" if nbytes is None else f"{nbytes / 1024**2:.1f}"
+
+    html_string += '<h3>Totals per category</h3>\n'
+    html_string += '<table>\n'
+    html_string += ('<tr><th>Category</th><th>Count</th><th>Wall time (s)</th>'
+                    '<th>CPU time (s)</th><th>Read (MB)</th><th>Written (MB)</th>'
+                    '<th>Max RSS change (MB)</th><th>Max peak RSS (MB)</th></tr>\n')
+
+    for category, totals in report['summary'].items():
+        html_string += (f'<tr><td>{category}</td><td>{totals["count"]}</td>'
+                        f'<td>{totals["wall_time"]:.2f}</td><td>{totals["cpu_time"]:.2f}</td>'
+                        f'<td>{to_mb(totals["read_bytes"])}</td>'
+                        f'<td>{to_mb(totals["write_bytes"])}</td>'
+                        f'<td>{to_mb(totals["max_rss_delta"])}</td>'
+                        f'<td>{to_mb(totals["max_peak_rss"])}</td></tr>\n')
+
+    html_string += '</table>\n'
+
+    # Slowest first
+    records = sorted(report['records'], key=lambda record: -record['wall_time'])
+
+    html_string += '<h3>All records</h3>\n'
+    html_string += '<table>\n'
+    html_string += ('<tr><th>Category</th><th>Name</th><th>Wall time (s)</th>'
+                    '<th>CPU time (s)</th><th>Read (MB)</th><th>Written (MB)</th>'
+                    '<th>RSS change (MB)</th><th>Peak RSS (MB)</th>'
+                    '<th>RSS at end (MB)</th><th>Process</th></tr>\n')
+
+    for record in records:
+        html_string += (f'<tr><td>{record["category"]}</td><td>{record["name"]}</td>'
+                        f'<td>{record["wall_time"]:.2f}</td><td>{record["cpu_time"]:.2f}</td>'
+                        f'<td>{to_mb(record["read_bytes"])}</td>'
+                        f'<td>{to_mb(record["write_bytes"])}</td>'
+                        f'<td>{to_mb(record["rss_delta"])}</td>'
+                        f'<td>{to_mb(record["peak_rss"])}</td>'
+                        f'<td>{to_mb(record["rss_end"])}</td>'
+                        f'<td>{record["pid"]}</td></tr>\n')
+
+    html_string += '</table>\n'
+    html_string += '</div>\n\n'
+
+    html_string += make_html_suffix()
+
+    return html_string
+
+
 def make_all_html_links(flagging_sheet_link, folder, field_dict, ms_info_dict):
     '''
     Make and save all html files for linking the interactive plots
@@ -10,12 +10,21 @@ import re
 from astropy.table import Table
 import numpy as np
 import os
+from io import StringIO
 import warnings
 
 
+def source_table_filename(msname, weblog_name='weblog'):
+    '''
+    Weblog page with the table of sources and their intents.
+    '''
+
+    return f'{weblog_name}/html/sessionsession_1/{msname}/t2-2-1.html'
+
+
 def extract_source_table(msname, weblog_name='weblog'):
 
-    filename = f'{weblog_name}/html/sessionsession_1/{msname}/t2-2-1.html'
+    filename = source_table_filename(msname, weblog_name=weblog_name)
 
     with open(filename) as f:
         html_doc = f.read()
@@ -24,7 +33,8 @@ def extract_source_table(msname, weblog_name='weblog'):
 
     html_table = soup.find('table')
 
-    table = pd.read_html(html_table.decode())
+    # Newer pandas versions only take file-like objects.
+    table = pd.read_html(StringIO(html_table.decode()))
 
     if isinstance(table, list):
         table = table[0]
@@ -12,6 +12,8 @@ from pandas import DataFrame
 from spectral_cube import SpectralCube
 from spectral_cube.utils import StokesWarning
 
+from .utils import measure, write_html_atomic
+
 
 def make_quicklook_figures(foldername, output_foldername, suffix='image'):
 
@@ -31,28 +33,33 @@ def make_quicklook_figures(foldername, output_foldername, suffix='image'):
 
         target_dict = data_dict[target]
 
-        if is_line:
-            fig = make_quicklook_lines_figure(target_dict, target)
-        else:
-            fig = make_quicklook_continuum_figure(target_dict, target)
+        with measure('figure', f"quicklook {target}"):
+            if is_line:
+                fig = make_quicklook_lines_figure(target_dict, target)
+            else:
+                fig = make_quicklook_continuum_figure(target_dict, target)
 
         out_html_name = f"quicklook-{target}-{type_tag}-plotly_interactive.html"
-        fig.write_html(f"{output_foldername}/{out_html_name}")
+
+        with measure('write_html', f"quicklook {target}"):
+            write_html_atomic(fig, f"{output_foldername}/{out_html_name}")
 
         targetname_dict[target] = out_html_name
 
-    if is_line:
-        fig_summ1, fig_summ2, df, df_outliers = \
-            make_quicklook_lines_noise_summary(data_dict)
-    else:
-        fig_summ1, fig_summ2, df, df_outliers = \
-            make_quicklook_continuum_noise_summary(data_dict)
+    with measure('figure', "quicklook summary"):
+        if is_line:
+            fig_summ1, fig_summ2, df, df_outliers = \
+                make_quicklook_lines_noise_summary(data_dict)
+        else:
+            fig_summ1, fig_summ2, df, df_outliers = \
+                make_quicklook_continuum_noise_summary(data_dict)
 
     out_html_name1 = f"quicklook-{type_tag}-summary-spw-plotly_interactive.html"
-    fig_summ1.write_html(f"{output_foldername}/{out_html_name1}")
-
     out_html_name2 = f"quicklook-{type_tag}-summary-field-plotly_interactive.html"
-    fig_summ2.write_html(f"{output_foldername}/{out_html_name2}")
+
+    with measure('write_html', "quicklook summary"):
+        write_html_atomic(fig_summ1, f"{output_foldername}/{out_html_name1}")
+        write_html_atomic(fig_summ2, f"{output_foldername}/{out_html_name2}")
 
     out_html_outliername1 = f"quicklook-{type_tag}-summary-outliers.html"
     with open(f"{output_foldername}/{out_html_outliername1}", 'w') as fo:
@@ -65,9 +72,9 @@ def make_quicklook_figures(foldername, output_foldername, suffix='image'):
     return targetname_dict, summary_filenames
 
 
-def load_quicklook_images(foldername, suffix='image'):
+def quicklook_image_names(foldername, suffix='image'):
     '''
-    Split by target and SPW.
+    Names of the quicklook images in CASA format or, if there are none, FITS.
     '''
 
     # Gather the requested files:
@@ -77,6 +84,16 @@ def load_quicklook_images(foldername, suffix='image'):
     if len(all_cubenames) == 0:
         all_cubenames = glob(f"{foldername}/*{suffix}.fits")
 
+    return all_cubenames
+
+
+def load_quicklook_images(foldername, suffix='image'):
+    '''
+    Split by target and SPW.
+    '''
+
+    all_cubenames = quicklook_image_names(foldername, suffix=suffix)
+
     # The name format is quicklook-FIELD-spwNUM-LINE/CONT-MSNAME
     target_names = list(set([cubename.split('-')[1] for cubename in all_cubenames]))
 
@@ -134,7 +151,8 @@ def read_data(cubename):
         file_format = 'fits' if cubename.endswith('fits') else 'casa'
 
         try:
-            this_cube = SpectralCube.read(cubename, format=file_format)
+            with measure('read', os.path.basename(cubename)):
+                this_cube = SpectralCube.read(cubename, format=file_format)
         except (ValueError, OSError) as err:
             print(f"{cubename} encountered error")
             print(f"{err}")
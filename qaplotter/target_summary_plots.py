@@ -6,26 +6,55 @@ from plotly.subplots import make_subplots
 import numpy as np
 import astropy.table as table
 
-from .utils import read_field_data_tables
+from .utils import TrackDataset
 
 from .utils import telescope_time_conversion
+from .utils import category_mask, decode_column, set_categorical_column
+from .utils import color_codes, color_mode_marker, palette_color
+from .utils import customdata_ref, time_ref, stack_customdata, TraceBatch
+from .utils import decimate_rows, panel_point_budget, note_decimation
 
 # Define a common set of markers to plot for different correlations
 # e.g. RR, LL, RL, LR
 markers = ['circle', 'cross', 'triangle-up', 'triangle-down']
 
 
+def plotted_rows(tab_data, spw_nums, corrs):
+    '''
+    Mask of the rows of `tab_data` in the `spw_nums` and `corrs` that are
+    plotted. All correlations are counted when `corrs` is None.
+    '''
+
+    mask = np.isin(tab_data['spw'], spw_nums)
+
+    if corrs is not None:
+        mask &= np.any([category_mask(tab_data, 'corr', corr)
+                        for corr in corrs[:len(markers)]], axis=0)
+
+    return mask
+
+
 def target_summary_amptime_figure(fields, folder, show=False,
                                   scatter_plot=go.Scattergl,
                                   corrs=['RR', 'LL'],
                                   spw_dict=None,
                                   show_linesonly=False,
-                                  telescope='vla'):
+                                  telescope='vla',
+                                  dataset=None,
+                                  validate=False,
+                                  max_points_per_panel=None):
     '''
     Make a N SPW-panel figure over all targets.
+
+    The field tables are read through `dataset` (a `TrackDataset` for `folder`).
+    A new one is created if not given.
+
+    With `max_points_per_panel`, each SPW panel is reduced to about that many
+    points over all of the fields. See `target_scan_figure`.
     '''
 
-    txt_files = glob(f"{folder}/*.txt")
+    if dataset is None:
+        dataset = TrackDataset(folder)
 
     # This summary only uses amp_time
     exp_keys = {'amp_time': {'x': 'time', 'y': 'y', 'row': 1, 'col': 2,
@@ -34,7 +63,7 @@ def target_summary_amptime_figure(fields, folder, show=False,
     # Find all unique SPW nums over all target fields
     spw_nums = []
     for field in fields:
-        table_dict = read_field_data_tables(field, folder)[0]
+        table_dict = dataset.read_field(field)[0]
 
         for key in exp_keys:
             if key not in table_dict.keys():
@@ -87,19 +116,27 @@ def target_summary_amptime_figure(fields, folder, show=False,
     fig = make_subplots(rows=nrow, cols=ncol, subplot_titles=subplot_titles,
                         shared_xaxes=False, shared_yaxes=False)
 
-    hovertemplate = 'Field name: %{customdata[0]}<br>Field number: %{customdata[1]}<br>Scan: %{customdata[2]}<br>SPW: %{customdata[3]}<br>Corr: %{customdata[4]}<br>Time: %{customdata[5]}'
-
-    def make_casa_timestring(x):
-
-        datetime_vals = telescope_time_conversion(x, telescope=telescope)
-
-        return [dtime.strftime("%Y/%m/%d/%H:%M:%S.%f")[:-5]
-                for dtime in datetime_vals]
+    # Add all of the traces at once at the end. See `TraceBatch`.
+    traces = TraceBatch(fig, scatter_plot=scatter_plot)
 
     colors_dict = {"Field": [],
                    "Scan": [],
                    "Corr": []}
 
+    # spw -> [points kept, points in the panel]. The panels hold all of the
+    # fields, so the totals need a pass over the fields first. The tables are
+    # kept in memory by `dataset`.
+    panel_counts = {spw: [0, 0] for spw in spw_nums}
+    if max_points_per_panel is not None:
+        for field in fields:
+            amp_time = dataset.read_field(field)[0]['amp_time']
+
+            plotted = plotted_rows(amp_time, spw_nums, corrs)
+
+            panel_spws, counts = np.unique(amp_time['spw'][plotted], return_counts=True)
+            for spw, count in zip(panel_spws, counts):
+                panel_counts[spw][1] += count
+
     # Convert the time axis values to strings
     # Time is always the x-axis.
     if "time" in key:
@@ -114,78 +151,83 @@ def target_summary_amptime_figure(fields, folder, show=False,
     for nfield, field in enumerate(fields):
         # print(f"On {field}")
 
-        table_dict, meta_dict = read_field_data_tables(field, folder)
+        table_dict, meta_dict = dataset.read_field(field)
 
-        tab_data = table_dict['amp_time']
+        # New table sharing the columns so the dataset's table is not changed
+        tab_data = table.Table(table_dict['amp_time'], copy=False)
 
         if len(tab_data) == 0:
             print(f"Field {field} is empty. Skipping")
             continue
 
-        # Add a fieldname column
-        tab_data.add_column(table.Column([field] * len(tab_data),
-                                         name='fieldname'))
+        # Add a fieldname column. Encoded like the other text columns.
+        set_categorical_column(tab_data, 'fieldname',
+                               np.zeros(len(tab_data), dtype=np.int8),
+                               [field])
 
 
-        field_mask = tab_data['fieldname'] == field
+        field_mask = category_mask(tab_data, 'fieldname', field)
 
         for nspw, spw in enumerate(spw_nums):
 
             spw_mask = tab_data['spw'] == spw
 
             if corrs is None:
-                corrs = np.unique(tab_data['corr'][spw_mask].tolist())
+                corrs = np.unique(decode_column(tab_data, 'corr', spw_mask))
 
             for nc, (corr, marker) in enumerate(zip(corrs, markers)):
 
-                corr_mask = (tab_data['corr'] == corr).tolist()
+                corr_mask = category_mask(tab_data, 'corr', corr)
 
                 all_mask = spw_mask & field_mask & corr_mask
 
-                custom_data = np.vstack((tab_data['fieldname'][all_mask].tolist(),
-                                        tab_data['field'][all_mask].tolist(),
-                                        tab_data['scan'][all_mask].tolist(),
-                                        tab_data['spw'][all_mask].tolist(),
-                                        tab_data['corr'][all_mask].tolist(),
-                                        make_casa_timestring(tab_data['time'][all_mask].tolist()))).T
-
-                # We're also going to record colors based on Scan and field
-                # SPW are unique and the colour palette has 11 colours.
-                field_data = tab_data['fieldname'][all_mask].tolist()
-
-                colors_dict['Field'].append([px.colors.qualitative.Safe[nfield % 11] for _ in range(len(field_data))])
-
-                # Want to map to unique scan values, not the scan numbers themselves
-                # (i.e., 50, 60, 70 -> 0, 1, 2)
-                scan_data = tab_data['scan'][all_mask].tolist()
-
-                scan_map_dict = {}
-                for n_uniq, scan in enumerate(np.unique(scan_data)):
-                    scan_map_dict[scan] = n_uniq
-
-                colors_dict['Scan'].append([px.colors.qualitative.Safe[scan_map_dict[scan] % 11]
-                                            for scan in scan_data])
+                # Share the point budget of the panel between its traces.
+                rows = all_mask
+                if max_points_per_panel is not None:
+                    budget = panel_point_budget(np.count_nonzero(all_mask),
+                                                panel_counts[spw][1], max_points_per_panel)
+                    rows = decimate_rows(all_mask, tab_data['x'], tab_data['y'], budget)
+                    panel_counts[spw][0] += len(tab_data['y'][rows])
+
+                # Numeric hover values, formatted by the hovertemplate. The field
+                # name, SPW and corr are the same for the whole trace.
+                columns = []
+                hovertemplate = (f"Field name: {field}"
+                                 f"<br>Field number: "
+                                 f"{customdata_ref(columns, tab_data['field'][rows])}"
+                                 f"<br>Scan: {customdata_ref(columns, tab_data['scan'][rows])}"
+                                 f"<br>SPW: {spw}"
+                                 f"<br>Corr: {corr}"
+                                 f"<br>Time: "
+                                 f"{time_ref(columns, tab_data['time'][rows], telescope)}")
+                custom_data = stack_customdata(columns)
+
+                # We're also going to record colors based on Scan and field.
+                # Field and corr are the same for the whole trace.
+                colors_dict['Field'].append(palette_color(nfield))
+
+                # Map to the unique scan values, not the scan numbers themselves
+                # (i.e., 50, 60, 70 -> 0, 1, 2). The codes are mapped onto the
+                # palette by the marker colorscale.
+                colors_dict['Scan'].append(color_codes(tab_data['scan'][rows]))
 
                 # And corr
-                corr_data = tab_data['corr'][all_mask].tolist()
-
-                colors_dict['Corr'].append([px.colors.qualitative.Safe[nc % 11]
-                                            for _ in range(len(corr_data))])
-
-                fig.append_trace(scatter_plot(x=format_xvals(tab_data['x'][all_mask]),
-                                            y=tab_data['y'][all_mask],
-                                            mode='markers',
-                                            marker=dict(symbol=marker,
-                                                        size=7,
-                                                        color=colors_dict['Field'][-1]),
-                                            customdata=custom_data,
-                                            hovertemplate=hovertemplate,
-                                            # name=f"SPW {spw}",
-                                            name=field,
-                                            legendgroup=str(field),
-                                            showlegend=True if (nspw == 0 and nc == 0) else False),
-                                row=(nspw // 3)+1, col=nspw % 3 + 1,
-                                )
+                colors_dict['Corr'].append(palette_color(nc))
+
+                traces.append(row=(nspw // 3)+1, col=nspw % 3 + 1,
+                              x=format_xvals(tab_data['x'][rows]),
+                              y=tab_data['y'][rows],
+                              mode='markers',
+                              marker=dict(symbol=marker,
+                                          size=7,
+                                          color=colors_dict['Field'][-1],
+                                          **color_mode_marker),
+                              customdata=custom_data,
+                              hovertemplate=hovertemplate,
+                              # name=f"SPW {spw}",
+                              name=field,
+                              legendgroup=str(field),
+                              showlegend=True if (nspw == 0 and nc == 0) else False)
 
             if nspw == 0:
                 label = ""
@@ -195,6 +237,12 @@ def target_summary_amptime_figure(fields, folder, show=False,
             fig['layout'][f'xaxis{label}']['title'] = 'Time (UTC)'
             fig['layout'][f'yaxis{label}']['title'] = 'Amplitude (Jy)'
 
+    fig = traces.figure(validate=validate)
+
+    if max_points_per_panel is not None:
+        for nspw, spw in enumerate(spw_nums):
+            note_decimation(fig, subplot_titles[nspw], *panel_counts[spw])
+
     # Make custom time ticks in a nicer format.
     # Also scale with zoom to stop tick labels from overlapping in different subplots.
     for key in exp_keys:
@@ -256,13 +304,23 @@ def target_summary_ampfreq_figure(fields, folder, show=False,
                                   scatter_plot=go.Scattergl,
                                   corrs=['RR', 'LL'],
                                   spw_dict=None,
-                                  show_linesonly=False):
+                                  show_linesonly=False,
+                                  dataset=None,
+                                  validate=False,
+                                  max_points_per_panel=None):
 
     '''
     Make a N SPW-panel figure over all targets.
+
+    The field tables are read through `dataset` (a `TrackDataset` for `folder`).
+    A new one is created if not given.
+
+    With `max_points_per_panel`, each field panel is reduced to about that many
+    points. See `target_scan_figure`.
     '''
 
-    txt_files = glob(f"{folder}/*.txt")
+    if dataset is None:
+        dataset = TrackDataset(folder)
 
     # This summary only uses amp_time
     exp_keys = {'amp_chan': {'x': 'freq', 'y': 'y', 'row': 1, 'col': 1,
@@ -271,7 +329,7 @@ def target_summary_ampfreq_figure(fields, folder, show=False,
     # Find all unique SPW nums over all target fields
     spw_nums = []
     for field in fields:
-        table_dict = read_field_data_tables(field, folder)[0]
+        table_dict = dataset.read_field(field)[0]
 
         for key in exp_keys:
             if key not in table_dict.keys():
@@ -318,89 +376,99 @@ def target_summary_ampfreq_figure(fields, folder, show=False,
     fig = make_subplots(rows=nrow, cols=ncol, subplot_titles=subplot_titles,
                         shared_xaxes=False, shared_yaxes=False)
 
-    hovertemplate = 'SPW: %{customdata[0]}<br>Field: %{customdata[1]}<br>Field number: %{customdata[2]}<br>Scan: %{customdata[3]}<br>Corr: %{customdata[4]}<br>Channel: %{customdata[5]}'
+    # Add all of the traces at once at the end. See `TraceBatch`.
+    traces = TraceBatch(fig, scatter_plot=scatter_plot)
 
     colors_dict = {"SPW": [], "Scan": [],
                    "Corr": []}
 
+    # field -> [points kept, points in the panel]
+    panel_counts = {}
+
     for nfield, field in enumerate(fields):
         # print(f"On {field}")
 
-        table_dict, meta_dict = read_field_data_tables(field, folder)
+        table_dict, meta_dict = dataset.read_field(field)
 
-        tab_data = table_dict['amp_chan']
+        # New table sharing the columns so the dataset's table is not changed
+        tab_data = table.Table(table_dict['amp_chan'], copy=False)
 
         if len(tab_data) == 0:
             print(f"Field {field} is empty. Skipping")
             continue
 
-        # Add a fieldname column
-        tab_data.add_column(table.Column([field] * len(tab_data),
-                                         name='fieldname'))
+        # Add a fieldname column. Encoded like the other text columns.
+        set_categorical_column(tab_data, 'fieldname',
+                               np.zeros(len(tab_data), dtype=np.int8),
+                               [field])
 
 
-        field_mask = tab_data['fieldname'] == field
+        field_mask = category_mask(tab_data, 'fieldname', field)
+
+        panel_counts[field] = [0, np.count_nonzero(plotted_rows(tab_data, spw_nums, corrs))]
 
         for nspw, spw in enumerate(spw_nums):
 
             spw_mask = tab_data['spw'] == spw
 
             if corrs is None:
-                corrs = np.unique(tab_data['corr'][spw_mask].tolist())
+                corrs = np.unique(decode_column(tab_data, 'corr', spw_mask))
 
             for nc, (corr, marker) in enumerate(zip(corrs, markers)):
 
-                corr_mask = (tab_data['corr'] == corr).tolist()
+                corr_mask = category_mask(tab_data, 'corr', corr)
 
                 all_mask = spw_mask & field_mask & corr_mask
 
-                custom_data = np.vstack((tab_data['spw'][all_mask].tolist(),
-                                        tab_data['fieldname'][all_mask].tolist(),
-                                        tab_data['field'][all_mask].tolist(),
-                                        tab_data['scan'][all_mask].tolist(),
-                                        tab_data['corr'][all_mask].tolist(),
-                                        tab_data['chan'][all_mask].tolist())).T
-
-                # We're also going to record colors based on Scan and field
-                # SPW are unique and the colour palette has 11 colours.
-                spw_data = tab_data['spw'][all_mask].tolist()
-
-                colors_dict['SPW'].append([px.colors.qualitative.Safe[nspw % 11] for _ in range(len(spw_data))])
-
-                # Want to map to unique scan values, not the scan numbers themselves
-                # (i.e., 50, 60, 70 -> 0, 1, 2)
-                scan_data = tab_data['scan'][all_mask].tolist()
-
-                scan_map_dict = {}
-                for n_uniq, scan in enumerate(np.unique(scan_data)):
-                    scan_map_dict[scan] = n_uniq
-
-                colors_dict['Scan'].append([px.colors.qualitative.Safe[scan_map_dict[scan] % 11]
-                                            for scan in scan_data])
+                # Share the point budget of the panel between its traces.
+                rows = all_mask
+                if max_points_per_panel is not None:
+                    budget = panel_point_budget(np.count_nonzero(all_mask),
+                                                panel_counts[field][1], max_points_per_panel)
+                    rows = decimate_rows(all_mask, tab_data['freq'], tab_data['y'], budget)
+                    panel_counts[field][0] += len(tab_data['y'][rows])
+
+                # Numeric hover values, formatted by the hovertemplate. The SPW,
+                # field name and corr are the same for the whole trace.
+                columns = []
+                hovertemplate = (f"SPW: {spw}"
+                                 f"<br>Field: {field}"
+                                 f"<br>Field number: "
+                                 f"{customdata_ref(columns, tab_data['field'][rows])}"
+                                 f"<br>Scan: {customdata_ref(columns, tab_data['scan'][rows])}"
+                                 f"<br>Corr: {corr}"
+                                 f"<br>Channel: {customdata_ref(columns, tab_data['chan'][rows])}")
+                custom_data = stack_customdata(columns)
+
+                # We're also going to record colors based on Scan and SPW.
+                # SPW and corr are the same for the whole trace.
+                colors_dict['SPW'].append(palette_color(nspw))
+
+                # Map to the unique scan values, not the scan numbers themselves
+                # (i.e., 50, 60, 70 -> 0, 1, 2). The codes are mapped onto the
+                # palette by the marker colorscale.
+                colors_dict['Scan'].append(color_codes(tab_data['scan'][rows]))
 
                 # And corr
-                corr_data = tab_data['corr'][all_mask].tolist()
-
-                colors_dict['Corr'].append([px.colors.qualitative.Safe[nc % 11]
-                                            for _ in range(len(corr_data))])
+                colors_dict['Corr'].append(palette_color(nc))
 
                 spw_str = f"SPW {spw}"
                 if spw in spw_labels:
                     spw_str += f"<br>({spw_labels[spw]})"
 
-                fig.append_trace(scatter_plot(x=tab_data['freq'][all_mask],
-                                            y=tab_data['y'][all_mask],
-                                            mode='markers',
-                                            marker=dict(symbol=marker,
-                                                        size=7,
-                                                        color=colors_dict['SPW'][-1]),
-                                            customdata=custom_data,
-                                            hovertemplate=hovertemplate,
-                                            name=spw_str,
-                                            legendgroup=str(nspw),
-                                            showlegend=True if (nfield == 0 and nc == 0) else False),
-                                row=(nfield // ncol)+1, col=nfield % ncol + 1,
-                                )
+                traces.append(row=(nfield // ncol)+1, col=nfield % ncol + 1,
+                              x=tab_data['freq'][rows],
+                              y=tab_data['y'][rows],
+                              mode='markers',
+                              marker=dict(symbol=marker,
+                                          size=7,
+                                          color=colors_dict['SPW'][-1],
+                                          **color_mode_marker),
+                              customdata=custom_data,
+                              hovertemplate=hovertemplate,
+                              name=spw_str,
+                              legendgroup=str(nspw),
+                              showlegend=True if (nfield == 0 and nc == 0) else False)
 
         if nfield == 0:
             label = ""
@@ -410,6 +478,12 @@ def target_summary_ampfreq_figure(fields, folder, show=False,
         fig['layout'][f'xaxis{label}']['title'] = 'Frequency (GHz)'
         fig['layout'][f'yaxis{label}']['title'] = 'Amplitude (Jy)'
 
+    fig = traces.figure(validate=validate)
+
+    if max_points_per_panel is not None:
+        for field, (nkept, ntotal) in panel_counts.items():
+            note_decimation(fig, field, nkept, ntotal)
+
     # Here's what needs to be updated for the colors
     # fig['data'][0]['marker']['color']
 
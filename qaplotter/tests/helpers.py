@@ -0,0 +1,69 @@
+'''
+Small synthetic plotms txt exports for the tests.
+'''
+
+import numpy as np
+
+
+colnames = ['x', 'y', 'chan', 'scan', 'field', 'ant1', 'ant2', 'ant1name',
+            'ant2name', 'time', 'freq', 'spw', 'corr', 'obs']
+
+colunits = ['None', 'Jy', 'None', 'None', 'None', 'None', 'None', 'None',
+            'None', 'MJD(seconds)', 'GHz', 'None', 'None', 'None']
+
+
+def plotms_rows(nrows, nspw=2, nant=5, nscan=3, scan=None, corrs=['RR', 'LL'], seed=0):
+    '''
+    Random data rows with the plotms column names, as a dict of arrays.
+    '''
+
+    rng = np.random.default_rng(seed)
+
+    spw = rng.integers(0, nspw, nrows)
+
+    ant1 = rng.integers(0, nant - 1, nrows)
+    ant2 = ant1 + 1 + rng.integers(0, nant - 1 - ant1)
+
+    if scan is None:
+        scans = rng.integers(1, nscan + 1, nrows)
+    else:
+        scans = np.full(nrows, scan)
+
+    return {'x': np.round(rng.random(nrows) * 100., 4),
+            'y': np.round(rng.random(nrows), 6),
+            'chan': rng.integers(0, 16, nrows),
+            'scan': scans,
+            'field': np.zeros(nrows, dtype=int),
+            'ant1': ant1,
+            'ant2': ant2,
+            'ant1name': np.char.add('ea', np.char.zfill(ant1.astype(str), 2)),
+            'ant2name': np.char.add('ea', np.char.zfill(ant2.astype(str), 2)),
+            'time': np.round(5.1e9 + 30. * scans + rng.random(nrows) * 30., 3),
+            'freq': np.round(1.0 + 0.128 * spw + 0.002 * rng.random(nrows), 6),
+            'spw': spw,
+            'corr': np.array(corrs)[rng.integers(0, len(corrs), nrows)],
+            'obs': np.zeros(nrows, dtype=int)}
+
+
+def write_plotms_txt(filename, nrows, field='3C286', vis='synthetic.ms', chan_avg=1,
+                     **kwargs):
+    '''
+    Write a plotms txt export with `nrows` random data rows. `kwargs` are passed
+    to `plotms_rows`.
+    '''
+
+    rows = plotms_rows(nrows, **kwargs)
+
+    with open(filename, 'w') as f:
+        f.write(f"# vis: {vis}\n")
+        f.write(f"# field: {field}\n")
+        f.write(f"# channel average: {chan_avg}\n")
+        f.write("# time average: 1e+06\n")
+        f.write("# From plot 0\n")
+        f.write(f"# {' '.join(colnames)}\n")
+        f.write(f"# {' '.join(colunits)}\n")
+
+        for ii in range(nrows):
+            f.write(" ".join(str(rows[colname][ii]) for colname in colnames) + "\n")
+
+    return filename
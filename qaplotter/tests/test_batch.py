@@ -0,0 +1,78 @@
+
+import os
+import time
+import multiprocessing
+
+import pytest
+
+from .. import batch
+from ..batch import make_batch_plots, load_batch_state
+
+
+def fake_make_all_plots(**kwargs):
+    '''
+    Stand-in for `make_all_plots`. The worker running the "bad" track dies, as
+    when it is killed for running out of memory.
+    '''
+
+    if os.path.basename(os.getcwd()) == 'bad':
+        os._exit(1)
+
+    # Still running when the bad track ends its worker.
+    time.sleep(0.5)
+
+    return {'plots': 0.5}
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason="The patched make_all_plots is only seen by forked workers.")
+def test_worker_dies(tmp_path, monkeypatch, capsys):
+
+    monkeypatch.setattr(batch, 'make_all_plots', fake_make_all_plots)
+
+    track_folders = []
+    for name in ['good0', 'bad', 'good1', 'good2', 'good3']:
+        os.makedirs(tmp_path / name)
+        track_folders.append(str(tmp_path / name))
+
+    state_filename = str(tmp_path / "state.json")
+
+    state = make_batch_plots(track_folders, n_workers=3, state_filename=state_filename)
+
+    output = capsys.readouterr().out
+
+    # good0 and good1 shared the pool with the bad track and were run again alone.
+    assert f"interrupted: {tmp_path / 'good0'}" in output
+    assert f"Running {tmp_path / 'good0'} alone." in output
+
+    for name in ['good0', 'good1', 'good2', 'good3']:
+        assert state[str(tmp_path / name)]['status'] == 'done'
+
+    assert state[str(tmp_path / 'bad')]['status'] == 'failed'
+    assert "when run alone" in state[str(tmp_path / 'bad')]['error']
+
+    assert load_batch_state(state_filename) == state
+
+    # A new batch skips all of them.
+    make_batch_plots(track_folders, n_workers=3, state_filename=state_filename)
+
+    assert "Running 0 of 5 tracks" in capsys.readouterr().out
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason="The patched make_all_plots is only seen by forked workers.")
+def test_resume_interrupted(tmp_path, monkeypatch, capsys):
+
+    monkeypatch.setattr(batch, 'make_all_plots', fake_make_all_plots)
+
+    os.makedirs(tmp_path / 'good0')
+    track_folder = str(tmp_path / 'good0')
+
+    # Left interrupted by a batch that was stopped.
+    state_filename = str(tmp_path / "state.json")
+    batch.save_batch_state(state_filename, {track_folder: {'status': 'interrupted'}})
+
+    state = make_batch_plots([track_folder], n_workers=3, state_filename=state_filename)
+
+    assert f"Running {track_folder} alone." in capsys.readouterr().out
+    assert state[track_folder]['status'] == 'done'
@@ -0,0 +1,196 @@
+
+import os
+import json
+
+import numpy as np
+import pytest
+
+from ..utils import read_data, table_cache
+from ..utils.read_data import read_casa_txt
+from ..utils.table_cache import (cache_filenames, load_cached_table, write_cached_table,
+                                 source_signature)
+from .helpers import write_plotms_txt
+
+
+@pytest.fixture
+def cached_txt(tmp_path):
+    '''
+    A plotms txt file with a cache entry in tmp_path / "cache".
+    '''
+
+    cache_dir = str(tmp_path / "cache")
+
+    filename = str(write_plotms_txt(tmp_path / "field_3C286_amp_chan.txt", 40))
+
+    tab, meta_dict = read_data.read_casa_txt_fast(filename)
+    write_cached_table(filename, tab, meta_dict, cache_dir=cache_dir)
+
+    assert load_cached_table(filename, cache_dir=cache_dir) is not None
+
+    return filename, cache_dir
+
+
+def count_parses(monkeypatch):
+    '''
+    Count the calls to the txt parser behind `read_casa_txt`.
+    '''
+
+    calls = []
+
+    def counting_reader(filename):
+        calls.append(filename)
+        return read_casa_txt_fast(filename)
+
+    read_casa_txt_fast = read_data.read_casa_txt_fast
+
+    monkeypatch.setattr(read_data, 'read_casa_txt_fast', counting_reader)
+
+    return calls
+
+
+def test_cache_size_change(cached_txt):
+
+    filename, cache_dir = cached_txt
+
+    stat = os.stat(filename)
+
+    # Same mtime, different size.
+    write_plotms_txt(filename, 41)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert os.stat(filename).st_size != stat.st_size
+    assert load_cached_table(filename, cache_dir=cache_dir) is None
+
+
+def test_cache_mtime_change(cached_txt):
+
+    filename, cache_dir = cached_txt
+
+    # Same size, newer mtime (e.g. rewritten by a rerun of the pipeline).
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert load_cached_table(filename, cache_dir=cache_dir) is None
+
+
+def test_cache_version_bump(cached_txt, monkeypatch):
+
+    filename, cache_dir = cached_txt
+
+    monkeypatch.setattr(table_cache, 'CACHE_VERSION', table_cache.CACHE_VERSION + 1)
+
+    assert load_cached_table(filename, cache_dir=cache_dir) is None
+
+
+@pytest.mark.parametrize('corrupt', ['half_json', 'bad_json', 'missing_json',
+                                     'half_npy', 'missing_npy'])
+def test_cache_corrupt(cached_txt, corrupt):
+
+    filename, cache_dir = cached_txt
+
+    npy_name, json_name = cache_filenames(filename, cache_dir=cache_dir)
+
+    if corrupt == 'half_json':
+        with open(json_name, 'r') as f:
+            text = f.read()
+        with open(json_name, 'w') as f:
+            f.write(text[:len(text) // 2])
+    elif corrupt == 'bad_json':
+        with open(json_name, 'w') as f:
+            f.write("not json")
+    elif corrupt == 'missing_json':
+        os.remove(json_name)
+    elif corrupt == 'half_npy':
+        with open(npy_name, 'rb') as f:
+            data = f.read()
+        with open(npy_name, 'wb') as f:
+            f.write(data[:len(data) // 2])
+    elif corrupt == 'missing_npy':
+        os.remove(npy_name)
+
+    assert load_cached_table(filename, cache_dir=cache_dir) is None
+
+    # read_casa_txt parses the txt file again and replaces the entry.
+    tab, meta_dict = read_casa_txt(filename, cache_dir=cache_dir)
+
+    cached_tab, cached_meta = load_cached_table(filename, cache_dir=cache_dir)
+
+    assert cached_meta == meta_dict
+    np.testing.assert_array_equal(cached_tab['y'], tab['y'])
+
+
+def test_cache_interrupted_write(cached_txt):
+
+    filename, cache_dir = cached_txt
+
+    npy_name, json_name = cache_filenames(filename, cache_dir=cache_dir)
+
+    # A write that stopped after the new .npy was moved into place, but before
+    # the sidecar was: the old sidecar no longer matches the source file.
+    write_plotms_txt(filename, 60)
+
+    tab, meta_dict = read_data.read_casa_txt_fast(filename)
+    np.save(npy_name, tab.as_array())
+
+    assert load_cached_table(filename, cache_dir=cache_dir) is None
+
+    with open(json_name, 'r') as f:
+        assert json.load(f)['signature'] != source_signature(filename)
+
+
+def test_read_casa_txt_cache(tmp_path, monkeypatch):
+
+    cache_dir = str(tmp_path / "cache")
+
+    filename = str(write_plotms_txt(tmp_path / "field_3C286_amp_chan.txt", 40))
+
+    calls = count_parses(monkeypatch)
+
+    tab, meta_dict = read_casa_txt(filename, cache_dir=cache_dir)
+
+    cached_tab, cached_meta = read_casa_txt(filename, cache_dir=cache_dir)
+
+    # The second read comes from the cache.
+    assert len(calls) == 1
+
+    assert cached_meta == meta_dict
+    assert cached_tab.colnames == tab.colnames
+
+    for colname in tab.colnames:
+        assert cached_tab[colname].dtype == tab[colname].dtype
+        np.testing.assert_array_equal(cached_tab[colname], tab[colname])
+
+    # The integer-coded text columns decode to the same strings.
+    assert len(tab.meta['categories']) > 0
+    assert cached_tab.meta['categories'].keys() == tab.meta['categories'].keys()
+
+    for colname, categories in tab.meta['categories'].items():
+        np.testing.assert_array_equal(cached_tab.meta['categories'][colname], categories)
+        np.testing.assert_array_equal(cached_tab.meta['categories'][colname][cached_tab[colname]],
+                                      categories[tab[colname]])
+
+    # compact_dtypes applies to cached reads too, without changing the cache.
+    compact_tab, _ = read_casa_txt(filename, cache_dir=cache_dir, compact_dtypes=True)
+    assert len(calls) == 1
+    assert compact_tab['y'].dtype == np.float32
+    assert load_cached_table(filename, cache_dir=cache_dir)[0]['y'].dtype == tab['y'].dtype
+
+    # A changed file is parsed again.
+    write_plotms_txt(filename, 41)
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    new_tab, _ = read_casa_txt(filename, cache_dir=cache_dir)
+
+    assert len(calls) == 2
+    assert len(new_tab) == 41
+
+    # refresh_cache parses even when the entry is valid.
+    read_casa_txt(filename, cache_dir=cache_dir, refresh_cache=True)
+    assert len(calls) == 3
+
+    # use_cache=False neither reads nor writes the cache.
+    other_dir = str(tmp_path / "other_cache")
+    read_casa_txt(filename, cache_dir=other_dir, use_cache=False)
+    assert len(calls) == 4
+    assert not os.path.exists(other_dir)
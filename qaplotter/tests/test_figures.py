@@ -0,0 +1,145 @@
+
+import json
+
+import pytest
+from astropy.coordinates import EarthLocation
+import astropy.units as u
+
+from .. import field_plots, target_summary_plots, amp_phase_cal_plots, bp_plots
+from ..field_plots import target_scan_figure, calibrator_scan_figure
+from ..target_summary_plots import (target_summary_amptime_figure,
+                                    target_summary_ampfreq_figure)
+from ..track_set import cal_figure_specs
+from ..utils import TrackDataset, TraceBatch, read_caltables
+from ..utils.file_index import field_tab_types
+from .helpers import write_plotms_txt
+
+
+class PerTraceBatch(TraceBatch):
+    '''
+    Add each trace to the figure one at a time, as before `TraceBatch`.
+    '''
+
+    def __init__(self, fig, scatter_plot):
+        super().__init__(fig, scatter_plot=scatter_plot)
+        self.scatter_plot = scatter_plot
+
+    def append(self, row, col, **trace_kwargs):
+        self.fig.add_trace(self.scatter_plot(**trace_kwargs), row=row, col=col)
+
+    def figure(self, validate=False):
+        return self.fig
+
+
+@pytest.fixture(autouse=True)
+def offline_sites(monkeypatch):
+    # The UTC times do not depend on the site, so avoid downloading the sites.
+    vla = EarthLocation.from_geodetic(-107.6 * u.deg, 34.08 * u.deg, 2124 * u.m)
+    monkeypatch.setattr(EarthLocation, 'of_site', lambda name: vla)
+
+
+def use_per_trace_batches(monkeypatch):
+    for module in [field_plots, target_summary_plots, amp_phase_cal_plots, bp_plots]:
+        monkeypatch.setattr(module, 'TraceBatch', PerTraceBatch)
+
+
+def assert_same_traces(fig, ref_fig):
+    '''
+    The traces of the two figures are the same once written to JSON, including
+    the subplot axes, x, y and customdata of each trace.
+    '''
+
+    traces = json.loads(fig.to_json())['data']
+    ref_traces = json.loads(ref_fig.to_json())['data']
+
+    assert len(traces) == len(ref_traces)
+    assert len(traces) > 0
+
+    for trace, ref_trace in zip(traces, ref_traces):
+        for key in ['xaxis', 'yaxis', 'x', 'y', 'customdata']:
+            assert trace.get(key) == ref_trace.get(key)
+
+        assert trace == ref_trace
+
+
+def make_track(folder):
+    '''
+    A synthetic track with one target and one calibrator field, and a small
+    set of caltables.
+    '''
+
+    for ii, tab_type in enumerate(["amp_chan", "amp_time", "amp_uvdist"]):
+        write_plotms_txt(folder / f"field_M31_{tab_type}.txt", 120, field='M31', seed=ii)
+
+    for ii, tab_type in enumerate(field_tab_types):
+        write_plotms_txt(folder / f"field_3C286_{tab_type}.txt", 120, seed=10 + ii)
+
+    ms = 'synthetic.ms'
+    for spw in range(2):
+        for kind in ['amp', 'phase']:
+            write_plotms_txt(folder / f"{ms}.finalBPcal_freq_{kind}_spw{spw}.txt", 60,
+                             nspw=1, seed=spw)
+
+    names = ['finalphasegaincal_time_phase', 'finalampgaincal_time_amp',
+             'finalampgaincal_freq_amp', 'finaldelay_freq_delay']
+    for ii, name in enumerate(names):
+        for ant in range(3):
+            write_plotms_txt(folder / f"{ms}.{name}_ant{ant}.txt", 40, seed=100 * ii + ant)
+
+    return folder
+
+
+@pytest.mark.parametrize('max_points_per_panel', [None, 30])
+def test_field_figures(tmp_path, monkeypatch, max_points_per_panel):
+
+    folder = str(make_track(tmp_path))
+
+    dataset = TrackDataset(folder, use_cache=False)
+
+    assert dataset.fieldnames == ['3C286', 'M31']
+
+    target_tables = dataset.read_field('M31')
+    calibrator_tables = dataset.read_field('3C286')
+
+    def make_figures():
+        kwargs = dict(max_points_per_panel=max_points_per_panel)
+
+        return [target_scan_figure(target_tables[0], dict(target_tables[1], intent='TARGET'),
+                                   **kwargs),
+                calibrator_scan_figure(calibrator_tables[0],
+                                       dict(calibrator_tables[1], intent='CALIBRATE'),
+                                       **kwargs),
+                target_summary_amptime_figure(['M31'], folder, dataset=dataset, **kwargs),
+                target_summary_ampfreq_figure(['M31'], folder, dataset=dataset, **kwargs)]
+
+    figs = make_figures()
+
+    with monkeypatch.context() as patch:
+        use_per_trace_batches(patch)
+        ref_figs = make_figures()
+
+    for fig, ref_fig in zip(figs, ref_figs):
+        assert_same_traces(fig, ref_fig)
+
+
+def test_cal_figures(tmp_path, monkeypatch):
+
+    folder = str(make_track(tmp_path))
+
+    families = ['bandpass', 'phasegaincal', 'ampgaincal_time', 'ampgaincal_freq', 'delay']
+
+    caltables = read_caltables(folder, families=families, use_cache=False)
+
+    for family in families:
+        _, _, fig_func, fig_kwargs = cal_figure_specs[family]
+
+        figs = fig_func(*caltables[family], **fig_kwargs)
+
+        with monkeypatch.context() as patch:
+            use_per_trace_batches(patch)
+            ref_figs = fig_func(*caltables[family], **fig_kwargs)
+
+        assert len(figs) == len(ref_figs)
+
+        for fig, ref_fig in zip(figs, ref_figs):
+            assert_same_traces(fig, ref_fig)
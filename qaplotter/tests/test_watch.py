@@ -0,0 +1,56 @@
+
+from .. import watch
+from ..watch import field_units, watch_track
+from .helpers import write_plotms_txt
+
+
+target_tab_types = ['amp_chan', 'amp_time', 'amp_uvdist']
+
+
+def test_field_units(tmp_path):
+
+    for tab_type in target_tab_types:
+        write_plotms_txt(tmp_path / f"field_M31_{tab_type}.txt", 40)
+
+    # Still being written
+    write_plotms_txt(tmp_path / "field_M33_amp_chan.txt", 40)
+
+    units = field_units(str(tmp_path))
+
+    assert units['M31'][1]
+    assert not units['M33'][1]
+
+    # A change to one field leaves the other's snapshot as it was.
+    write_plotms_txt(tmp_path / "field_M33_amp_time.txt", 40)
+
+    new_units = field_units(str(tmp_path))
+
+    assert new_units['M31'][0] == units['M31'][0]
+    assert new_units['M33'][0] != units['M33'][0]
+
+
+def test_watch_track_only_complete_fields(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+
+    (tmp_path / "scan_plots_txt").mkdir()
+
+    for tab_type in target_tab_types:
+        write_plotms_txt(tmp_path / "scan_plots_txt" / f"field_M31_{tab_type}.txt", 40)
+
+    write_plotms_txt(tmp_path / "scan_plots_txt" / "field_M33_amp_chan.txt", 40)
+
+    calls = []
+
+    def fake_make_all_plots(**kwargs):
+        calls.append(kwargs)
+
+    monkeypatch.setattr(watch, 'make_all_plots', fake_make_all_plots)
+
+    watch_track(poll_interval=0, settle_time=0, max_idle=0)
+
+    # M33 is not complete, so is left out of the rebuild.
+    assert len(calls) == 1
+    assert calls[0]['only_fields'] == ['M31']
+    assert calls[0]['only_families'] == []
+    assert 'field plots' in calls[0]['only_stages']
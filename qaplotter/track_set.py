@@ -1,30 +1,51 @@
 
 from glob import glob
 import os
+import sys
 import warnings
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 from astropy.table import table
 import numpy as np
 
-from .utils import (read_field_data_tables,
-                    read_bpcal_data_tables,
-                    read_delay_data_tables,
-                    read_BPinitialgain_data_tables,
-                    read_phaseshortgaincal_data_tables,
-                    read_ampgaincal_time_data_tables,
-                    read_ampgaincal_freq_data_tables,
-                    read_phasegaincal_data_tables,
-                    load_spwdict)
+from .utils import (read_caltables,
+                    build_caltable_txt_index,
+                    select_caltable_files,
+                    caltable_specs,
+                    index_signature,
+                    run_stages,
+                    print_stage_times,
+                    load_spwdict,
+                    invalidate_cache,
+                    TrackDataset,
+                    load_manifest,
+                    save_manifest,
+                    make_entry,
+                    is_up_to_date,
+                    input_signatures,
+                    measure,
+                    start_instrumentation,
+                    stop_instrumentation,
+                    instrumentation_enabled,
+                    pop_records,
+                    add_records,
+                    make_report,
+                    write_report,
+                    profiled,
+                    write_html_atomic)
 
 from .parse_weblog import (get_field_intents,
                            extract_manual_flagging_log,
-                           extract_msname)
+                           extract_msname,
+                           source_table_filename)
 
 from .field_plots import target_scan_figure, calibrator_scan_figure
 
 from .target_summary_plots import target_summary_ampfreq_figure, target_summary_amptime_figure
 
-from .quicklook_target_imaging import make_quicklook_figures
+from .quicklook_target_imaging import make_quicklook_figures, quicklook_image_names
 
 from .bp_plots import bp_amp_phase_figures
 
@@ -33,33 +54,92 @@ from .amp_phase_cal_plots import (phase_gain_figures, amp_gain_time_figures,
 
 from .html_linking import (make_all_html_links, make_html_homepage,
                            make_caltable_all_html_links,
-                           make_quicklook_html_links)
+                           make_quicklook_html_links,
+                           make_report_html_page)
 
 
+@profiled('field_plots')
 def make_field_plots(msname, folder, output_folder, save_fieldnames=False,
                      flagging_sheet_link=None, corrs=['RR', 'LL'],
-                     spw_dict=None, show_target_linesonly=True):
+                     spw_dict=None, show_target_linesonly=True,
+                     use_cache=True, cache_dir=None, refresh_cache=False,
+                     read_workers=None, max_table_bytes=4 * 1024**3,
+                     dataset=None, compact_dtypes=False, stream_above=None,
+                     stream_kwargs=None, n_workers=1, max_in_flight=None,
+                     incremental=False, profile=None, preview_rows=None,
+                     max_points_per_panel=None, only_fields=None):
     '''
     Make all scan plots into an HTML for each target.
+
+    The parsed txt tables are kept in a binary cache (see `use_cache`, `cache_dir`)
+    so re-running on the same track skips parsing the txt files. Use
+    `refresh_cache=True` to discard existing cache entries for this folder.
+    Per-scan txt files are read with `read_workers` threads.
+
+    The tables are read through a `TrackDataset`, which keeps up to `max_table_bytes`
+    of tables in memory so each field is read once for the per-field and the
+    target summary figures. An existing `dataset` for `folder` can be given instead.
+    `compact_dtypes=True` downcasts the numeric columns to reduce the memory used
+    by the tables (see `compact_table`). txt files larger than `stream_above` bytes
+    are reduced to a bounded number of rows while reading (see
+    `read_casa_txt_streaming` for the `stream_kwargs`).
+
+    With `n_workers` > 1, the per-field figures are made in a pool of processes
+    that each read, plot and write their own fields (see `run_field_workers`).
+    The output is the same as with one worker.
+
+    The txt files and options used for each figure are recorded in a manifest in
+    `output_folder`. With `incremental=True`, only the figures whose txt files or
+    options changed since the last run are remade. The linking pages are always
+    remade.
+
+    `profile` turns on cProfile and/or tracemalloc profiling with the results
+    written to `output_folder` (see `profile_block`). The QAPLOTTER_PROFILE
+    environment variable is used when it is None.
+
+    With `preview_rows`, the tables are reduced to at most that many rows per SPW
+    and correlation before plotting (see `decimate_table`) and the figures are
+    marked as previews. With `incremental=True`, figures already made at full
+    resolution from the same txt files are kept.
+
+    `max_points_per_panel` limits the points in each panel of the field and
+    target summary figures, keeping the extremes (see `target_scan_figure`).
+
+    `only_fields` limits the figures made to these fields, e.g. the fields whose
+    txt files have finished writing (see `watch_track`). The other fields keep
+    the figures from the last run and are left off the linking pages if they
+    have none. The target summaries are only remade when all of the target
+    fields are in `only_fields`.
     '''
 
-    # Grab all text files.
-    txt_files = glob(f"{folder}/*.txt")
+    # The dataset lists the folder once and shares the index with all of the readers.
+    if dataset is None:
+        dataset = TrackDataset(folder, max_bytes=max_table_bytes,
+                               use_cache=use_cache, cache_dir=cache_dir,
+                               read_workers=read_workers,
+                               compact_dtypes=compact_dtypes,
+                               stream_above=stream_above,
+                               stream_kwargs=stream_kwargs,
+                               preview_rows=preview_rows)
+
+    if refresh_cache:
+        invalidate_cache(dataset.txt_filenames(), cache_dir=cache_dir)
 
     # Make output folder if it doesn't exist
     if not os.path.exists(output_folder):
         os.mkdir(output_folder)
 
-    def get_fieldname(filename):
-        if "scan_" in filename:
-            return "_".join(os.path.basename(filename).split("_")[1:-3])
-        return "_".join(os.path.basename(filename).split("_")[1:-2])
+    manifest = load_manifest(output_folder)
+    new_manifest = dict(manifest, figures={})
 
-    fieldnames = [get_fieldname(filename) for filename in txt_files
-                  if os.path.getsize(filename) > 1000]
+    field_htmls = {field: f"{field}_plotly_interactive.html" for field in dataset.fieldnames}
 
     # Get unique names only
-    fieldnames = sorted(list(set(fieldnames)))
+    if only_fields is None:
+        fieldnames = dataset.fieldnames
+    else:
+        fieldnames = [field for field in dataset.fieldnames
+                      if field in only_fields or field_htmls[field] in manifest['figures']]
 
     if save_fieldnames:
         field_txtfilename = f"{output_folder}/fieldnames.txt"
@@ -72,240 +152,567 @@ def make_field_plots(msname, folder, output_folder, save_fieldnames=False,
             for field in fieldnames:
                 f.write(f"{field}\n")
 
-    meta_dict_0 = read_field_data_tables(fieldnames[0], folder)[1]['amp_time']
+    fig_kwargs = dict(msname=msname, output_folder=output_folder, corrs=corrs,
+                      spw_dict=spw_dict, show_target_linesonly=show_target_linesonly,
+                      max_points_per_panel=max_points_per_panel)
 
-    field_intents = {}
+    # Everything that changes the figures besides the txt files. The intents
+    # come from the weblog, so its source table is an input for every field.
+    options = dict(msname=msname, corrs=corrs, spw_dict=spw_dict,
+                   show_target_linesonly=show_target_linesonly,
+                   compact_dtypes=dataset.compact_dtypes,
+                   stream_above=dataset.stream_above,
+                   stream_kwargs=dataset.stream_kwargs,
+                   preview_rows=dataset.preview_rows,
+                   max_points_per_panel=max_points_per_panel)
 
-    for i, field in enumerate(fieldnames):
+    weblog_inputs = input_signatures([source_table_filename(msname)])
 
-        table_dict, meta_dict = read_field_data_tables(field, folder)
+    field_inputs = {field: {**dataset.input_signatures(field), **weblog_inputs}
+                    for field in fieldnames}
 
-        try:
-            field_intent = get_field_intents(field, msname)
-        except Exception as exc:
-            warnings.warn(f"Unable to find field intent. Raise exception: {exc}")
-            field_intent = ''
-
-        meta_dict['intent'] = field_intent
+    if only_fields is None:
+        fields_to_plot = fieldnames
+    else:
+        fields_to_plot = [field for field in fieldnames if field in only_fields]
 
-        field_intents[field] = field_intent
+    if incremental:
+        fields_to_plot = [field for field in fields_to_plot
+                          if not figure_up_to_date(manifest, field_htmls[field],
+                                                   field_inputs[field], options,
+                                                   output_folder)]
 
-        # Target
-        if len(table_dict.keys()) == 3:
+        print(f"Remaking {len(fields_to_plot)} of {len(fieldnames)} field figures.")
 
-            fig = target_scan_figure(table_dict, meta_dict, show=False, corrs=corrs,
-                                     spw_dict=spw_dict,
-                                     show_linesonly=show_target_linesonly)
+    # Only the MS name is used from the meta-data on the linking pages. Take it
+    # from the manifest when the first field is unchanged.
+    if fieldnames[0] not in fields_to_plot and 'ms_info' in manifest:
+        meta_dict_0 = manifest['ms_info']
+    else:
+        meta_dict_0 = dataset.read_field(fieldnames[0])[1]['amp_time']
 
-        # 10 with amp/phase versus ant 1. 8 without.
-        elif len(table_dict.keys()) == 10 or len(table_dict.keys()) == 8:
+    new_manifest['ms_info'] = {'vis': meta_dict_0['vis']}
 
-            fig = calibrator_scan_figure(table_dict, meta_dict, show=False, corrs=corrs,
-                                         spw_dict=spw_dict)
+    if n_workers is None or n_workers <= 1:
+        plotted_intents = {}
 
-        else:
-            raise ValueError(f"Found {len(table_dict.keys())} tables for {field} instead of 3 or 10.")
+        for field in fields_to_plot:
+            plotted_intents[field] = make_field_figure(field, dataset, **fig_kwargs)
 
-        out_html_name = f"{field}_plotly_interactive.html"
-        fig.write_html(f"{output_folder}/{out_html_name}")
+    else:
+        # Each worker reads its own fields. Keep only the field being plotted in
+        # memory in each worker.
+        dataset_kwargs = dict(max_bytes=0, use_cache=dataset.use_cache,
+                              cache_dir=dataset.cache_dir,
+                              read_workers=dataset.read_workers,
+                              file_index=dataset.file_index,
+                              compact_dtypes=dataset.compact_dtypes,
+                              stream_above=dataset.stream_above,
+                              stream_kwargs=dataset.stream_kwargs,
+                              preview_rows=dataset.preview_rows)
+
+        plotted_intents = run_field_workers(fields_to_plot, dataset.folder,
+                                            dataset_kwargs, fig_kwargs,
+                                            n_workers=n_workers,
+                                            max_in_flight=max_in_flight)
+
+    # Keep the field order the same as the serial mode.
+    field_intents = {}
 
-    # Create summary tables using all target fields
-    target_fields = []
+    for field in fieldnames:
+        html_name = field_htmls[field]
 
-    for i, field in enumerate(fieldnames):
+        if field in plotted_intents:
+            field_intents[field] = plotted_intents[field]
 
-        table_dict, meta_dict = read_field_data_tables(field, folder)
+            new_manifest['figures'][html_name] = make_entry(field_inputs[field], options,
+                                                            [html_name],
+                                                            intent=field_intents[field])
+        else:
+            field_intents[field] = manifest['figures'][html_name]['intent']
 
-        try:
-            field_intent = get_field_intents(field, msname)
-        except Exception as exc:
-            warnings.warn(f"Unable to find field intent. Raise exception: {exc}")
-            field_intent = ''
+            new_manifest['figures'][html_name] = manifest['figures'][html_name]
 
-        if "target" in field_intent.lower():
-            target_fields.append(field)
+    # Create summary tables using all target fields
+    target_fields = [field for field in fieldnames
+                     if "target" in field_intents[field].lower()]
 
     # Create target field summary plots
     # First check that there were target fields.
 
     if len(target_fields) > 0:
 
-        try:
-            fig_summ_time = target_summary_amptime_figure(target_fields, folder,
-                                                        corrs=corrs,
-                                                        spw_dict=spw_dict,
-                                                        show_linesonly=show_target_linesonly)
-            out_html_name = f"target_amptime_summary_plotly_interactive.html"
-            fig_summ_time.write_html(f"{output_folder}/{out_html_name}")
-        except Exception as exc:
-            warnings.warn("Unable to make summary amp-time figure."
-                          f" Raise exception {exc}")
-
-        try:
-            fig_summ_freq = target_summary_ampfreq_figure(target_fields, folder,
-                                                        corrs=corrs,
-                                                        spw_dict=spw_dict,
-                                                        show_linesonly=show_target_linesonly)
-            out_html_name = f"target_ampfreq_summary_plotly_interactive.html"
-            fig_summ_freq.write_html(f"{output_folder}/{out_html_name}")
-        except Exception as exc:
-            warnings.warn("Unable to make summary amp-freq figure."
-                          f" Raise exception {exc}")
+        summary_inputs = {path: signature
+                          for field in target_fields
+                          for path, signature in field_inputs[field].items()}
+
+        summary_figures = {"target_amptime_summary_plotly_interactive.html":
+                           (target_summary_amptime_figure, "amp-time"),
+                           "target_ampfreq_summary_plotly_interactive.html":
+                           (target_summary_ampfreq_figure, "amp-freq")}
+
+        # Target fields whose txt files may still be changing.
+        unready_targets = [field for field in target_fields
+                           if only_fields is not None and field not in only_fields]
+
+        for out_html_name, (summary_func, label) in summary_figures.items():
+
+            if len(unready_targets) > 0:
+                print(f"Waiting for {', '.join(unready_targets)} to remake the "
+                      f"target {label} summary.")
+
+                if out_html_name in manifest['figures']:
+                    new_manifest['figures'][out_html_name] = manifest['figures'][out_html_name]
+
+                continue
+
+            if incremental and figure_up_to_date(manifest, out_html_name, summary_inputs,
+                                                 options, output_folder):
+                new_manifest['figures'][out_html_name] = manifest['figures'][out_html_name]
+                continue
+
+            try:
+                with measure('figure', f"target {label} summary"):
+                    fig_summ = summary_func(target_fields, folder,
+                                            corrs=corrs,
+                                            spw_dict=spw_dict,
+                                            show_linesonly=show_target_linesonly,
+                                            dataset=dataset,
+                                            max_points_per_panel=max_points_per_panel)
+
+                if dataset.preview_rows is not None:
+                    mark_preview(fig_summ, dataset.preview_rows)
+
+                with measure('write_html', f"target {label} summary"):
+                    write_html_atomic(fig_summ, f"{output_folder}/{out_html_name}")
+            except Exception as exc:
+                warnings.warn(f"Unable to make summary {label} figure."
+                              f" Raise exception {exc}")
+                continue
+
+            new_manifest['figures'][out_html_name] = make_entry(summary_inputs, options,
+                                                                [out_html_name])
+
+    save_manifest(output_folder, new_manifest)
 
     # Make the linking files into the same folder.
     make_all_html_links(flagging_sheet_link, output_folder, field_intents, meta_dict_0)
 
 
-def make_all_cal_plots(flagging_sheet_link, folder, output_folder):
+def make_field_figure(field, dataset, msname, output_folder, corrs=['RR', 'LL'],
+                      spw_dict=None, show_target_linesonly=True,
+                      max_points_per_panel=None):
+    '''
+    Make and write the scan figure for one field. Returns the field intent.
+    '''
 
-    fig_names = {}
+    table_dict, meta_dict = dataset.read_field(field)
 
-    # Bandpass plots
+    # Copy so the intent is not added to the dataset's meta-data.
+    meta_dict = dict(meta_dict)
 
-    table_dict, meta_dict = read_bpcal_data_tables(folder)
+    try:
+        field_intent = get_field_intents(field, msname)
+    except Exception as exc:
+        warnings.warn(f"Unable to find field intent. Raise exception: {exc}")
+        field_intent = ''
 
-    # Check if files exist. If not, skip.
-    key0 = list(table_dict.keys())[0]
-    if len(table_dict[key0]) > 0:
+    meta_dict['intent'] = field_intent
 
-        meta_dict_0 = meta_dict['amp'][list(meta_dict['amp'].keys())[0]]
+    # Target
+    if len(table_dict.keys()) == 3:
 
-        figs = bp_amp_phase_figures(table_dict, meta_dict,
-                                    nspw_per_figure=4)
+        with measure('figure', field):
+            fig = target_scan_figure(table_dict, meta_dict, show=False, corrs=corrs,
+                                     spw_dict=spw_dict,
+                                     show_linesonly=show_target_linesonly,
+                                     max_points_per_panel=max_points_per_panel)
 
-        # Make output folder if it doesn't exist
-        if not os.path.exists(output_folder):
-            os.mkdir(output_folder)
+    # 10 with amp/phase versus ant 1. 8 without.
+    elif len(table_dict.keys()) == 10 or len(table_dict.keys()) == 8:
 
-        label = 'Bandpass'
+        with measure('figure', field):
+            fig = calibrator_scan_figure(table_dict, meta_dict, show=False, corrs=corrs,
+                                         spw_dict=spw_dict,
+                                         max_points_per_panel=max_points_per_panel)
 
-        for i, fig in enumerate(figs):
+    else:
+        raise ValueError(f"Found {len(table_dict.keys())} tables for {field} instead of 3 or 10.")
 
-            out_html_name = f"BP_amp_phase_plotly_interactive_{i}.html"
-            fig.write_html(f"{output_folder}/{out_html_name}")
+    if dataset.preview_rows is not None:
+        mark_preview(fig, dataset.preview_rows)
 
-            fig_names[f"{label} {i+1}"] = out_html_name
+    out_html_name = f"{field}_plotly_interactive.html"
 
-    # Phase gain cal
-    table_dict, meta_dict = read_phasegaincal_data_tables(folder)
+    with measure('write_html', field):
+        write_html_atomic(fig, f"{output_folder}/{out_html_name}")
 
-    key0 = list(table_dict.keys())[0]
-    if len(table_dict[key0]) > 0:
+    return field_intent
 
-        label = 'Phase Gain Time'
 
-        figs = phase_gain_figures(table_dict, meta_dict,
-                                nant_per_figure=8,)
+def mark_preview(fig, preview_rows):
+    '''
+    Add a note to the figure title that it is a preview made from at most
+    `preview_rows` points per SPW and correlation.
+    '''
 
-        for i, fig in enumerate(figs):
+    note = (f"PREVIEW: up to {preview_rows} points per SPW and correlation. "
+            "The full resolution figure will replace this page.")
 
-            out_html_name = f"phasegain_time_plotly_interactive_{i}.html"
-            fig.write_html(f"{output_folder}/{out_html_name}")
+    title = fig.layout.title.text
 
-            fig_names[f"{label} {i+1}"] = out_html_name
+    fig.update_layout(title_text=note if title is None else f"{title}<br>{note}")
 
-    # Amp gain cal time
-    table_dict, meta_dict = read_ampgaincal_time_data_tables(folder)
 
-    key0 = list(table_dict.keys())[0]
-    if len(table_dict[key0]) > 0:
+def figure_up_to_date(manifest, name, inputs, options, output_folder):
+    '''
+    `is_up_to_date` for figures that can be previews. A preview (`options` with
+    a `preview_rows`) is also up to date when the full resolution figure is, so
+    a preview never replaces it.
+    '''
 
-        label = 'Amp Gain Time'
+    if is_up_to_date(manifest, name, inputs, options, output_folder):
+        return True
 
-        figs = amp_gain_time_figures(table_dict, meta_dict,
-                                    nant_per_figure=8,)
+    if options.get('preview_rows') is None:
+        return False
 
-        for i, fig in enumerate(figs):
+    return is_up_to_date(manifest, name, inputs, dict(options, preview_rows=None),
+                         output_folder)
 
-            out_html_name = f"ampgain_time_plotly_interactive_{i}.html"
-            fig.write_html(f"{output_folder}/{out_html_name}")
 
-            fig_names[f"{label} {i+1}"] = out_html_name
+# The dataset used by the field workers in each process. See `run_field_workers`.
+_worker_dataset = None
 
-    # Amp gain cal freq
-    table_dict, meta_dict = read_ampgaincal_freq_data_tables(folder)
 
-    key0 = list(table_dict.keys())[0]
-    if len(table_dict[key0]) > 0:
+def _init_field_worker(folder, dataset_kwargs, instrument=False):
+    global _worker_dataset
+    _worker_dataset = TrackDataset(folder, **dataset_kwargs)
 
-        figs = amp_gain_freq_figures(table_dict, meta_dict,
-                                    nant_per_figure=8,)
-        label = 'Amp Gain Freq'
+    # Forked workers start with a copy of the parent's records, so always reset.
+    if instrument:
+        start_instrumentation()
+    else:
+        stop_instrumentation()
 
-        for i, fig in enumerate(figs):
 
-            out_html_name = f"ampgain_freq_plotly_interactive_{i}.html"
-            fig.write_html(f"{output_folder}/{out_html_name}")
+def _field_worker(field, fig_kwargs):
+    field_intent = make_field_figure(field, _worker_dataset, **fig_kwargs)
+    return field_intent, pop_records()
 
-            fig_names[f"{label} {i+1}"] = out_html_name
 
-    # Delay
-    table_dict, meta_dict = read_delay_data_tables(folder)
+def run_field_workers(fieldnames, folder, dataset_kwargs, fig_kwargs, n_workers=4,
+                      max_in_flight=None):
+    '''
+    Make the per-field figures with a pool of `n_workers` processes. Each process
+    reads its fields through its own `TrackDataset` (created with `dataset_kwargs`)
+    and writes the HTML itself, so only the field intent is sent back.
 
-    # Check if files exist. If not, skip.
-    key0 = list(table_dict.keys())[0]
-    if len(table_dict[key0]) > 0:
+    At most `max_in_flight` fields (default is twice `n_workers`) are submitted at
+    a time. Returns a dict of field -> intent.
+    '''
 
-        figs = delay_freq_figures(table_dict, meta_dict,
-                                nant_per_figure=8,)
-        label = 'Delay'
+    if max_in_flight is None:
+        max_in_flight = 2 * n_workers
 
-        for i, fig in enumerate(figs):
+    field_intents = {}
 
-            out_html_name = f"delay_plotly_interactive_{i}.html"
-            fig.write_html(f"{output_folder}/{out_html_name}")
+    fields_to_submit = iter(fieldnames)
 
-            fig_names[f"{label} {i+1}"] = out_html_name
+    initargs = (folder, dataset_kwargs, instrumentation_enabled())
 
-    # phase short gain cal
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_field_worker,
+                             initargs=initargs) as executor:
 
-    # Check if files exist. If not, skip.
-    table_dict, meta_dict = read_phaseshortgaincal_data_tables(folder)
+        pending = {}
 
-    key0 = list(table_dict.keys())[0]
-    if len(table_dict[key0]) > 0:
+        def submit_next():
+            field = next(fields_to_submit, None)
+            if field is not None:
+                pending[executor.submit(_field_worker, field, fig_kwargs)] = field
+
+        for _ in range(max_in_flight):
+            submit_next()
 
-        label = 'Phase (short) gain'
+        while len(pending) > 0:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
 
-        figs = phase_gain_figures(table_dict, meta_dict,
-                                nant_per_figure=8,)
+            for future in done:
+                field = pending.pop(future)
+                field_intents[field], records = future.result()
 
-        for i, fig in enumerate(figs):
+                add_records(records)
 
-            out_html_name = f"phaseshortgaincal_plotly_interactive_{i}.html"
-            fig.write_html(f"{output_folder}/{out_html_name}")
+                submit_next()
 
-            fig_names[f"{label} {i+1}"] = out_html_name
+    return field_intents
 
-    # BP init phase
-    table_dict, meta_dict = read_BPinitialgain_data_tables(folder)
+
+# Figures made for each caltable family: (link label, HTML name prefix, figure
+# function, keyword arguments). The order sets the order of the linking pages.
+cal_figure_specs = {'bandpass': ('Bandpass', 'BP_amp_phase',
+                                 bp_amp_phase_figures, dict(nspw_per_figure=4)),
+                    'phasegaincal': ('Phase Gain Time', 'phasegain_time',
+                                     phase_gain_figures, dict(nant_per_figure=8)),
+                    'ampgaincal_time': ('Amp Gain Time', 'ampgain_time',
+                                        amp_gain_time_figures, dict(nant_per_figure=8)),
+                    'ampgaincal_freq': ('Amp Gain Freq', 'ampgain_freq',
+                                        amp_gain_freq_figures, dict(nant_per_figure=8)),
+                    'delay': ('Delay', 'delay',
+                              delay_freq_figures, dict(nant_per_figure=8)),
+                    'phaseshortgaincal': ('Phase (short) gain', 'phaseshortgaincal',
+                                          phase_gain_figures, dict(nant_per_figure=8)),
+                    'BPinitialgain': ('BP Initial Gain', 'BPinit_phase',
+                                      phase_gain_figures, dict(nant_per_figure=8)),
+                    }
+
+
+def make_cal_family_figures(family, table_dict, meta_dict, output_folder,
+                            preview_rows=None):
+    '''
+    Make and write the figures for one caltable family. Returns a dict of
+    link label -> HTML name and the MS info for the linking pages, or an empty
+    dict and None when the family has no tables. The figures are marked as
+    previews when the tables were reduced to `preview_rows`.
+    '''
 
     # Check if files exist. If not, skip.
     key0 = list(table_dict.keys())[0]
-    if len(table_dict[key0]) > 0:
+    if len(table_dict[key0]) == 0:
+        return {}, None
+
+    # Make output folder if it doesn't exist. Other processes may be making
+    # the same folder.
+    os.makedirs(output_folder, exist_ok=True)
+
+    label, html_prefix, fig_func, fig_kwargs = cal_figure_specs[family]
+
+    with measure('figure', family):
+        figs = fig_func(table_dict, meta_dict, **fig_kwargs)
+
+    fig_names = {}
+
+    for i, fig in enumerate(figs):
+
+        out_html_name = f"{html_prefix}_plotly_interactive_{i}.html"
+
+        if preview_rows is not None:
+            mark_preview(fig, preview_rows)
+
+        with measure('write_html', f"{family} {i}"):
+            write_html_atomic(fig, f"{output_folder}/{out_html_name}")
+
+        fig_names[f"{label} {i+1}"] = out_html_name
+
+    # Only the MS name is used on the linking pages.
+    meta_dict_0 = meta_dict[key0][list(meta_dict[key0].keys())[0]]
+    ms_info = {'vis': meta_dict_0['vis']}
+
+    return fig_names, ms_info
+
+
+def _cal_family_worker(family, folder, output_folder, file_index, read_kwargs,
+                       instrument=False):
+
+    # Forked workers start with a copy of the parent's records, so always reset.
+    if instrument:
+        start_instrumentation()
+    else:
+        stop_instrumentation()
+
+    with measure('read', family):
+        caltables = read_caltables(folder, families=[family], file_index=file_index,
+                                   **read_kwargs)
+
+    fig_names, ms_info = make_cal_family_figures(family, *caltables[family],
+                                                 output_folder,
+                                                 preview_rows=read_kwargs.get('preview_rows'))
+
+    return fig_names, ms_info, stop_instrumentation()
+
+
+def run_cal_family_workers(families, folder, output_folder, file_index, read_kwargs,
+                           n_workers=4):
+    '''
+    Read and plot each caltable family in a pool of `n_workers` processes. Each
+    process writes its own figures, so only the link labels and HTML names are
+    sent back. Returns a dict of family -> (fig_names, ms_info).
+    '''
+
+    instrument = instrumentation_enabled()
+
+    results = {}
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+
+        futures = {family: executor.submit(_cal_family_worker, family, folder,
+                                           output_folder, file_index, read_kwargs,
+                                           instrument=instrument)
+                   for family in families}
+
+        for family, future in futures.items():
+            fig_names, ms_info, records = future.result()
+
+            add_records(records)
+
+            results[family] = (fig_names, ms_info)
+
+    return results
+
+
+@profiled('cal_plots')
+def make_all_cal_plots(flagging_sheet_link, folder, output_folder,
+                       use_cache=True, cache_dir=None, refresh_cache=False,
+                       read_workers=None, compact_dtypes=False, incremental=False,
+                       profile=None, n_workers=1, preview_rows=None, only_families=None):
+    '''
+    Make the figures for each caltable family in `folder` and the pages linking them.
+
+    The txt files used for each family are recorded in a manifest in `output_folder`.
+    With `incremental=True`, only the families whose txt files changed since the
+    last run are read and plotted again.
+
+    `profile` turns on cProfile and/or tracemalloc profiling with the results
+    written to `output_folder` (see `profile_block`).
+
+    With `n_workers` > 1, the families are read and plotted at the same time in a
+    pool of processes (see `run_cal_family_workers`).
+
+    With `preview_rows`, the tables are reduced to at most that many rows per SPW
+    and correlation before plotting and the figures are marked as previews (see
+    `make_field_plots`).
+
+    `only_families` limits the figures made to these keys of `cal_figure_specs`.
+    The other families keep the figures from the last run, if any (see
+    `make_field_plots` for `only_fields`).
+    '''
+
+    if refresh_cache:
+        invalidate_cache(glob(f"{folder}/*.txt"), cache_dir=cache_dir)
 
-        figs = phase_gain_figures(table_dict, meta_dict,
-                                nant_per_figure=8,)
+    # List the folder once for all families.
+    file_index = build_caltable_txt_index(folder)
 
-        label = 'BP Initial Gain'
+    family_inputs = {}
 
-        for i, fig in enumerate(figs):
+    for family in cal_figure_specs:
+        tab_files = select_caltable_files(file_index.get(family, {}),
+                                          caltable_specs[family])
 
-            out_html_name = f"BPinit_phase_plotly_interactive_{i}.html"
-            fig.write_html(f"{output_folder}/{out_html_name}")
+        family_inputs[family] = {file_info['path']: index_signature(file_info)
+                                 for number_dict in tab_files.values()
+                                 for file_info in number_dict.values()}
 
-            fig_names[f"{label} {i+1}"] = out_html_name
+    options = dict(compact_dtypes=compact_dtypes, preview_rows=preview_rows)
+
+    manifest = load_manifest(output_folder)
+    new_manifest = dict(manifest, figures={})
+
+    if only_families is None:
+        families_to_plot = list(cal_figure_specs)
+    else:
+        families_to_plot = [family for family in cal_figure_specs if family in only_families]
+
+    if incremental:
+        families_to_plot = [family for family in families_to_plot
+                            if not figure_up_to_date(manifest, family, family_inputs[family],
+                                                     options, output_folder)]
+
+        print(f"Remaking the figures for {len(families_to_plot)} of "
+              f"{len(cal_figure_specs)} caltable families.")
+
+    read_kwargs = dict(use_cache=use_cache, cache_dir=cache_dir,
+                       read_workers=read_workers, compact_dtypes=compact_dtypes,
+                       preview_rows=preview_rows)
+
+    if n_workers is None or n_workers <= 1 or len(families_to_plot) <= 1:
+
+        with measure('read', 'caltables'):
+            caltables = read_caltables(folder, families=families_to_plot,
+                                       file_index=file_index, **read_kwargs)
+
+        family_results = {}
+
+        for family in families_to_plot:
+            family_results[family] = make_cal_family_figures(family, *caltables[family],
+                                                             output_folder,
+                                                             preview_rows=preview_rows)
+
+    else:
+        family_results = run_cal_family_workers(families_to_plot, folder, output_folder,
+                                                file_index, read_kwargs,
+                                                n_workers=n_workers)
+
+    fig_names = {}
+
+    for family in cal_figure_specs:
+
+        if family not in families_to_plot:
+            # Not selected with `only_families` and never plotted.
+            if family not in manifest['figures']:
+                continue
+
+            entry = manifest['figures'][family]
+
+        else:
+            family_fig_names, ms_info = family_results[family]
+
+            entry = make_entry(family_inputs[family], options,
+                               family_fig_names.values(),
+                               fig_names=family_fig_names, ms_info=ms_info)
+
+        new_manifest['figures'][family] = entry
+
+        fig_names.update(entry['fig_names'])
 
     if len(fig_names) > 0:
 
-        make_caltable_all_html_links(flagging_sheet_link, output_folder, fig_names, meta_dict_0)
+        save_manifest(output_folder, new_manifest)
 
+        # The MS name from the first family with figures.
+        ms_info_dict = [entry['ms_info'] for entry in new_manifest['figures'].values()
+                        if entry['ms_info'] is not None][0]
 
+        make_caltable_all_html_links(flagging_sheet_link, output_folder, fig_names,
+                                     ms_info_dict)
+
+
+@profiled('quicklook_plots')
 def make_all_quicklook_plots(flagging_sheet_link, folder="quicklook_imaging",
-                             output_folder="quicklook_imaging_figures"):
+                             output_folder="quicklook_imaging_figures",
+                             incremental=False, profile=None):
+    '''
+    Make the quicklook image figures and the pages linking them.
 
-    # Generate the quicklook plots.
-    target_dict, summary_filenames = make_quicklook_figures(folder, output_folder)
+    The images used are recorded in a manifest in `output_folder`. With
+    `incremental=True`, the figures are only remade when an image was added,
+    removed or changed. The noise summaries use every image, so all of the
+    figures are remade together.
+
+    `profile` turns on cProfile and/or tracemalloc profiling with the results
+    written to `output_folder` (see `profile_block`).
+    '''
+
+    inputs = input_signatures(quicklook_image_names(folder))
+
+    manifest = load_manifest(output_folder)
+
+    if incremental and is_up_to_date(manifest, 'quicklook', inputs, {}, output_folder):
+        print("No changes to the quicklook images. Only remaking the linking pages.")
+
+        entry = manifest['figures']['quicklook']
+
+        target_dict = entry['target_dict']
+        summary_filenames = entry['summary_filenames']
+
+    else:
+        # Generate the quicklook plots.
+        target_dict, summary_filenames = make_quicklook_figures(folder, output_folder)
+
+        entry = make_entry(inputs, {}, list(target_dict.values()) + summary_filenames,
+                           target_dict=target_dict, summary_filenames=summary_filenames)
+
+    save_manifest(output_folder, dict(manifest, figures={'quicklook': entry}))
 
     # Identify if these are continuum or line plots
     # The line plots will tend to be larger, so we just want to
@@ -335,6 +742,29 @@ def make_all_plots(msname=None,
                    manualflag_tablename='manualflag_check.html',
                    spwdict_filename="spw_definitions.npy",
                    show_target_linesonly=True,
+                   use_cache=True,
+                   cache_dir=None,
+                   refresh_cache=False,
+                   read_workers=None,
+                   max_table_bytes=4 * 1024**3,
+                   compact_dtypes=False,
+                   stream_above=None,
+                   stream_kwargs=None,
+                   n_workers=1,
+                   stage_workers=1,
+                   incremental=False,
+                   only_stages=None,
+                   instrument=False,
+                   report_filename="qaplotter_report.json",
+                   report_html_filename=None,
+                   profile=None,
+                   cal_workers=1,
+                   preview=False,
+                   preview_rows=2000,
+                   preview_background=False,
+                   max_points_per_panel=None,
+                   only_fields=None,
+                   only_families=None,
                    ):
     '''
     Make both the field and BP cal plots based on the standard pipeline folder names defined
@@ -357,6 +787,92 @@ def make_all_plots(msname=None,
     corrs : list, optional
         Give which correlations to show in the plots. Default is ['LL', 'RR']. To show
         the cross terms, give: ['LL', 'RR', 'LR', 'RL'].
+    use_cache : bool, optional
+        Keep a binary copy of each parsed txt table to skip re-parsing on later runs.
+    cache_dir : str, optional
+        Location of the table cache. Defaults to ~/.cache/qaplotter or the
+        QAPLOTTER_CACHE_DIR environment variable.
+    refresh_cache : bool, optional
+        Discard the cached tables for this track and re-parse all txt files.
+    read_workers : int, optional
+        Number of threads used to read the per-scan txt files of a field and the
+        caltable txt files. Defaults to the number of CPUs (up to 8).
+    max_table_bytes : int, optional
+        Memory cap for the field tables kept in memory between the per-field and
+        summary figures. The least recently used fields are dropped above the cap.
+    compact_dtypes : bool, optional
+        Store the numeric table columns as float32/int16/int32 where this does not
+        change the plots. Roughly halves the memory used by the tables. The memory
+        saved per table is printed.
+    stream_above : int, optional
+        Field txt files larger than this many bytes are read in chunks and reduced
+        to a bounded number of rows per SPW and correlation. Useful for very large
+        unaveraged exports. Default is None (always read the full files).
+    stream_kwargs : dict, optional
+        Options for the chunked reader: `max_rows`, `method` ("minmax" or
+        "reservoir") and `chunk_rows`. See `read_casa_txt_streaming`.
+    n_workers : int, optional
+        Number of processes used to make the per-field figures. Each process reads
+        and writes its own fields. Default is 1 (serial).
+    stage_workers : int, optional
+        Number of stages (manual flagging log, homepage, field plots, cal plots and
+        quicklook images) to run at the same time in separate processes. Default
+        is 1, which runs the stages one after another. The wall time of each stage
+        is printed and returned.
+    incremental : bool, optional
+        Only remake the figures whose input files or options changed since the
+        last run, based on the manifest written to each output folder. The linking
+        pages are always remade. Default is False (remake all figures).
+    only_stages : list, optional
+        Names of the stages to run (see `stage_workers`). Only the product folders
+        for these stages need to exist. Default is None (run all stages).
+    instrument : bool, optional
+        Record the wall time, CPU time, peak memory and bytes read/written of each
+        stage and of the reading, plotting and HTML writing for each field,
+        caltable family and quicklook target. The records and their totals are
+        saved as JSON to `report_filename`.
+    report_filename : str, optional
+        Name of the JSON report written with `instrument=True`.
+    report_html_filename : str, optional
+        Also write the report as an HTML page with this name and link it from the
+        track homepage. Default is None (no HTML page).
+    profile : str or list, optional
+        Profile the field, cal and quicklook stages with "cprofile" and/or
+        "tracemalloc". The .prof files and top allocation summaries are written
+        to the output folder of each stage. Defaults to the QAPLOTTER_PROFILE
+        environment variable (e.g. "cprofile,tracemalloc"). Only the stage
+        processes are profiled, not the per-field workers.
+    cal_workers : int, optional
+        Number of processes used to read and plot the caltable families (bandpass,
+        gains, delays, etc.) at the same time. Default is 1 (serial).
+    preview : bool, optional
+        Make the pages in two passes. The first pass makes every field and caltable
+        figure from at most `preview_rows` points per SPW and correlation (along
+        with the quicklook images and linking pages) so the flagging review can
+        start early. The second pass remakes the field and caltable figures at full
+        resolution and replaces each preview page as it is written. The stage times
+        of the second pass are returned as "<stage> (full resolution)".
+    preview_rows : int, optional
+        Points kept per SPW and correlation in each preview table. Default is 2000.
+    preview_background : bool, optional
+        Run the full resolution pass in a separate process and return once the
+        previews are written. The process is returned with the stage times as
+        `(stage_times, full_process)`; use `join_full_resolution` to wait for it
+        and check that it succeeded. Its stages are not included in the
+        instrumentation report. Daemonic processes (e.g. `multiprocessing.Pool`
+        workers) cannot start the process, so there the full resolution pass is
+        run before returning.
+    max_points_per_panel : int, optional
+        Limit the points in each panel of the field and target summary figures.
+        Panels with more points are decimated, keeping the extremes in each part
+        of the x-axis, and the ratio is shown in the panel title. Default is None
+        (all points).
+    only_fields : list, optional
+        Only make the figures for these fields. The other fields keep the
+        figures from the last run. See `make_field_plots`.
+    only_families : list, optional
+        Only make the figures for these caltable families. See
+        `make_all_cal_plots`.
 
     '''
 
@@ -378,25 +894,27 @@ def make_all_plots(msname=None,
         #                   "Assuming parent directory name for MS.")
         #     msname = os.path.abspath(".").split("/")[-1]
 
-    # Check if all product folders exist. If not, raise an exception.
-    if not os.path.exists(folder_fields):
-        raise Exception(f"Folder {folder_fields} does not exist.")
+    all_stages = ['manual flagging log', 'homepage', 'field plots', 'cal plots',
+                  'quicklook images']
 
-    if not os.path.exists(folder_cals):
-        raise Exception(f"Folder {folder_cals} does not exist.")
+    if only_stages is None:
+        only_stages = all_stages
 
-    if not os.path.exists(folder_qlimg):
-        raise Exception(f"Folder {folder_qlimg} does not exist.")
+    unknown_stages = set(only_stages) - set(all_stages)
+    if len(unknown_stages) > 0:
+        raise ValueError(f"Unknown stages {sorted(unknown_stages)}. "
+                         f"Choose from {all_stages}.")
 
-    ms_info_dict['vis'] = msname
+    # Check if all product folders exist. If not, raise an exception.
+    product_folders = {'field plots': folder_fields,
+                       'cal plots': folder_cals,
+                       'quicklook images': folder_qlimg}
 
-    # Try parsing the hifv_flagdata log to check for issues in our
-    # manual flagging commands.
-    try:
-        warn_tab = extract_manual_flagging_log(msname)
-        warn_tab.write(manualflag_tablename, overwrite=True)
-    except Exception as exc:
-        warnings.warn(f"Encountered exception: {exc}")
+    for name, folder in product_folders.items():
+        if name in only_stages and not os.path.exists(folder):
+            raise Exception(f"Folder {folder} does not exist.")
+
+    ms_info_dict['vis'] = msname
 
     if os.path.exists(spwdict_filename):
         print(f"Found spw dictionary file.")
@@ -405,9 +923,6 @@ def make_all_plots(msname=None,
         spw_dict = None
         print(f"NO spw dictionary file found.")
 
-    make_html_homepage(".", ms_info_dict, flagging_sheet_link=flagging_sheet_link,
-                       manualflag_tablename=manualflag_tablename)
-
     # Turn off show_target_linesonly for continuum-only cases
     if show_target_linesonly:
         is_continuum_spw = []
@@ -420,28 +935,197 @@ def make_all_plots(msname=None,
             show_target_linesonly = False
             print("Continuum-only SPWs detected. Disabling show_target_linesonly.")
 
-    make_field_plots(ms_info_dict['vis'], folder_fields, output_folder_fields,
-                     save_fieldnames=save_fieldnames,
-                     corrs=corrs, spw_dict=spw_dict,
-                     flagging_sheet_link=flagging_sheet_link,
-                     show_target_linesonly=show_target_linesonly)
-
-    # For older pipeline runs, only the BP txt files will be available.
-    if not os.path.exists(folder_cals):
+    # The stages share no data, so none depend on each other. Each is
+    # (function, kwargs, stages it depends on). See `run_stages`.
+    stages = {}
 
-        if os.path.exists(folder_BPs):
-            folder_cals = folder_BPs
+    # Try parsing the hifv_flagdata log to check for issues in our
+    # manual flagging commands.
+    stages['manual flagging log'] = (write_manual_flagging_table,
+                                     dict(msname=msname,
+                                          manualflag_tablename=manualflag_tablename),
+                                     [])
+
+    stages['homepage'] = (make_html_homepage,
+                          dict(folder=".", ms_info_dict=ms_info_dict,
+                               flagging_sheet_link=flagging_sheet_link,
+                               manualflag_tablename=manualflag_tablename,
+                               report_filename=report_html_filename if instrument else None),
+                          [])
+
+    stages['field plots'] = (make_field_plots,
+                             dict(msname=ms_info_dict['vis'], folder=folder_fields,
+                                  output_folder=output_folder_fields,
+                                  save_fieldnames=save_fieldnames,
+                                  corrs=corrs, spw_dict=spw_dict,
+                                  flagging_sheet_link=flagging_sheet_link,
+                                  show_target_linesonly=show_target_linesonly,
+                                  use_cache=use_cache, cache_dir=cache_dir,
+                                  refresh_cache=refresh_cache,
+                                  read_workers=read_workers,
+                                  max_table_bytes=max_table_bytes,
+                                  compact_dtypes=compact_dtypes,
+                                  stream_above=stream_above,
+                                  stream_kwargs=stream_kwargs,
+                                  n_workers=n_workers,
+                                  incremental=incremental,
+                                  profile=profile,
+                                  preview_rows=preview_rows if preview else None,
+                                  max_points_per_panel=max_points_per_panel,
+                                  only_fields=only_fields),
+                             [])
 
-        else:
-            print("No cal plot txt files were found. Skipping.")
-            return
+    # For older pipeline runs, only the BP txt files will be available.
+    if not os.path.exists(folder_cals) and os.path.exists(folder_BPs):
+        folder_cals = folder_BPs
 
     # Calibration plots
-    make_all_cal_plots(flagging_sheet_link, folder_cals, output_folder_cals)
+    if os.path.exists(folder_cals):
+        stages['cal plots'] = (make_all_cal_plots,
+                               dict(flagging_sheet_link=flagging_sheet_link,
+                                    folder=folder_cals,
+                                    output_folder=output_folder_cals,
+                                    use_cache=use_cache, cache_dir=cache_dir,
+                                    refresh_cache=refresh_cache,
+                                    read_workers=read_workers,
+                                    compact_dtypes=compact_dtypes,
+                                    incremental=incremental,
+                                    profile=profile,
+                                    n_workers=cal_workers,
+                                    preview_rows=preview_rows if preview else None,
+                                    only_families=only_families),
+                               [])
+    else:
+        print("No cal plot txt files were found. Skipping.")
 
     if os.path.exists(folder_qlimg):
         # Quicklook target images
-        make_all_quicklook_plots(flagging_sheet_link, folder_qlimg, output_folder_qlimg)
+        stages['quicklook images'] = (make_all_quicklook_plots,
+                                      dict(flagging_sheet_link=flagging_sheet_link,
+                                           folder=folder_qlimg,
+                                           output_folder=output_folder_qlimg,
+                                           incremental=incremental,
+                                           profile=profile),
+                                      [])
 
     else:
         print("No quicklook images were found. Skipping.")
+
+    stages = {name: stage for name, stage in stages.items() if name in only_stages}
+
+    # The second pass only remakes the preview figures. The manifests written in
+    # the first pass mark them as previews, so with `incremental` any figure that
+    # is already at full resolution is skipped.
+    full_stages = {}
+    if preview:
+        full_stages = {f"{name} (full resolution)":
+                       (func, dict(kwargs, preview_rows=None, incremental=True,
+                                   refresh_cache=False), [])
+                       for name, (func, kwargs, _) in stages.items()
+                       if name in ['field plots', 'cal plots']}
+
+    full_process = None
+
+    if preview_background and len(full_stages) > 0 and multiprocessing.current_process().daemon:
+        warnings.warn("A daemonic process cannot start the background full resolution "
+                      "pass. Making the full resolution figures before returning.")
+        preview_background = False
+
+    if instrument:
+        start_instrumentation()
+
+    try:
+        stage_times = run_stages(stages, max_workers=stage_workers)
+
+        if len(full_stages) > 0:
+            if preview_background:
+                print("Preview figures are done. Making the full resolution figures "
+                      "in the background.")
+
+                full_process = multiprocessing.Process(target=run_full_resolution_stages,
+                                                       args=(full_stages,),
+                                                       kwargs=dict(max_workers=stage_workers))
+
+            else:
+                print("Preview figures are done. Making the full resolution figures.")
+
+                stage_times.update(run_stages(full_stages, max_workers=stage_workers))
+
+    finally:
+        records = stop_instrumentation() if instrument else None
+
+    # Started after the recording is stopped so the process does not inherit it.
+    if full_process is not None:
+        full_process.start()
+
+    print_stage_times(stage_times)
+
+    if instrument:
+        report = make_report(records,
+                             info=dict(vis=msname, stages=list(stages.keys()),
+                                       stage_workers=stage_workers, n_workers=n_workers,
+                                       read_workers=read_workers,
+                                       compact_dtypes=compact_dtypes,
+                                       stream_above=stream_above,
+                                       incremental=incremental,
+                                       preview_rows=preview_rows if preview else None))
+
+        write_report(report_filename, report)
+        print(f"Saved the timing and memory report to {report_filename}")
+
+        if report_html_filename is not None:
+            with open(report_html_filename, 'w') as f:
+                f.write(make_report_html_page(report))
+
+    if full_process is not None:
+        return stage_times, full_process
+
+    return stage_times
+
+
+def run_full_resolution_stages(full_stages, max_workers=1):
+    '''
+    Run the full resolution pass of `make_all_plots` in the background process
+    and exit with a non-zero code if it fails.
+
+    Each stage writes its manifest and link pages once all of its figures are
+    remade. When a stage fails, the manifest from the preview pass is left as it
+    is, so the pages are still recorded as previews and are remade by the next
+    `incremental` run.
+    '''
+
+    try:
+        stage_times = run_stages(full_stages, max_workers=max_workers)
+
+    except Exception:
+        traceback.print_exc()
+        print("Unable to make the full resolution figures. The preview figures are kept.")
+        sys.exit(1)
+
+    print_stage_times(stage_times)
+
+
+def join_full_resolution(full_process):
+    '''
+    Wait for the background full resolution process from
+    `make_all_plots(preview_background=True)`. Raises a RuntimeError if it failed.
+    '''
+
+    full_process.join()
+
+    if full_process.exitcode != 0:
+        raise RuntimeError("The full resolution figures failed with exit code "
+                           f"{full_process.exitcode}. The preview figures are kept.")
+
+
+def write_manual_flagging_table(msname, manualflag_tablename='manualflag_check.html'):
+    '''
+    Parse the hifv_flagdata log for issues with the manual flagging commands and
+    write the table to `manualflag_tablename`. Failures only raise a warning.
+    '''
+
+    try:
+        warn_tab = extract_manual_flagging_log(msname)
+        warn_tab.write(manualflag_tablename, overwrite=True)
+    except Exception as exc:
+        warnings.warn(f"Encountered exception: {exc}")
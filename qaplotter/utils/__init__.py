@@ -1,11 +1,38 @@
 
-from .read_data import (read_casa_txt, read_field_data_tables, read_bpcal_data_tables,
+from .read_data import (read_casa_txt, read_casa_txt_streaming,
+                        read_field_data_tables, read_caltables,
+                        read_bpcal_data_tables,
                         read_delay_data_tables,
                         read_BPinitialgain_data_tables,
                         read_phaseshortgaincal_data_tables,
                         read_ampgaincal_time_data_tables,
                         read_ampgaincal_freq_data_tables,
-                        read_phasegaincal_data_tables)
+                        read_phasegaincal_data_tables,
+                        read_flagfrac_freq_data_tables,
+                        read_flagfrac_uvdist_data_tables)
+from .table_cache import clear_cache, invalidate_cache
+from .file_index import (build_field_txt_index, index_fieldnames,
+                         build_caltable_txt_index, caltable_specs,
+                         select_caltable_files, index_signature)
+from .track_dataset import TrackDataset
+from .compact import compact_table
+from .decimation import (decimate_table, bin_extremes, decimate_rows, panel_point_budget,
+                         note_decimation)
+from .atomic_write import write_html_atomic
+from .manifest import (load_manifest, save_manifest, make_entry, is_up_to_date,
+                       input_signatures)
+from .instrument import (measure, start_instrumentation, stop_instrumentation,
+                         instrumentation_enabled, pop_records, add_records,
+                         make_report, write_report)
+from .profiling import profiled, profile_block
+from .stages import run_stages, print_stage_times
+from .categorical import (category_mask, category_code, decode_column,
+                          encode_categorical_columns, set_categorical_column,
+                          group_rows)
+from .color_modes import color_codes, color_mode_marker, palette_color
+from .hover import (scan_hover, customdata_ref, name_ref, time_ref, x_time_ref,
+                    channel_ref, frequency_ref, stack_customdata)
+from .trace_batch import TraceBatch
 from .time_conversion import telescope_time_conversion, datetime_from_msname
 from .load_spwmapping import load_spwdict
 from .generate_obslog_link import generate_obslog_link
@@ -0,0 +1,28 @@
+'''
+Write the HTML figures so a page is never seen half written.
+
+The figures are written to a temporary file in the same folder and then renamed
+over the old page. The rename is atomic, so a page that is open or reloaded while
+the figures are remade (e.g. the full resolution figures replacing the previews,
+see `make_all_plots`) always shows either the old or the new figure.
+'''
+
+import os
+
+
+def write_html_atomic(fig, filename, **kwargs):
+    '''
+    Write the plotly figure `fig` to `filename` with `fig.write_html(**kwargs)`
+    through a temporary file.
+    '''
+
+    tmp_filename = f"{filename}.tmp{os.getpid()}"
+
+    try:
+        fig.write_html(tmp_filename, **kwargs)
+
+        os.replace(tmp_filename, filename)
+
+    finally:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
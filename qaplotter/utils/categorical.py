@@ -0,0 +1,207 @@
+'''
+Dictionary encoding for the text columns of the plotms tables.
+
+The antenna name and correlation columns only have a few unique values, so the
+readers store them as small integer codes. The sorted unique values (the
+categories) are kept in the table meta-data under "categories". Because the
+categories are sorted, the code order matches the sort order of the strings.
+'''
+
+import numpy as np
+
+
+# Text columns in the plotms txt output. CASA 6.6 uses 'poln' instead of 'corr'.
+categorical_columns = ['ant1name', 'ant2name', 'corr', 'poln']
+
+
+def code_dtype(ncategories):
+    '''
+    Smallest signed integer type for `ncategories` codes. -1 is kept free for
+    values not in the categories.
+    '''
+
+    for dtype in [np.int8, np.int16, np.int32]:
+        if ncategories < np.iinfo(dtype).max:
+            return dtype
+
+    return np.int64
+
+
+def encode_values(values):
+    '''
+    Return the integer codes and sorted categories for an array of values.
+    '''
+
+    categories, codes = np.unique(np.asarray(values), return_inverse=True)
+
+    return codes.astype(code_dtype(len(categories))), categories
+
+
+def set_categorical_column(tab, colname, codes, categories):
+    '''
+    Store `codes` as column `colname` in `tab` with its `categories` in the meta-data.
+    '''
+
+    if colname in tab.colnames:
+        tab.replace_column(colname, codes, copy=False)
+    else:
+        tab.add_column(codes, name=colname, copy=False)
+
+    # Replace the dict rather than update it. Tables made with copy=False share
+    # the nested meta-data dicts.
+    all_categories = dict(tab.meta.get('categories', {}))
+    all_categories[colname] = np.asarray(categories)
+    tab.meta['categories'] = all_categories
+
+
+def encode_categorical_columns(tab, colnames=categorical_columns):
+    '''
+    Replace the text columns in `tab` with integer codes. Columns that are not text
+    or are already encoded are left as is.
+    '''
+
+    for colname in colnames:
+        if colname not in tab.colnames or is_categorical(tab, colname):
+            continue
+
+        if tab[colname].dtype.kind not in 'US':
+            continue
+
+        codes, categories = encode_values(tab[colname])
+
+        set_categorical_column(tab, colname, codes, categories)
+
+    return tab
+
+
+def is_categorical(tab, colname):
+    '''
+    Whether `colname` in `tab` holds integer codes.
+    '''
+
+    return colname in tab.meta.get('categories', {})
+
+
+def get_categories(tab, colname):
+    '''
+    The sorted unique values for the codes of `colname`.
+    '''
+
+    return tab.meta['categories'][colname]
+
+
+def category_code(tab, colname, value):
+    '''
+    Return the code for `value` in `colname`, or -1 if it is not in the table.
+    For columns that are not encoded, `value` is returned.
+    '''
+
+    if not is_categorical(tab, colname):
+        return value
+
+    categories = get_categories(tab, colname)
+
+    idx = np.searchsorted(categories, value)
+
+    if idx < len(categories) and categories[idx] == value:
+        return idx
+
+    return -1
+
+
+def category_mask(tab, colname, value):
+    '''
+    Boolean mask of the rows where `colname` equals `value`. Compares integer
+    codes for encoded columns.
+    '''
+
+    values = np.asarray(tab[colname])
+
+    if is_categorical(tab, colname):
+        return values == category_code(tab, colname, value)
+
+    # e.g. the float columns of an empty table
+    if values.dtype.kind not in 'US':
+        return np.zeros(len(values), dtype=bool)
+
+    return values == value
+
+
+def decode_column(tab, colname, mask=None):
+    '''
+    Return the values of `colname`, optionally for the rows in `mask`. Encoded
+    columns are mapped back to their categories.
+    '''
+
+    values = np.asarray(tab[colname])
+
+    if mask is not None:
+        values = values[mask]
+
+    if not is_categorical(tab, colname):
+        return values
+
+    return get_categories(tab, colname)[values]
+
+
+def group_rows(tab, colnames):
+    '''
+    Sort the rows of `tab` once by `colnames` (e.g. spw and corr). Returns the
+    sorted table and a dict of the tuple of values -> slice of its rows in the
+    sorted table. Encoded columns are grouped by their codes (see
+    `category_code`). The rows keep their original order within each group.
+    '''
+
+    if len(tab) == 0:
+        return tab, {}
+
+    keys = [np.asarray(tab[colname]) for colname in colnames]
+
+    # lexsort sorts by the last key first and is stable.
+    order = np.lexsort(keys[::-1])
+
+    sorted_keys = [key[order] for key in keys]
+
+    new_group = np.zeros(len(tab) - 1, dtype=bool)
+    for key in sorted_keys:
+        new_group |= key[1:] != key[:-1]
+
+    starts = np.concatenate([[0], np.nonzero(new_group)[0] + 1])
+    stops = np.append(starts[1:], len(tab))
+
+    groups = {tuple(key[start].item() for key in sorted_keys): slice(start, stop)
+              for start, stop in zip(starts, stops)}
+
+    return tab[order], groups
+
+
+def rename_categorical_column(tab, colname, new_colname):
+    '''
+    Rename a column and its categories.
+    '''
+
+    tab.rename_column(colname, new_colname)
+
+    if is_categorical(tab, colname):
+        all_categories = dict(tab.meta['categories'])
+        all_categories[new_colname] = all_categories.pop(colname)
+        tab.meta['categories'] = all_categories
+
+
+def merge_categories(tables, colname):
+    '''
+    Combine the categories of `colname` across `tables`. Returns the combined
+    categories and the codes for each table remapped onto them.
+    '''
+
+    all_categories = np.unique(np.concatenate([get_categories(tab, colname)
+                                               for tab in tables]))
+
+    dtype = code_dtype(len(all_categories))
+
+    all_codes = []
+    for tab in tables:
+        remap = np.searchsorted(all_categories, get_categories(tab, colname)).astype(dtype)
+        all_codes.append(remap[np.asarray(tab[colname])])
+
+    return all_codes, all_categories
@@ -0,0 +1,56 @@
+'''
+Colours for the colour buttons (SPW, Scan, Ant1, ...) of the scan and summary
+figures.
+
+The colours come from the 11 colour `px.colors.qualitative.Safe` palette. Modes
+that vary within a trace (e.g. Scan) give each point a small integer code that a
+discrete colorscale maps onto the palette, so each button holds one integer per
+point rather than one colour string. Modes that are the same for the whole trace
+(e.g. SPW) use a single colour per trace.
+'''
+
+import numpy as np
+import plotly.express as px
+
+
+palette = px.colors.qualitative.Safe
+
+
+def discrete_colorscale(colors=palette):
+    '''
+    Colorscale with a band of constant colour for each of `colors`. Use with
+    `cmin=-0.5` and `cmax=len(colors) - 0.5` so code `i` falls in band `i`.
+    '''
+
+    ncolors = len(colors)
+
+    colorscale = []
+    for i, color in enumerate(colors):
+        colorscale.append([i / ncolors, color])
+        colorscale.append([(i + 1) / ncolors, color])
+
+    return colorscale
+
+
+# Marker properties needed for the integer colour codes from `color_codes`.
+color_mode_marker = dict(colorscale=discrete_colorscale(),
+                         cmin=-0.5, cmax=len(palette) - 0.5)
+
+
+def palette_color(index):
+    '''
+    The palette colour for `index`, wrapping around after the last colour.
+    '''
+
+    return palette[index % len(palette)]
+
+
+def color_codes(values):
+    '''
+    Number the unique `values` in sorted order (e.g. scans 50, 60, 70 -> 0, 1, 2)
+    and return the number of each value wrapped to the palette length.
+    '''
+
+    _, inverse = np.unique(np.asarray(values), return_inverse=True)
+
+    return (inverse.ravel() % len(palette)).astype(np.int8)
@@ -0,0 +1,134 @@
+'''
+Optional downcasting of the numeric columns in the plotms tables.
+
+The txt readers return float64 and int64 columns. For plotting, most columns
+(amplitude, phase, frequency, uv-distance) are fine as float32 and the integer
+columns (scan, spw, channel, antenna numbers) fit in 16 or 32 bits. Time in
+MJD seconds does not fit in float32 without losing the spacing between
+integrations, so float columns are only downcast when float32 resolves the
+range of the values.
+'''
+
+import numpy as np
+
+from .categorical import is_categorical
+
+
+# Keep float64 unless the float32 spacing at the largest value is at most this
+# fraction of the range of the column.
+float32_resolution = 1e-5
+
+
+def compact_dtype(values):
+    '''
+    Return the smaller dtype that `values` can be stored in for plotting, or None
+    to keep the current dtype.
+    '''
+
+    values = np.asarray(values)
+
+    if len(values) == 0:
+        return None
+
+    if values.dtype.kind in 'iu':
+        if values.dtype.itemsize <= 2:
+            return None
+
+        vmin, vmax = values.min(), values.max()
+
+        for dtype in [np.int16, np.int32]:
+            info = np.iinfo(dtype)
+            if vmin >= info.min and vmax <= info.max:
+                return None if np.dtype(dtype).itemsize >= values.dtype.itemsize else dtype
+
+        return None
+
+    if values.dtype.kind == 'f':
+        if values.dtype.itemsize <= 4:
+            return None
+
+        finite = values[np.isfinite(values)]
+
+        if len(finite) == 0:
+            return np.float32
+
+        # Exact values (e.g. whole numbers) are always fine.
+        if np.array_equal(finite.astype(np.float32), finite):
+            return np.float32
+
+        vmin, vmax = finite.min(), finite.max()
+
+        max_abs = max(abs(vmin), abs(vmax))
+
+        if max_abs > np.finfo(np.float32).max:
+            return None
+
+        if np.spacing(np.float32(max_abs)) <= float32_resolution * (vmax - vmin):
+            return np.float32
+
+        return None
+
+    return None
+
+
+def compact_table(tab):
+    '''
+    Downcast the numeric columns of `tab` in place where that does not change
+    the plots. Encoded text columns (see `categorical`) are left as is.
+    '''
+
+    for colname in tab.colnames:
+
+        if is_categorical(tab, colname):
+            continue
+
+        dtype = compact_dtype(tab[colname])
+
+        if dtype is None:
+            continue
+
+        tab.replace_column(colname, np.asarray(tab[colname]).astype(dtype),
+                           copy=False)
+
+    return tab
+
+
+def compact_nbytes_saved(tab):
+    '''
+    Bytes saved by the numeric columns of `tab` relative to 64-bit storage.
+    '''
+
+    nbytes_saved = 0
+
+    for colname in tab.colnames:
+
+        if is_categorical(tab, colname):
+            continue
+
+        dtype = tab[colname].dtype
+
+        if dtype.kind in 'iuf' and dtype.itemsize < 8:
+            nbytes_saved += len(tab) * (8 - dtype.itemsize)
+
+    return nbytes_saved
+
+
+def table_nbytes(tab):
+    '''
+    Memory used by the columns of `tab`.
+    '''
+
+    return sum(tab[colname].nbytes for colname in tab.colnames)
+
+
+def print_compact_report(label, tables):
+    '''
+    Print the memory used by a list of tables and the memory saved by the
+    compact dtypes.
+    '''
+
+    nbytes = sum(table_nbytes(tab) for tab in tables)
+    nbytes_saved = sum(compact_nbytes_saved(tab) for tab in tables)
+
+    print(f"  {label}: {nbytes / 1024**2:.2f} MB "
+          f"({nbytes_saved / 1024**2:.2f} MB saved with compact dtypes)")
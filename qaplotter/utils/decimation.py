@@ -0,0 +1,345 @@
+'''
+Bounded-size reductions of table rows that are fed in chunks.
+
+Both reducers take dicts of column arrays and keep at most `max_rows` rows no
+matter how many rows are added, so very large txt exports can be reduced while
+they are read (see `read_casa_txt_streaming`).
+
+* `ReservoirSample` keeps a uniform random sample of the rows.
+* `MinMaxDecimator` splits the rows into bins of consecutive rows and keeps the
+  rows with the smallest and largest y value in each bin, so outliers are always
+  kept. The bins double in size when there are more than `max_rows // 2`.
+
+`decimate_table` applies `MinMaxDecimator` to a table already in memory, e.g. to
+make the quick preview figures (see `make_all_plots`).
+
+`bin_extremes` reduces the points of one scatter trace for the per-panel point
+budget of the scan and target summary figures (`max_points_per_panel`).
+'''
+
+import numpy as np
+
+
+decimation_methods = ['minmax', 'reservoir']
+
+
+def _nrows(columns):
+    return len(next(iter(columns.values())))
+
+
+def _take(columns, idx):
+    return {colname: values[idx] for colname, values in columns.items()}
+
+
+def _concatenate(columns_list):
+    '''
+    Concatenate dicts of column arrays with the same keys, promoting the dtypes.
+    '''
+    return {colname: np.concatenate([columns[colname] for columns in columns_list])
+            for colname in columns_list[0]}
+
+
+class ReservoirSample(object):
+    '''
+    Uniform random sample of up to `max_rows` rows (reservoir sampling). Every
+    row added has the same chance to be in the sample.
+
+    Parameters
+    ----------
+    max_rows : int
+        Size of the sample.
+    rng : `numpy.random.Generator`, optional
+        Random number generator. Defaults to a generator with a fixed seed so
+        repeated reads give the same sample.
+    '''
+
+    def __init__(self, max_rows, rng=None):
+
+        self.max_rows = max_rows
+        self.rng = np.random.default_rng(0) if rng is None else rng
+
+        self.nseen = 0
+        self.columns = None
+
+    def add(self, columns):
+        '''
+        Add a chunk of rows given as a dict of equal length column arrays.
+        '''
+
+        nrows = _nrows(columns)
+
+        if nrows == 0:
+            return
+
+        # Position of each new row among all rows added so far.
+        position = self.nseen + np.arange(nrows)
+
+        # Fill the reservoir first, then replace a random slot with probability
+        # max_rows / (position + 1).
+        slots = position.copy()
+        full = position >= self.max_rows
+        slots[full] = self.rng.integers(0, position[full] + 1)
+
+        keep = np.nonzero(slots < self.max_rows)[0]
+        slots = slots[keep]
+
+        # When a slot is drawn more than once, the last row wins.
+        slots_rev, idx_rev = np.unique(slots[::-1], return_index=True)
+        keep = keep[::-1][idx_rev]
+
+        if self.columns is None:
+            self.columns = {colname: np.empty(self.max_rows, dtype=values.dtype)
+                            for colname, values in columns.items()}
+
+        for colname, values in columns.items():
+            store = self.columns[colname]
+
+            dtype = np.result_type(store.dtype, values.dtype)
+            if dtype != store.dtype:
+                store = self.columns[colname] = store.astype(dtype)
+
+            store[slots_rev] = values[keep]
+
+        self.nseen += nrows
+
+    def result(self):
+        '''
+        The sampled rows as a dict of column arrays.
+        '''
+
+        if self.columns is None:
+            return None
+
+        return _take(self.columns, slice(0, min(self.nseen, self.max_rows)))
+
+
+class MinMaxDecimator(object):
+    '''
+    Keep the rows with the smallest and largest `ycolumn` value in bins of
+    consecutive rows. The bin size starts at one row and doubles whenever there
+    are more than `max_rows // 2` bins. Rows with a NaN value are dropped.
+
+    Parameters
+    ----------
+    max_rows : int
+        Maximum number of rows kept.
+    ycolumn : str, optional
+        Column to find the extremes in.
+    '''
+
+    def __init__(self, max_rows, ycolumn='y'):
+
+        self.max_bins = max(max_rows // 2, 1)
+        self.ycolumn = ycolumn
+
+        self.bin_rows = 1
+        self.nseen = 0
+
+        self.bins = None
+        self.columns = None
+
+    def add(self, columns):
+        '''
+        Add a chunk of rows given as a dict of equal length column arrays.
+        '''
+
+        nrows = _nrows(columns)
+
+        if nrows == 0:
+            return
+
+        # Grow the bins first so the chunk is only reduced once.
+        while (self.nseen + nrows - 1) // self.bin_rows + 1 > self.max_bins:
+            self.bin_rows *= 2
+            if self.bins is not None:
+                self.bins //= 2
+
+        bins = (self.nseen + np.arange(nrows)) // self.bin_rows
+
+        self.nseen += nrows
+
+        finite = np.isfinite(columns[self.ycolumn])
+        if not finite.all():
+            columns = _take(columns, finite)
+            bins = bins[finite]
+
+        if self.columns is not None:
+            columns = _concatenate([self.columns, columns])
+            bins = np.concatenate([self.bins, bins])
+
+        if len(bins) == 0:
+            return
+
+        # The first and last row of each bin when sorted by bin, then by y.
+        order = np.lexsort((columns[self.ycolumn], bins))
+
+        sorted_bins = bins[order]
+        new_bin = sorted_bins[1:] != sorted_bins[:-1]
+
+        first = np.concatenate([[True], new_bin])
+        last = np.concatenate([new_bin, [True]])
+
+        keep = order[first | last]
+
+        self.columns = _take(columns, keep)
+        self.bins = bins[keep]
+
+    def result(self):
+        '''
+        The kept rows as a dict of column arrays.
+        '''
+
+        return self.columns
+
+
+def decimate_table(tab, max_rows, ycolumn='y'):
+    '''
+    Keep at most `max_rows` rows of `tab` for each (spw, corr) combination using
+    `MinMaxDecimator`. The rows stay in their original order. Tables with fewer
+    rows than `max_rows` are returned unchanged.
+    '''
+
+    if len(tab) <= max_rows or ycolumn not in tab.colnames:
+        return tab
+
+    corr_colname = 'poln' if 'poln' in tab.colnames else 'corr'
+
+    nrows = len(tab)
+
+    spw = np.asarray(tab['spw']) if 'spw' in tab.colnames else np.zeros(nrows, dtype=int)
+    if corr_colname in tab.colnames:
+        corr = np.asarray(tab[corr_colname])
+    else:
+        corr = np.zeros(nrows, dtype=int)
+
+    # Same packing of the (spw, corr) pairs as `read_casa_txt_streaming`.
+    group_keys = (spw.astype(np.int64) << 32) | (corr.astype(np.int64) & 0xffffffff)
+
+    groups, group_idx = np.unique(group_keys, return_inverse=True)
+
+    order = np.argsort(group_idx, kind='stable')
+    splits = np.cumsum(np.bincount(group_idx, minlength=len(groups)))[:-1]
+
+    yvals = np.asarray(tab[ycolumn])
+
+    keep = []
+
+    for rows in np.split(order, splits):
+        decimator = MinMaxDecimator(max_rows)
+        decimator.add({'y': yvals[rows], '_row': rows})
+
+        result = decimator.result()
+        if result is not None:
+            keep.append(result['_row'])
+
+    if len(keep) == 0:
+        return tab[:0]
+
+    return tab[np.sort(np.concatenate(keep))]
+
+
+def bin_extremes(x, y, max_points):
+    '''
+    Indices of at most `max_points` of the (x, y) points that keep the look of a
+    scatter plot. The points are split into `max_points // 3` equal-width bins in
+    x and, in each bin, the points at evenly spaced ranks in y are kept. These
+    always include the smallest, median and largest y, so outliers survive. Bins
+    with few points keep all of them. Points with a NaN x or y are dropped.
+
+    Returns the sorted indices, or all indices when there are no more than
+    `max_points` points.
+    '''
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    if len(y) <= max_points:
+        return np.arange(len(y))
+
+    idx = np.nonzero(np.isfinite(x) & np.isfinite(y))[0]
+
+    if len(idx) == 0:
+        return idx
+
+    x = x[idx]
+
+    nbins = max(max_points // 3, 1)
+
+    xmin, xmax = x.min(), x.max()
+    if xmax > xmin:
+        bins = np.minimum(((x - xmin) / (xmax - xmin) * nbins).astype(np.int64), nbins - 1)
+    else:
+        bins = np.zeros(len(x), dtype=np.int64)
+
+    # Points sorted by bin, then by y.
+    order = np.lexsort((y[idx], bins))
+
+    sorted_bins = bins[order]
+    starts = np.flatnonzero(np.concatenate([[True], sorted_bins[1:] != sorted_bins[:-1]]))
+    counts = np.diff(np.concatenate([starts, [len(order)]]))
+
+    # Share the points between the bins that have data (e.g. when x is the
+    # channel frequency). An odd number per bin includes the median.
+    per_bin = max(max_points // len(starts), 3)
+    if per_bin % 2 == 0:
+        per_bin -= 1
+
+    nkeep = np.minimum(counts, per_bin)
+
+    # Evenly spaced ranks from the first to the last point in each bin.
+    first = np.repeat(np.cumsum(nkeep) - nkeep, nkeep)
+    step = np.arange(nkeep.sum()) - first
+    nkeep_rep = np.repeat(nkeep, nkeep)
+    ranks = np.rint(step * (np.repeat(counts, nkeep) - 1) /
+                    np.maximum(nkeep_rep - 1, 1)).astype(np.int64)
+
+    keep = order[np.repeat(starts, nkeep) + ranks]
+
+    return np.sort(idx[keep])
+
+
+def decimate_rows(rows, x, y, max_points):
+    '''
+    Reduce the `rows` (a slice, boolean mask or indices) of the `x` and `y`
+    columns to at most `max_points` with `bin_extremes`. Returns the kept row
+    indices, or `rows` unchanged when there are no more than `max_points`.
+    '''
+
+    if isinstance(rows, slice):
+        row_idx = np.arange(*rows.indices(len(y)))
+    else:
+        row_idx = np.arange(len(y))[rows]
+
+    if len(row_idx) <= max_points:
+        return rows
+
+    return row_idx[bin_extremes(np.asarray(x)[row_idx], np.asarray(y)[row_idx],
+                                max_points)]
+
+
+def panel_point_budget(npoints, panel_points, max_points):
+    '''
+    The share of the `max_points` budget of a panel with `panel_points` points
+    for a trace with `npoints`, in proportion to its size.
+    '''
+
+    if panel_points <= max_points:
+        return npoints
+
+    return max(int(max_points * npoints / panel_points), 3)
+
+
+def note_decimation(fig, title, nkept, ntotal):
+    '''
+    Add the decimation ratio to the subplot title `title` of `fig` when fewer
+    than `ntotal` points were kept.
+    '''
+
+    if nkept >= ntotal:
+        return
+
+    for annotation in fig.layout.annotations:
+        if annotation.text == title:
+            annotation.text = (f"{title}<br>Decimated 1:{ntotal / max(nkept, 1):.0f} "
+                               f"({nkept:,} of {ntotal:,} points)")
+            return
@@ -0,0 +1,249 @@
+'''
+Index of the per-field and per-caltable plotms txt files in a folder.
+
+The folder is listed once with `os.scandir` and the file names are parsed into
+a nested dict of field -> table type -> scan -> file info. The readers use the
+index instead of calling `os.path.exists` and `glob` per table type, which is
+slow on network filesystems with many per-scan files.
+'''
+
+import os
+import re
+
+
+# Table types written per field. See `read_field_data_tables`.
+field_tab_types = ["amp_chan", "amp_phase", "amp_time", "amp_uvdist", "phase_chan",
+                   "phase_time", "phase_uvdist", "ampresid_uvwave", "amp_ant1",
+                   "phase_ant1"]
+
+# Caltable families plotted by `make_all_cal_plots`. "key" is the number in the
+# file names ("spw" or "ant") the tables are keyed by. "tab_types" gives the file
+# name patterns for each table type. Later patterns are older naming schemes and
+# are only used when an earlier pattern is missing for any of the table types.
+caltable_specs = {'bandpass': {'label': 'BP',
+                               'key': 'spw',
+                               'tab_types': {'amp': ['finalBPcal_freq_amp',
+                                                     'finalBPcal_amp'],
+                                             'phase': ['finalBPcal_freq_phase',
+                                                       'finalBPcal_phase']}},
+                  'phasegaincal': {'label': 'Phase gain',
+                                   'key': 'ant',
+                                   'tab_types': {'phase': ['finalphasegaincal_time_phase']}},
+                  'ampgaincal_time': {'label': 'Amp gain time',
+                                      'key': 'ant',
+                                      'tab_types': {'amp': ['finalampgaincal_time_amp']}},
+                  'ampgaincal_freq': {'label': 'Amp gain freq',
+                                      'key': 'ant',
+                                      'tab_types': {'amp': ['finalampgaincal_freq_amp']}},
+                  'delay': {'label': 'Delay',
+                            'key': 'ant',
+                            'tab_types': {'delay': ['finaldelay_freq_delay']}},
+                  'phaseshortgaincal': {'label': 'Phase (short) gain',
+                                        'key': 'ant',
+                                        'tab_types': {'phase': ['phaseshortgaincal_time_phase']}},
+                  'BPinitialgain': {'label': 'BP initial gain',
+                                    'key': 'ant',
+                                    'tab_types': {'phase': ['finalBPinitialgain_time_phase']}},
+                  }
+
+# e.g. "..._spw3.txt" or "..._ant12.txt"
+caltable_number_pattern = re.compile(r"_(spw|ant)(\d+)\.txt$")
+
+
+def parse_field_txt_name(filename):
+    '''
+    Split a txt file name into the field name, table type and scan number.
+    The expected formats are "field_{fieldname}_{tab_type}.txt" and
+    "field_{fieldname}_{tab_type}.scan_{scan}.txt". The scan is None for
+    the first format.
+
+    Returns None when the name does not match either format.
+    '''
+
+    name = os.path.basename(filename)
+
+    if not name.startswith("field_") or not name.endswith(".txt"):
+        return None
+
+    # Strip off "field_" and ".txt"
+    name = name[len("field_"):-len(".txt")]
+
+    scan = None
+    if ".scan_" in name:
+        name, scan_str = name.rsplit(".scan_", 1)
+        try:
+            scan = int(scan_str)
+        except ValueError:
+            return None
+
+    for tab_type in field_tab_types:
+        if name.endswith(f"_{tab_type}"):
+            fieldname = name[:-len(tab_type) - 1]
+            break
+    else:
+        # Other tables (e.g., the flagging fractions) follow the same
+        # name_type1_type2 format.
+        parts = name.split("_")
+        if len(parts) < 3:
+            return None
+        fieldname = "_".join(parts[:-2])
+        tab_type = "_".join(parts[-2:])
+
+    if len(fieldname) == 0:
+        return None
+
+    return fieldname, tab_type, scan
+
+
+def build_field_txt_index(folder):
+    '''
+    List `folder` once and return a nested dict of
+    field -> table type -> scan -> {'path', 'size', 'mtime_ns'}. The scan key
+    is None for tables that are not split per scan.
+    '''
+
+    file_index = {}
+
+    if not os.path.isdir(folder):
+        return file_index
+
+    with os.scandir(folder) as entries:
+        for entry in entries:
+
+            parsed = parse_field_txt_name(entry.name)
+            if parsed is None:
+                continue
+
+            if not entry.is_file():
+                continue
+
+            fieldname, tab_type, scan = parsed
+
+            stat = entry.stat()
+
+            field_dict = file_index.setdefault(fieldname, {})
+            field_dict.setdefault(tab_type, {})[scan] = {'path': entry.path,
+                                                         'size': stat.st_size,
+                                                         'mtime_ns': stat.st_mtime_ns}
+
+    # Order the scans for a deterministic read order.
+    def scan_order(scan):
+        return -1 if scan is None else scan
+
+    for field_dict in file_index.values():
+        for tab_type, scan_dict in field_dict.items():
+            field_dict[tab_type] = {scan: scan_dict[scan]
+                                    for scan in sorted(scan_dict, key=scan_order)}
+
+    return file_index
+
+
+def index_fieldnames(file_index, min_size=1000):
+    '''
+    Sorted field names with at least one txt file larger than `min_size` bytes.
+    Smaller files only contain the header.
+    '''
+
+    fieldnames = []
+
+    for fieldname, field_dict in file_index.items():
+        if any(file_info['size'] > min_size
+               for scan_dict in field_dict.values()
+               for file_info in scan_dict.values()):
+            fieldnames.append(fieldname)
+
+    return sorted(fieldnames)
+
+
+def index_signature(file_info):
+    '''
+    The cache signature (see `table_cache.source_signature`) from an index entry.
+    '''
+
+    return {'size': file_info['size'], 'mtime_ns': file_info['mtime_ns']}
+
+
+def build_caltable_txt_index(folder, specs=caltable_specs):
+    '''
+    List `folder` once and return a nested dict of
+    family -> table type -> pattern -> number -> {'path', 'size', 'mtime_ns'}
+    for the caltable families in `specs`. The number is the SPW or antenna
+    number at the end of the file name.
+    '''
+
+    file_index = {}
+
+    if not os.path.isdir(folder):
+        return file_index
+
+    # pattern -> [(family, tab_type, key)]. The patterns are matched anywhere in
+    # the file name, like the "*{pattern}*.txt" globs used previously.
+    pattern_targets = {}
+    for family, spec in specs.items():
+        for tab_type, patterns in spec['tab_types'].items():
+            for pattern in patterns:
+                pattern_targets.setdefault(pattern, []).append((family, tab_type,
+                                                                spec['key']))
+
+    with os.scandir(folder) as entries:
+        for entry in entries:
+
+            if entry.name.startswith(".") or not entry.name.endswith(".txt"):
+                continue
+
+            match = caltable_number_pattern.search(entry.name)
+            if match is None:
+                continue
+
+            key, number = match.group(1), int(match.group(2))
+
+            matches = [(pattern, family, tab_type)
+                       for pattern, targets in pattern_targets.items()
+                       if pattern in entry.name
+                       for family, tab_type, spec_key in targets
+                       if spec_key == key]
+
+            if len(matches) == 0 or not entry.is_file():
+                continue
+
+            stat = entry.stat()
+
+            file_info = {'path': entry.path,
+                         'size': stat.st_size,
+                         'mtime_ns': stat.st_mtime_ns}
+
+            for pattern, family, tab_type in matches:
+                pattern_dict = file_index.setdefault(family, {}).setdefault(tab_type, {})
+                pattern_dict.setdefault(pattern, {})[number] = file_info
+
+    # Order by SPW or antenna number.
+    for family_dict in file_index.values():
+        for pattern_dicts in family_dict.values():
+            for pattern, number_dict in pattern_dicts.items():
+                pattern_dicts[pattern] = {number: number_dict[number]
+                                          for number in sorted(number_dict)}
+
+    return file_index
+
+
+def select_caltable_files(family_index, spec):
+    '''
+    Return table type -> number -> file info for one caltable family from the
+    output of `build_caltable_txt_index`. The first naming scheme in the spec
+    with files for every table type is used, otherwise the last one.
+    '''
+
+    tab_types = spec['tab_types']
+
+    npatterns = max(len(patterns) for patterns in tab_types.values())
+
+    for ii in range(npatterns):
+        tab_files = {}
+        for tab_type, patterns in tab_types.items():
+            pattern = patterns[min(ii, len(patterns) - 1)]
+            tab_files[tab_type] = family_index.get(tab_type, {}).get(pattern, {})
+
+        if all(len(number_dict) > 0 for number_dict in tab_files.values()):
+            break
+
+    return tab_files
@@ -0,0 +1,219 @@
+'''
+Numeric `customdata` for the hover labels of the figures.
+
+The hover labels show the scan, channel, frequency, antennas and time of each
+point. Rather than formatting a string per point in python, the values are kept
+as numbers and formatted by plotly.js with the d3 format specifiers in the
+`hovertemplate` (e.g. "%{customdata[3]:.6~f}"). Values that are the same for a
+whole trace (e.g. the SPW and correlation) are written into the trace's
+`hovertemplate` instead of repeating them per point.
+
+Each `*_ref` function appends columns to a list and returns the part of the
+`hovertemplate` referring to them. `stack_customdata` makes the final array,
+which plotly writes as a binary typed array when all of the columns are numeric.
+'''
+
+import re
+
+import numpy as np
+
+from .categorical import is_categorical, get_categories, decode_column
+from .time_conversion import telescope_time_conversion
+
+
+def customdata_ref(columns, values, fmt=""):
+    '''
+    Append `values` to the list of customdata `columns` and return the
+    `hovertemplate` reference to them with the d3 format `fmt` (e.g. ":02d").
+    '''
+
+    columns.append(np.asarray(values))
+
+    return f"%{{customdata[{len(columns) - 1}]{fmt}}}"
+
+
+def name_numbers(names):
+    '''
+    Split names like "ea01" that share a prefix and a zero-padded number of the
+    same width into the prefix, the width and the numbers. Returns None if the
+    names do not follow that pattern.
+    '''
+
+    matches = [re.fullmatch(r"(\D*)(\d+)", str(name)) for name in names]
+
+    if len(matches) == 0 or any(match is None for match in matches):
+        return None
+
+    prefixes = set(match.group(1) for match in matches)
+    widths = set(len(match.group(2)) for match in matches)
+
+    if len(prefixes) > 1 or len(widths) > 1:
+        return None
+
+    numbers = np.array([int(match.group(2)) for match in matches])
+
+    # e.g. "ea1" and "ea01" would both become 1.
+    if len(np.unique(numbers)) < len(numbers):
+        return None
+
+    return prefixes.pop(), widths.pop(), numbers
+
+
+def name_ref(columns, tab, colname, rows):
+    '''
+    Reference to the names in the encoded text column `colname` (e.g. the
+    antenna names) for `rows`. Names like "ea01" are stored as numbers with the
+    prefix in the template. Other names are stored as they are.
+    '''
+
+    if is_categorical(tab, colname):
+
+        split_names = name_numbers(get_categories(tab, colname))
+
+        if split_names is not None:
+            prefix, width, numbers = split_names
+
+            codes = np.asarray(tab[colname])[rows]
+
+            return prefix + customdata_ref(columns, numbers[codes], f":0{width}d")
+
+    return customdata_ref(columns, decode_column(tab, colname, rows))
+
+
+def time_ref(columns, time_mjd, telescope='vla'):
+    '''
+    Reference to the times (MJD seconds) as one column of seconds from the start
+    of the trace. The start time is written into the template in the CASA format
+    used for the flagging commands, e.g. "2021/01/01/12:00:05 + 3.2 s". The
+    seconds are cut to 0.1 s like the strings from `make_casa_timestring`.
+
+    The hover shows the start of the trace and an offset rather than the full
+    time of each point: plotly only formats the x or y values as dates, so the
+    full time would need a string per point, which makes the customdata an
+    object array written to the HTML per point (see `stack_customdata`). For a
+    flagging command, add the offset to the start time (e.g. 12:00:08.2 above).
+    Panels with time on the x-axis show the full time with `x_time_ref`.
+    '''
+
+    time_mjd = np.asarray(time_mjd, dtype=np.float64)
+
+    if len(time_mjd) == 0:
+        return customdata_ref(columns, time_mjd)
+
+    ref_mjd = np.floor(time_mjd.min())
+
+    ref_datetime = telescope_time_conversion(ref_mjd, telescope=telescope)
+
+    # Round to microseconds first so e.g. 5.3 is not cut to 5.2.
+    offsets = np.floor(np.round((time_mjd - ref_mjd) * 1e6) / 1e5) / 10
+
+    return (f"{ref_datetime.strftime('%Y/%m/%d/%H:%M:%S')} + "
+            f"{customdata_ref(columns, offsets, ':.1f')} s")
+
+
+# The time in the CASA format for traces with the times as the x values, which
+# plotly formats as dates. No customdata column is needed.
+x_time_ref = "%{x|%Y/%m/%d/%H:%M:%S.%L}"
+
+
+def channel_ref(columns, chan, chan_avg=1):
+    '''
+    Reference to the channels, shown as the range of channels in each average
+    (e.g. "40~43") when `chan_avg` > 1.
+    '''
+
+    chan = np.asarray(chan)
+
+    if chan_avg == 1:
+        return customdata_ref(columns, chan)
+
+    return (f"{customdata_ref(columns, chan_avg * chan)}~"
+            f"{customdata_ref(columns, chan_avg * (chan + 1) - 1)}")
+
+
+def frequency_ref(columns, freq):
+    '''
+    Reference to the frequencies in GHz with up to 6 decimals, as written by
+    plotms.
+    '''
+
+    return customdata_ref(columns, np.round(np.asarray(freq, dtype=np.float64), 6),
+                          ":.6~f")
+
+
+def stack_customdata(columns):
+    '''
+    Combine the customdata `columns` into one array with a row per point. When
+    all of the columns are numbers, the array is the smallest integer type that
+    holds them or float64, so it is written to the HTML as a binary typed array.
+    Text columns (e.g. antenna names that `name_numbers` cannot split) need an
+    object array, which is written per point.
+    '''
+
+    nrows = len(columns[0]) if len(columns) > 0 else 0
+
+    if all(values.dtype.kind in 'iuf' for values in columns):
+
+        customdata = np.empty((nrows, len(columns)), dtype=np.float64)
+
+        for i, values in enumerate(columns):
+            customdata[:, i] = values
+
+        if all(values.dtype.kind in 'iu' for values in columns):
+            for dtype in [np.int8, np.int16, np.int32]:
+                info = np.iinfo(dtype)
+                if nrows == 0 or (customdata.min() >= info.min and customdata.max() <= info.max):
+                    return customdata.astype(dtype)
+
+        return customdata
+
+    customdata = np.empty((nrows, len(columns)), dtype=object)
+
+    for i, values in enumerate(columns):
+        customdata[:, i] = values
+
+    return customdata
+
+
+def scan_hover(tab, rows, spw, corr, chan_avg=1, time_format='offset', telescope='vla'):
+    '''
+    The customdata and hovertemplate for a trace of the `rows` of a plotms table
+    with one `spw` and `corr`: the scan, SPW, channel, frequency, correlation,
+    antennas and time of each point. With `spw=None`, the SPW of each point is
+    shown instead.
+
+    The time is shown with `time_format`:
+
+    * 'x': the x values of the trace are the times (see `x_time_ref`).
+    * 'offset': the start of the trace plus the seconds since then, for panels
+      with another x-axis (see `time_ref`).
+    * 'mjd': the MJD seconds in the table.
+    * None: not shown.
+    '''
+
+    columns = []
+
+    scan_str = customdata_ref(columns, np.asarray(tab['scan'])[rows])
+
+    if spw is None:
+        spw = customdata_ref(columns, np.asarray(tab['spw'])[rows])
+
+    hovertemplate = (f"Scan: {scan_str}"
+                     f"<br>SPW: {spw}"
+                     f"<br>Chan: {channel_ref(columns, np.asarray(tab['chan'])[rows], chan_avg)}"
+                     f"<br>Freq: {frequency_ref(columns, np.asarray(tab['freq'])[rows])}"
+                     f"<br>Corr: {corr}"
+                     f"<br>Ant1: {name_ref(columns, tab, 'ant1name', rows)}"
+                     f"<br>Ant2: {name_ref(columns, tab, 'ant2name', rows)}")
+
+    if time_format == 'x':
+        hovertemplate += f"<br>Time: {x_time_ref}"
+    elif time_format == 'offset':
+        hovertemplate += f"<br>Time: {time_ref(columns, np.asarray(tab['time'])[rows], telescope)}"
+    elif time_format == 'mjd':
+        hovertemplate += f"<br>Time: {customdata_ref(columns, np.asarray(tab['time'])[rows])}"
+    elif time_format is not None:
+        raise ValueError(f"Unknown time_format {time_format}. "
+                         "Use 'x', 'offset', 'mjd' or None.")
+
+    return stack_customdata(columns), hovertemplate
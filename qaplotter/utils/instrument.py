@@ -0,0 +1,343 @@
+'''
+Optional timing and memory records for the readers, figure builders and HTML
+writers.
+
+Instrumentation is off by default and `measure` does nothing. After
+`start_instrumentation`, each `measure` block adds a record with the wall time,
+CPU time, memory and the bytes read and written.
+
+The memory is the resident memory (RSS) of the process at the start and end of
+the block, the change over the block (`rss_delta`) and the largest RSS while
+the block ran (`peak_rss`). See `PeakRSS` for how the peak is found. The byte
+counts come from /proc/self/io (Linux only). All of these count the whole
+process, including other threads, so blocks running at the same time in
+different threads share their peaks. Reads of memory-mapped cache files are not
+counted.
+
+Each process keeps its own records. The process pools send the records of their
+workers back with the results (see `run_stages` and `run_field_workers`).
+'''
+
+import os
+import json
+import time
+import datetime
+import threading
+from contextlib import contextmanager
+
+from ..version import version
+
+
+# List of records when enabled, otherwise None.
+_records = None
+
+
+def start_instrumentation():
+    '''
+    Start recording in this process. Discards any earlier records.
+    '''
+
+    global _records
+    _records = []
+
+
+def stop_instrumentation():
+    '''
+    Stop recording and return the records.
+    '''
+
+    global _records
+
+    records = [] if _records is None else _records
+    _records = None
+
+    return records
+
+
+def instrumentation_enabled():
+    return _records is not None
+
+
+def pop_records():
+    '''
+    Return the records so far and clear them, leaving the recording on.
+    '''
+
+    global _records
+
+    if _records is None:
+        return []
+
+    records = _records
+    _records = []
+
+    return records
+
+
+def add_records(records):
+    '''
+    Add records from another process.
+    '''
+
+    if _records is not None:
+        _records.extend(records)
+
+
+def io_counters():
+    '''
+    Bytes read and written by this process so far, or (None, None) when
+    /proc/self/io is not available.
+    '''
+
+    try:
+        with open("/proc/self/io", 'r') as f:
+            counters = dict(line.split(":") for line in f if ":" in line)
+    except OSError:
+        return None, None
+
+    return int(counters['rchar']), int(counters['wchar'])
+
+
+def current_rss():
+    '''
+    Resident memory of this process in bytes now, or None when /proc/self/statm
+    is not available.
+    '''
+
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def read_hwm():
+    '''
+    Largest resident memory of this process in bytes since it started or since
+    the last `reset_hwm` (VmHWM in /proc/self/status), or None when unknown.
+    '''
+
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        return None
+
+    return None
+
+
+def reset_hwm():
+    '''
+    Reset VmHWM to the current resident memory by writing 5 to
+    /proc/self/clear_refs (Linux 4.0+). Returns whether it was reset.
+    '''
+
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+    except OSError:
+        return False
+
+    return True
+
+
+# Whether VmHWM can be read and reset in this process. Checked on first use.
+_hwm_resettable = None
+
+# The `PeakRSS` using VmHWM that have started and not stopped.
+_open_peaks = []
+_peak_lock = threading.Lock()
+
+
+class PeakRSS(object):
+    '''
+    Largest resident memory of the process between `start` and `stop`.
+
+    On Linux, the kernel's high-water mark (VmHWM) is reset at `start` and read
+    at `stop`. The reset applies to the whole process, so before each reset the
+    current VmHWM is added to the peaks of the blocks still open (e.g. the stage
+    around a read). Otherwise, the RSS is sampled every `interval` seconds from
+    a thread. Short spikes between samples are missed.
+
+    Parameters
+    ----------
+    interval : float, optional
+        Time between samples in seconds when VmHWM cannot be used.
+    '''
+
+    def __init__(self, interval=0.01):
+
+        self.interval = interval
+
+        self.peak = None
+
+        self._thread = None
+        self._stop_event = None
+
+    def start(self):
+
+        global _hwm_resettable
+
+        with _peak_lock:
+            if _hwm_resettable is None:
+                _hwm_resettable = read_hwm() is not None and reset_hwm()
+
+            if _hwm_resettable:
+                hwm = read_hwm()
+
+                for block in _open_peaks:
+                    block.peak = max(block.peak, hwm)
+
+                reset_hwm()
+
+                self.peak = read_hwm()
+                _open_peaks.append(self)
+
+                return
+
+        self.peak = current_rss()
+
+        if self.peak is None:
+            return
+
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+
+        while not self._stop_event.wait(self.interval):
+            rss = current_rss()
+            if rss is not None:
+                self.peak = max(self.peak, rss)
+
+    def stop(self):
+        '''
+        Return the peak in bytes, or None when unknown.
+        '''
+
+        with _peak_lock:
+            if self in _open_peaks:
+                _open_peaks.remove(self)
+
+                self.peak = max(self.peak, read_hwm())
+
+                return self.peak
+
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+
+            rss = current_rss()
+            if rss is not None:
+                self.peak = max(self.peak, rss)
+
+        return self.peak
+
+
+@contextmanager
+def measure(category, name):
+    '''
+    Record the resources used in the block as `category` (e.g. "read",
+    "figure", "write_html" or "stage") with `name` (e.g. the field name).
+    '''
+
+    if _records is None:
+        yield
+        return
+
+    t0 = time.perf_counter()
+    cpu0 = time.process_time()
+    read0, written0 = io_counters()
+    rss0 = current_rss()
+
+    peak_rss = PeakRSS()
+    peak_rss.start()
+
+    try:
+        yield
+
+    finally:
+        read1, written1 = io_counters()
+        rss1 = current_rss()
+        peak = peak_rss.stop()
+
+        record = {'category': category,
+                  'name': name,
+                  'pid': os.getpid(),
+                  'wall_time': time.perf_counter() - t0,
+                  'cpu_time': time.process_time() - cpu0,
+                  'rss_start': rss0,
+                  'rss_end': rss1,
+                  'rss_delta': None if None in (rss0, rss1) else rss1 - rss0,
+                  'peak_rss': peak,
+                  'read_bytes': None if read0 is None else read1 - read0,
+                  'write_bytes': None if written0 is None else written1 - written0}
+
+        # The recording may have been stopped in the block.
+        if _records is not None:
+            _records.append(record)
+
+
+def summarize_records(records):
+    '''
+    Totals per category: number of records, wall and CPU time, bytes read and
+    written, the largest increase in RSS over one block and the largest
+    `peak_rss` of one block.
+    '''
+
+    summary = {}
+
+    for record in records:
+        totals = summary.setdefault(record['category'],
+                                    {'count': 0, 'wall_time': 0., 'cpu_time': 0.,
+                                     'read_bytes': 0, 'write_bytes': 0,
+                                     'max_rss_delta': None,
+                                     'max_peak_rss': None})
+
+        totals['count'] += 1
+        totals['wall_time'] += record['wall_time']
+        totals['cpu_time'] += record['cpu_time']
+
+        for key in ['read_bytes', 'write_bytes']:
+            if record[key] is not None:
+                totals[key] += record[key]
+
+        if record['rss_delta'] is not None:
+            if totals['max_rss_delta'] is None:
+                totals['max_rss_delta'] = record['rss_delta']
+            else:
+                totals['max_rss_delta'] = max(totals['max_rss_delta'], record['rss_delta'])
+
+        if record['peak_rss'] is not None:
+            if totals['max_peak_rss'] is None:
+                totals['max_peak_rss'] = record['peak_rss']
+            else:
+                totals['max_peak_rss'] = max(totals['max_peak_rss'], record['peak_rss'])
+
+    return summary
+
+
+def make_report(records, info=None):
+    '''
+    The report dict with the records, their summary and `info` about the run.
+    '''
+
+    return {'qaplotter': version,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'info': {} if info is None else info,
+            'summary': summarize_records(records),
+            'records': records}
+
+
+def write_report(filename, report):
+    '''
+    Save the report as JSON.
+    '''
+
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=1, default=str)
@@ -0,0 +1,143 @@
+'''
+Record of the inputs used for each figure in an output folder.
+
+Each output folder gets a JSON manifest with one entry per figure (or group of
+figures made together). An entry holds the size and mtime of every input file,
+the plotting options and the output HTML names, plus any values needed to remake
+the linking pages without reading the data again (e.g. the field intent).
+
+With `incremental=True`, the plotting functions compare the current inputs and
+options to the manifest and only remake the figures where something changed.
+The linking pages are always remade since they are cheap.
+'''
+
+import os
+import json
+import warnings
+
+from ..version import version
+
+osjoin = os.path.join
+
+MANIFEST_NAME = "qaplotter_manifest.json"
+
+# Bump when the layout of the manifest changes so old manifests are ignored.
+MANIFEST_VERSION = 1
+
+
+def path_signature(path):
+    '''
+    Size and mtime of a file. For folders (e.g. CASA images), the total size and
+    latest mtime of all files in the folder.
+    '''
+
+    if not os.path.isdir(path):
+        stat = os.stat(path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    size = 0
+    mtime_ns = os.stat(path).st_mtime_ns
+
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            stat = os.stat(osjoin(root, filename))
+            size += stat.st_size
+            mtime_ns = max(mtime_ns, stat.st_mtime_ns)
+
+    return {'size': size, 'mtime_ns': mtime_ns}
+
+
+def input_signatures(paths):
+    '''
+    Return a dict of path -> signature for the paths that exist.
+    '''
+
+    return {path: path_signature(path) for path in sorted(paths)
+            if os.path.exists(path)}
+
+
+def normalize_options(options):
+    '''
+    Round trip the options through JSON so they compare equal to the options
+    loaded from a manifest. Values without a JSON type (e.g. numpy scalars) are
+    stored as strings.
+    '''
+
+    return json.loads(json.dumps(options, sort_keys=True, default=str))
+
+
+def load_manifest(output_folder):
+    '''
+    Return the manifest in `output_folder`, or an empty manifest when there is
+    none or it was written by a different version.
+    '''
+
+    empty_manifest = {'version': MANIFEST_VERSION, 'qaplotter': version,
+                      'figures': {}}
+
+    filename = osjoin(output_folder, MANIFEST_NAME)
+
+    if not os.path.exists(filename):
+        return empty_manifest
+
+    try:
+        with open(filename, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return empty_manifest
+
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('qaplotter') != version:
+        return empty_manifest
+
+    return manifest
+
+
+def save_manifest(output_folder, manifest):
+    '''
+    Write the manifest to `output_folder`. Failures to write only raise a warning.
+    '''
+
+    filename = osjoin(output_folder, MANIFEST_NAME)
+    tmp_filename = f"{filename}.tmp{os.getpid()}"
+
+    try:
+        with open(tmp_filename, 'w') as f:
+            json.dump(manifest, f, indent=1)
+
+        os.replace(tmp_filename, filename)
+
+    except OSError as exc:
+        warnings.warn(f"Unable to write manifest for {output_folder}: {exc}")
+
+
+def make_entry(inputs, options, outputs, **info):
+    '''
+    A manifest entry for figures written to `outputs` from the `inputs`
+    signatures and `options`. Extra `info` is stored with the entry.
+    '''
+
+    entry = {'inputs': inputs,
+             'options': normalize_options(options),
+             'outputs': list(outputs)}
+
+    entry.update(info)
+
+    return entry
+
+
+def is_up_to_date(manifest, name, inputs, options, output_folder):
+    '''
+    Whether the entry `name` in the manifest was made from the same `inputs`
+    and `options`, and all of its outputs still exist.
+    '''
+
+    entry = manifest['figures'].get(name)
+
+    if entry is None:
+        return False
+
+    if entry['inputs'] != inputs or entry['options'] != normalize_options(options):
+        return False
+
+    return all(os.path.exists(osjoin(output_folder, output))
+               for output in entry['outputs'])
@@ -0,0 +1,155 @@
+'''
+Opt-in cProfile and tracemalloc profiling of the plotting functions.
+
+Profiling is turned on with the `profile` keyword of the `make_*_plots`
+functions or the QAPLOTTER_PROFILE environment variable, e.g.
+QAPLOTTER_PROFILE="cprofile,tracemalloc". The results are written to the output
+folder of each function:
+
+* "profile_{label}.prof" from cProfile, for `pstats` or snakeviz.
+* "profile_{label}_tracemalloc.txt" with the peak traced memory and the lines
+  with the largest allocations still held at the end.
+
+Only the process calling the function is profiled, not the pool workers used
+with `n_workers` > 1.
+'''
+
+import os
+import inspect
+import cProfile
+import functools
+import tracemalloc
+from contextlib import contextmanager
+
+osjoin = os.path.join
+
+PROFILE_ENV = "QAPLOTTER_PROFILE"
+
+profile_modes = ['cprofile', 'tracemalloc']
+
+
+def get_profile_modes(profile=None):
+    '''
+    Return the set of profiling modes from the `profile` keyword or, if it is
+    None, the QAPLOTTER_PROFILE environment variable. `profile` can be a mode,
+    a comma-separated string or list of modes, True for all modes or False for
+    none.
+    '''
+
+    if profile is None:
+        profile = os.environ.get(PROFILE_ENV, "")
+
+    if profile is True:
+        return set(profile_modes)
+
+    if profile is False:
+        return set()
+
+    if isinstance(profile, str):
+        profile = profile.split(",")
+
+    modes = set(mode.strip().lower() for mode in profile) - {""}
+
+    unknown_modes = modes - set(profile_modes)
+    if len(unknown_modes) > 0:
+        raise ValueError(f"Unknown profile modes {sorted(unknown_modes)}. "
+                         f"Choose from {profile_modes}.")
+
+    return modes
+
+
+def write_tracemalloc_summary(filename, snapshot, peak, ntop=25):
+    '''
+    Write the peak traced memory and the `ntop` lines with the largest
+    allocations in `snapshot`.
+    '''
+
+    stats = snapshot.statistics('lineno')
+
+    with open(filename, 'w') as f:
+        f.write(f"Peak traced memory: {peak / 1024**2:.1f} MB\n")
+        f.write(f"Top {ntop} lines by memory held at the end:\n")
+
+        for stat in stats[:ntop]:
+            f.write(f"{stat}\n")
+
+
+@contextmanager
+def profile_block(label, output_folder, profile=None, ntop=25):
+    '''
+    Profile the block with the modes from `profile` (see `get_profile_modes`)
+    and write the results to `output_folder`.
+    '''
+
+    modes = get_profile_modes(profile)
+
+    if len(modes) == 0:
+        yield
+        return
+
+    profiler = None
+    if 'cprofile' in modes:
+        profiler = cProfile.Profile()
+
+    # Leave tracemalloc running if it was started outside of this block.
+    started_tracemalloc = False
+    if 'tracemalloc' in modes:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracemalloc = True
+        elif hasattr(tracemalloc, 'reset_peak'):
+            # Python >= 3.9
+            tracemalloc.reset_peak()
+
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        yield
+
+    finally:
+        if profiler is not None:
+            profiler.disable()
+
+        os.makedirs(output_folder, exist_ok=True)
+
+        if profiler is not None:
+            prof_filename = osjoin(output_folder, f"profile_{label}.prof")
+            profiler.dump_stats(prof_filename)
+            print(f"Saved the cProfile output to {prof_filename}")
+
+        if 'tracemalloc' in modes:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+
+            if started_tracemalloc:
+                tracemalloc.stop()
+
+            mem_filename = osjoin(output_folder, f"profile_{label}_tracemalloc.txt")
+            write_tracemalloc_summary(mem_filename, snapshot, peak, ntop=ntop)
+            print(f"Saved the tracemalloc summary to {mem_filename}")
+
+
+def profiled(label):
+    '''
+    Decorator that profiles a function with `profile_block`. The function needs
+    `output_folder` and `profile` arguments.
+    '''
+
+    def decorator(func):
+
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+
+            with profile_block(label, bound.arguments['output_folder'],
+                               profile=bound.arguments['profile']):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
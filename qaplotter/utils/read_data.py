@@ -1,33 +1,375 @@
 
 from astropy.table import Table, vstack
 import os
-from glob import glob
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import pandas as pd
+
+from .table_cache import load_cached_table, write_cached_table, source_signature
+from .file_index import (build_field_txt_index, field_tab_types, index_signature,
+                         build_caltable_txt_index, caltable_specs,
+                         select_caltable_files)
+from .compact import compact_table, print_compact_report
+from .decimation import (MinMaxDecimator, ReservoirSample, decimation_methods,
+                         decimate_table)
+from .categorical import (categorical_columns, encode_categorical_columns,
+                          set_categorical_column, is_categorical, decode_column,
+                          rename_categorical_column, merge_categories, encode_values,
+                          code_dtype)
 
 osjoin = os.path.join
 
 
-def read_casa_txt(filename):
+def read_casa_txt(filename, use_cache=True, cache_dir=None, refresh_cache=False,
+                  signature=None, compact_dtypes=False, stream_above=None,
+                  stream_kwargs=None):
+    '''
+    Read a plotms txt file into a table and a dictionary of the meta-data.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the txt file.
+    use_cache : bool, optional
+        Read from and write to the binary table cache. See `table_cache`.
+    cache_dir : str, optional
+        Cache directory. Defaults to ~/.cache/qaplotter or QAPLOTTER_CACHE_DIR.
+    refresh_cache : bool, optional
+        Ignore any existing cache entry and re-parse the txt file.
+    signature : dict, optional
+        Size and mtime of the file if already known (see `file_index`).
+    compact_dtypes : bool, optional
+        Downcast the numeric columns to float32/int16/int32 where this does not
+        change the plots. See `compact_table`. The cache always keeps the full
+        precision table.
+    stream_above : int, optional
+        Files larger than this many bytes are read in chunks and reduced to a
+        bounded number of rows with `read_casa_txt_streaming`. These reduced
+        tables are not cached. Default is None, which always reads the full file.
+    stream_kwargs : dict, optional
+        Keyword arguments for `read_casa_txt_streaming`.
+    '''
+
+    if stream_above is not None:
+        if signature is None:
+            signature = source_signature(filename)
+
+        if signature['size'] > stream_above:
+            if stream_kwargs is None:
+                stream_kwargs = {}
+
+            tab, meta_dict = read_casa_txt_streaming(filename, **stream_kwargs)
+
+            if compact_dtypes:
+                compact_table(tab)
+
+            return tab, meta_dict
+
+    if use_cache and not refresh_cache:
+        out = load_cached_table(filename, cache_dir=cache_dir, signature=signature)
+        if out is not None:
+            if compact_dtypes:
+                compact_table(out[0])
+            return out
 
-    # Grab the meta-data from the header
-    meta_lines = skim_header_metadata(filename)
+    try:
+        tab, meta_dict = read_casa_txt_fast(filename)
+    except Exception as e:
+        print(f"Fast reader failed on {filename} with exception {e}. "
+              "Trying the astropy reader.")
+
+        tab, meta_dict = read_casa_txt_astropy(filename)
+
+        # Do not cache failed reads.
+        if len(tab.colnames) == 0:
+            return tab, meta_dict
+
+    if use_cache:
+        write_cached_table(filename, tab, meta_dict, cache_dir=cache_dir,
+                           signature=signature)
+
+    if compact_dtypes:
+        compact_table(tab)
+
+    return tab, meta_dict
+
+
+def read_casa_txt_fast(filename):
+    '''
+    Read a plotms txt file in a single pass. The meta-data header, the column names
+    and the units lines are read first, then the numeric body is parsed with the
+    pandas C tokenizer from the same open file.
+
+    Returns the same (Table, meta_dict) as `read_casa_txt`. The text columns are
+    returned as integer codes (see `categorical`).
+    '''
+
+    # Binary mode lets pandas tokenize the raw bytes without decoding in python.
+    with open(filename, 'rb') as f:
+
+        meta_lines, colnames = read_txt_header(f, filename)
+
+        # Parsing the few unique strings as categories is much faster than
+        # creating a python string per row.
+        dtypes = {colname: 'category' for colname in categorical_columns
+                  if colname in colnames}
+
+        try:
+            df = pd.read_csv(f, sep=r'\s+', names=colnames, header=None,
+                             dtype=dtypes, engine='c', comment='#')
+        except pd.errors.EmptyDataError:
+            df = None
 
     meta_dict = make_meta_dict(meta_lines)
 
-    # After the plot 0 line
-    header_start = len(meta_lines) + 1
-    # One for column names, another for units.
-    data_start = len(meta_lines) + 3
+    # No data rows (e.g., fully flagged)
+    if df is None or len(df) == 0:
+        return Table(names=colnames, dtype=[float] * len(colnames)), meta_dict
+
+    tab = Table()
+    for colname in colnames:
+        column = df[colname]
+
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            categories = np.asarray(column.cat.categories.astype(str), dtype=str)
+            codes = column.cat.codes.to_numpy()
+
+            # Keep the categories sorted so the codes sort like the strings.
+            order = np.argsort(categories)
+            if np.any(order != np.arange(len(categories))):
+                categories = categories[order]
+                codes = np.argsort(order).astype(codes.dtype)[codes]
+
+            set_categorical_column(tab, colname, codes, categories)
+
+        else:
+            values = column.to_numpy()
+
+            # Match the fixed-width unicode columns from the astropy reader.
+            if values.dtype.kind == 'O':
+                values = values.astype(str)
+
+            tab.add_column(values, name=colname, copy=False)
+
+    return tab, meta_dict
+
+
+def read_casa_txt_streaming(filename, max_rows=20000, method='minmax',
+                            chunk_rows=500000, seed=0):
+    '''
+    Read a large plotms txt file in chunks of `chunk_rows` rows and keep at most
+    `max_rows` rows for each (spw, corr) combination. The memory used depends on
+    `chunk_rows` and `max_rows` but not on the size of the file.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the txt file.
+    max_rows : int, optional
+        Maximum number of rows kept per SPW and correlation.
+    method : str, optional
+        "minmax" keeps the rows with the lowest and highest y value in bins of
+        consecutive rows (see `MinMaxDecimator`). "reservoir" keeps a uniform
+        random sample (see `ReservoirSample`).
+    chunk_rows : int, optional
+        Number of rows parsed at a time. Each chunk takes roughly 150 bytes per
+        row while it is parsed.
+    seed : int, optional
+        Seed for the "reservoir" sampling.
+
+    Returns the same (Table, meta_dict) as `read_casa_txt`, with the rows in the
+    order of the file.
+    '''
+
+    if method not in decimation_methods:
+        raise ValueError(f"method must be one of {decimation_methods}. Given {method}")
+
+    rng = np.random.default_rng(seed)
+
+    # (spw, corr code) packed into one integer -> reducer
+    reducers = {}
+
+    # Text value -> code across all chunks, for each text column.
+    all_categories = {}
+
+    nrows_read = 0
+
+    with open(filename, 'rb') as f:
+
+        meta_lines, colnames = read_txt_header(f, filename)
+
+        dtypes = {colname: 'category' for colname in categorical_columns
+                  if colname in colnames}
+
+        for colname in dtypes:
+            all_categories[colname] = {}
+
+        corr_colname = 'poln' if 'poln' in colnames else 'corr'
+
+        try:
+            reader = pd.read_csv(f, sep=r'\s+', names=colnames, header=None,
+                                 dtype=dtypes, engine='c', comment='#',
+                                 chunksize=chunk_rows)
+
+            for df in reader:
+
+                columns = {}
+                for colname in colnames:
+                    if colname in dtypes:
+                        columns[colname] = chunk_category_codes(df[colname],
+                                                                all_categories[colname])
+                    else:
+                        columns[colname] = df[colname].to_numpy()
+
+                        if columns[colname].dtype.kind == 'O':
+                            columns[colname] = columns[colname].astype(str)
+
+                # Row number in the file to restore the order at the end.
+                columns['_row'] = nrows_read + np.arange(len(df))
+
+                nrows_read += len(df)
+
+                spw = columns['spw'] if 'spw' in columns else np.zeros(len(df), dtype=int)
+                if corr_colname in columns:
+                    corr = columns[corr_colname]
+                else:
+                    corr = np.zeros(len(df), dtype=int)
+
+                # One integer per (spw, corr) pair is much faster to group by
+                # than unique rows of a 2D array.
+                group_keys = (spw.astype(np.int64) << 32) | (corr.astype(np.int64) & 0xffffffff)
+
+                groups, group_idx = np.unique(group_keys, return_inverse=True)
+
+                order = np.argsort(group_idx, kind='stable')
+                splits = np.cumsum(np.bincount(group_idx, minlength=len(groups)))[:-1]
+
+                for key, rows in zip(groups.tolist(), np.split(order, splits)):
+
+                    if key not in reducers:
+                        if method == 'minmax':
+                            reducers[key] = MinMaxDecimator(max_rows)
+                        else:
+                            reducers[key] = ReservoirSample(max_rows, rng=rng)
+
+                    reducers[key].add({colname: values[rows]
+                                       for colname, values in columns.items()})
+
+                del df, columns
+
+        except pd.errors.EmptyDataError:
+            pass
+
+    meta_dict = make_meta_dict(meta_lines)
+
+    results = [reducer.result() for reducer in reducers.values()]
+    results = [result for result in results if result is not None]
+
+    if len(results) == 0:
+        return Table(names=colnames, dtype=[float] * len(colnames)), meta_dict
+
+    order = np.argsort(np.concatenate([result['_row'] for result in results]))
+
+    tab = Table()
+    for colname in colnames:
+        values = np.concatenate([result[colname] for result in results])[order]
+
+        if colname in all_categories:
+            # Renumber the codes so the categories are sorted.
+            categories = np.array(list(all_categories[colname].keys()), dtype=str)
+            rank = np.argsort(np.argsort(categories))
+            codes = np.where(values >= 0, rank[values], -1).astype(code_dtype(len(categories)))
+
+            set_categorical_column(tab, colname, codes, np.sort(categories))
+
+        else:
+            tab.add_column(values, name=colname, copy=False)
+
+    print(f"Read {filename} in chunks. Kept {len(tab)} of {nrows_read} rows ({method}).")
+
+    return tab, meta_dict
+
+
+def chunk_category_codes(column, categories):
+    '''
+    Map the codes of a pandas categorical column onto `categories`, a dict of
+    value -> code shared across chunks. New values are added to `categories`.
+    '''
+
+    remap = np.array([categories.setdefault(str(value), len(categories))
+                      for value in column.cat.categories], dtype=np.int32)
+
+    codes = column.cat.codes.to_numpy()
+
+    if len(remap) == 0:
+        return np.full(len(codes), -1, dtype=np.int32)
+
+    # -1 marks missing values
+    return np.where(codes >= 0, remap[codes], -1)
+
+
+def read_txt_header(f, filename):
+    '''
+    Read the meta-data lines, column names and units lines from a plotms txt file
+    opened in binary mode. Returns the meta-data lines and the column names, with
+    `f` left at the start of the data.
+    '''
+
+    search_str = "# From plot 0"
+
+    # See skim_header_metadata
+    max_line = 50
+
+    meta_lines = []
+
+    for i, line in enumerate(f):
+        line = line.decode()
+
+        if search_str in line:
+            break
+
+        meta_lines.append(line)
+
+        if i > max_line:
+            raise ValueError(f"Could not find header in {filename}")
+
+    # Column names, then units. Strip off the leading "#"
+    colnames = f.readline().decode().lstrip("#").split()
+    f.readline()
+
+    if len(colnames) == 0:
+        raise ValueError(f"Could not find the column names in {filename}")
+
+    return meta_lines, colnames
+
+
+def read_casa_txt_astropy(filename):
+    '''
+    Read a plotms txt file with the astropy ASCII reader. This is slower than
+    `read_casa_txt_fast` and is kept as a fallback.
+
+    The header is read with `read_txt_header` so both readers return the same
+    rows.
+    '''
 
     try:
-        tab = Table.read(filename,
-                        format='ascii.commented_header',
-                        header_start=header_start,
-                        data_start=data_start)
+        with open(filename, 'rb') as f:
+            meta_lines, colnames = read_txt_header(f, filename)
+
+            data_lines = f.read().decode().splitlines()
+
+        tab = Table.read(data_lines, format='ascii.no_header', names=colnames)
+
     except Exception as e:
-        print(f"Failured reading {tabname} with exception {e}.")
+        print(f"Failured reading {filename} with exception {e}.")
+
+        meta_lines = skim_header_metadata(filename)
         tab = Table()
 
+    meta_dict = make_meta_dict(meta_lines)
+
+    encode_categorical_columns(tab)
+
     return tab, meta_dict
 
 
@@ -91,29 +433,62 @@ def make_meta_dict(meta_lines):
     return data_dict
 
 
-def read_field_data_tables(fieldname, inp_path, try_per_scan=True):
+def read_field_data_tables(fieldname, inp_path, try_per_scan=True,
+                           use_cache=True, cache_dir=None, refresh_cache=False,
+                           file_index=None, read_workers=None, compact_dtypes=False,
+                           stream_above=None, stream_kwargs=None, preview_rows=None):
     '''
     Read in a set of tables for a given `fieldname`. Note that this depends on the function:
     https://github.com/e-koch/ReductionPipeline/blob/master/lband_pipeline/qa_plotting/qa_plot_tools.py#L311.
     Because of this, the read-in is not generalized and may need to be updated.
+
+    `file_index` is the output of `build_field_txt_index` for `inp_path`. Pass it
+    when reading many fields so the folder is only listed once.
+
+    Per-scan tables are read with a pool of `read_workers` threads (default is
+    `default_read_workers()`) and combined with `concatenate_tables`.
+
+    With `compact_dtypes`, the numeric columns are downcast where this does not
+    change the plots (see `compact_table`) and the memory saved per table is
+    printed.
+
+    Files larger than `stream_above` bytes are reduced while reading with
+    `read_casa_txt_streaming`, which takes `stream_kwargs`.
+
+    With `preview_rows`, each table is reduced to at most that many rows per SPW
+    and correlation after reading (see `decimate_table`).
     '''
 
     table_dict = dict()
     meta_dict = dict()
 
     # Table types:
-    tab_types = ["amp_chan", "amp_phase", "amp_time", "amp_uvdist", "phase_chan",
-                 "phase_time", "phase_uvdist", "ampresid_uvwave", "amp_ant1",
-                 "phase_ant1"]
+    tab_types = field_tab_types
     # Target fields will not have the phase tables.
     # Cal fields should have all
 
+    read_kwargs = dict(use_cache=use_cache, cache_dir=cache_dir,
+                       refresh_cache=refresh_cache, compact_dtypes=compact_dtypes,
+                       stream_above=stream_above, stream_kwargs=stream_kwargs)
+
+    if file_index is None:
+        file_index = build_field_txt_index(inp_path)
+
+    if read_workers is None:
+        read_workers = default_read_workers()
+
+    field_files = file_index.get(fieldname, {})
+
     print(f" On field {fieldname}.")
 
     for tab_type in tab_types:
         tabname = osjoin(inp_path, f"field_{fieldname}_{tab_type}.txt")
-        if os.path.exists(tabname):
-            out = read_casa_txt(tabname)
+
+        scan_files = field_files.get(tab_type, {})
+
+        if None in scan_files:
+            out = read_casa_txt(tabname, signature=index_signature(scan_files[None]),
+                                **read_kwargs)
 
             table_dict[tab_type] = out[0]
             meta_dict[tab_type] = out[1]
@@ -122,32 +497,38 @@ def read_field_data_tables(fieldname, inp_path, try_per_scan=True):
             # Recent change to output txt tables per scan to reduce the memory footprint
             # when calling plotms
             if try_per_scan:
-                tabnames = list(glob(osjoin(inp_path, f"field_{fieldname}_{tab_type}.scan_*.txt")))
 
-                if len(tabnames) == 0:
+                if len(scan_files) == 0:
                     print(f"Could not find {tabname} per scans. Skipping.")
                     continue
 
-                # Loop through and stack the tables
-                scan_tables = []
-                for tabname in tabnames:
-                    # Skip empty tables
-                    if os.path.getsize(tabname) < 1000:
-                        continue
+                # Skip empty tables
+                scan_infos = [file_info for file_info in scan_files.values()
+                              if file_info['size'] >= 1000]
 
-                    out = read_casa_txt(tabname)
-
-                    scan_tables.append(out[0])
-
-                if len(scan_tables) == 0:
+                if len(scan_infos) == 0:
                     print(f"Could not find {tabname} per scans. Skipping.")
                     continue
 
-                comb_table = vstack(scan_tables)
+                def read_scan_table(file_info):
+                    return read_casa_txt(file_info['path'],
+                                         signature=index_signature(file_info),
+                                         **read_kwargs)
+
+                # Read the scans in parallel, then stack the tables
+                if read_workers == 1 or len(scan_infos) == 1:
+                    outs = [read_scan_table(file_info) for file_info in scan_infos]
+                else:
+                    with ThreadPoolExecutor(max_workers=read_workers) as executor:
+                        outs = list(executor.map(read_scan_table, scan_infos))
+
+                out = outs[-1]
+
+                comb_table = concatenate_tables([this_out[0] for this_out in outs])
 
                 # CASA v6.6 is outputting a "poln" column name; previous versions used 'corr'
                 if 'poln' in comb_table.colnames:
-                    comb_table.rename_column('poln', 'corr')
+                    rename_categorical_column(comb_table, 'poln', 'corr')
 
                 table_dict[tab_type] = comb_table
 
@@ -159,322 +540,353 @@ def read_field_data_tables(fieldname, inp_path, try_per_scan=True):
                 if not try_per_scan:
                     print(f"Could not find {tabname}. Skipping.")
 
-    return table_dict, meta_dict
-
-
-def read_bpcal_data_tables(inp_path):
-    '''
-    Read in the BP txt files for amp and phase.
-    '''
-
-    table_dict = dict()
-    meta_dict = dict()
-
-    # Table types:
-    tab_types = ["amp", "phase"]
-
-    for tab_type in tab_types:
-        table_dict[tab_type] = {}
-        meta_dict[tab_type] = {}
-
-    amp_tab_names = glob(f"{inp_path}/*finalBPcal_freq_amp*.txt")
-    phase_tab_names = glob(f"{inp_path}/*finalBPcal_freq_phase*.txt")
-
-    # If either of these return 0, try the old naming scheme:
-    if len(amp_tab_names) == 0 or len(phase_tab_names) == 0:
-        amp_tab_names = glob(f"{inp_path}/*finalBPcal_amp*.txt")
-        phase_tab_names = glob(f"{inp_path}/*finalBPcal_phase*.txt")
-
-    if len(amp_tab_names) != len(phase_tab_names):
-        raise ValueError("Number of BP amp tables does not match BP phase tables.: "
-                         f"Num amp tables: {len(amp_tab_names)}. Num phase tables: {len(phase_tab_names)}")
-
-    # Sort by SPW and create a text
-
-    spw_nums = [int(tab.rstrip(".txt").split("spw")[1]) for tab in amp_tab_names]
-
-    for spw in spw_nums:
-
-        # There aren't many to loop through.
-        for amp_name in amp_tab_names:
-
-            if f"_spw{spw}.txt" in amp_name:
-                break
-
-        for phase_name in phase_tab_names:
-
-            if f"_spw{spw}.txt" in phase_name:
-                break
-
-        amp_out = read_casa_txt(amp_name)
-        phase_out = read_casa_txt(phase_name)
+    if compact_dtypes:
+        for tab_type, tab in table_dict.items():
+            print_compact_report(f"{fieldname} {tab_type}", [tab])
 
-        table_dict['amp'][spw] = amp_out[0]
-        table_dict['phase'][spw] = phase_out[0]
-
-        meta_dict['amp'][spw] = amp_out[1]
-        meta_dict['phase'][spw] = phase_out[1]
+    if preview_rows is not None:
+        table_dict = {tab_type: decimate_table(tab, preview_rows)
+                      for tab_type, tab in table_dict.items()}
 
     return table_dict, meta_dict
 
 
-def read_delay_data_tables(inp_path):
+def default_read_workers():
     '''
-    Read in the BP txt files for amp and phase.
+    Number of threads used to read per-scan tables. The parsing and the disk
+    reads both release the GIL, so threads are used over processes.
     '''
+    return min(8, os.cpu_count() or 1)
 
-    table_dict = dict()
-    meta_dict = dict()
 
-    # Table types:
-    tab_types = ["delay"]
-
-    for tab_type in tab_types:
-        table_dict[tab_type] = {}
-        meta_dict[tab_type] = {}
-
-    delay_tab_names = glob(f"{inp_path}/*finaldelay_freq_delay*.txt")
-
-    # Sort by SPW and create a text
-    ant_nums = [int(tab.rstrip(".txt").split("ant")[1]) for tab in delay_tab_names]
-
-    for ant in ant_nums:
+def concatenate_tables(tables):
+    '''
+    Stack tables with the same columns into one table. Unlike `astropy.table.vstack`,
+    the output columns are allocated once and each input is copied once.
+    The codes of the text columns (see `categorical`) are remapped onto the
+    combined categories.
 
-        # There aren't many to loop through.
-        for ant_name in delay_tab_names:
+    Empty tables are skipped. Falls back to `vstack` when the column names differ.
+    '''
 
-            if f"_ant{ant}.txt" in ant_name:
-                break
+    tables = [tab for tab in tables if len(tab) > 0]
 
-        delay_out = read_casa_txt(ant_name)
+    if len(tables) == 0:
+        return Table()
 
-        table_dict['delay'][ant] = delay_out[0]
+    # CASA v6.6 is outputting a "poln" column name; previous versions used 'corr'
+    for tab in tables:
+        if 'poln' in tab.colnames and 'corr' not in tab.colnames:
+            rename_categorical_column(tab, 'poln', 'corr')
 
-        meta_dict['delay'][ant] = delay_out[1]
+    colnames = tables[0].colnames
 
-    return table_dict, meta_dict
+    if any(tab.colnames != colnames for tab in tables[1:]):
+        # Compare the text columns as strings across tables
+        decoded_tables = []
+        for tab in tables:
+            decoded_tab = Table(tab, copy=False)
+            decoded_tab.meta = {}
+            for colname in tab.colnames:
+                if is_categorical(tab, colname):
+                    decoded_tab[colname] = decode_column(tab, colname)
+            decoded_tables.append(decoded_tab)
 
+        return encode_categorical_columns(vstack(decoded_tables))
 
-def read_BPinitialgain_data_tables(inp_path):
-    '''
-    Read in the BP txt files for amp and phase.
-    '''
+    if len(tables) == 1:
+        return tables[0]
 
-    table_dict = dict()
-    meta_dict = dict()
+    nrows = sum(len(tab) for tab in tables)
 
-    # Table types:
-    tab_types = ["phase"]
+    out_tab = Table()
 
-    for tab_type in tab_types:
-        table_dict[tab_type] = {}
-        meta_dict[tab_type] = {}
+    for colname in colnames:
 
-    bpinitial_tab_names = glob(f"{inp_path}/*finalBPinitialgain_time_phase*.txt")
+        if any(is_categorical(tab, colname) for tab in tables):
 
-    # Sort by SPW and create a text
-    ant_nums = [int(tab.rstrip(".txt").split("ant")[1]) for tab in bpinitial_tab_names]
+            if all(is_categorical(tab, colname) for tab in tables):
+                all_codes, categories = merge_categories(tables, colname)
+                codes = np.concatenate(all_codes)
+            else:
+                codes, categories = encode_values(np.concatenate([decode_column(tab, colname)
+                                                                  for tab in tables]))
 
-    for ant in ant_nums:
+            set_categorical_column(out_tab, colname, codes, categories)
 
-        # There aren't many to loop through.
-        for ant_name in bpinitial_tab_names:
+            continue
 
-            if f"_ant{ant}.txt" in ant_name:
-                break
+        # Also promotes e.g. int to float, and to the longest string width.
+        dtype = np.result_type(*[tab[colname].dtype for tab in tables])
 
-        phase_out = read_casa_txt(ant_name)
+        out_column = np.empty(nrows, dtype=dtype)
 
-        table_dict['phase'][ant] = phase_out[0]
+        start = 0
+        for tab in tables:
+            end = start + len(tab)
+            out_column[start:end] = tab[colname]
+            start = end
 
-        meta_dict['phase'][ant] = phase_out[1]
+        out_tab.add_column(out_column, name=colname, copy=False)
 
-    return table_dict, meta_dict
+    return out_tab
 
 
-def read_phaseshortgaincal_data_tables(inp_path):
+def read_caltables(inp_path, families=None, use_cache=True, cache_dir=None,
+                   refresh_cache=False, file_index=None, read_workers=None,
+                   compact_dtypes=False, preview_rows=None):
     '''
-    Read in the BP txt files for amp and phase.
+    Read the txt files for a set of caltable families (see `caltable_specs`).
+    `inp_path` is listed once for all families and the files are read with a
+    shared pool of `read_workers` threads (default is `default_read_workers()`).
+
+    Parameters
+    ----------
+    inp_path : str
+        Folder with the caltable txt files.
+    families : list, optional
+        Keys of `caltable_specs` to read. Defaults to all.
+    use_cache : bool, optional
+        Use the binary table cache. See `read_casa_txt`.
+    cache_dir : str, optional
+        Location of the binary table cache.
+    refresh_cache : bool, optional
+        Re-parse the txt files and overwrite their cache entries.
+    file_index : dict, optional
+        Output of `build_caltable_txt_index` for `inp_path`.
+    read_workers : int, optional
+        Number of threads used to read the files.
+    compact_dtypes : bool, optional
+        Downcast the numeric columns where this does not change the plots and
+        print the memory saved per family. See `compact_table`.
+    preview_rows : int, optional
+        Reduce each table to at most this many rows per SPW and correlation.
+        See `decimate_table`.
+
+    Returns
+    -------
+    out_dict : dict
+        family -> (table_dict, meta_dict). Both dicts are keyed by table type, then
+        by the SPW or antenna number.
     '''
 
-    table_dict = dict()
-    meta_dict = dict()
-
-    # Table types:
-    tab_types = ["phase"]
-
-    for tab_type in tab_types:
-        table_dict[tab_type] = {}
-        meta_dict[tab_type] = {}
+    if families is None:
+        families = list(caltable_specs.keys())
 
-    phaseshort_tab_names = glob(f"{inp_path}/*phaseshortgaincal_time_phase*.txt")
+    read_kwargs = dict(use_cache=use_cache, cache_dir=cache_dir,
+                       refresh_cache=refresh_cache, compact_dtypes=compact_dtypes)
 
-    # Sort by SPW and create a text
-    ant_nums = [int(tab.rstrip(".txt").split("ant")[1]) for tab in phaseshort_tab_names]
+    if file_index is None:
+        file_index = build_caltable_txt_index(inp_path)
 
-    for ant in ant_nums:
+    if read_workers is None:
+        read_workers = default_read_workers()
 
-        # There aren't many to loop through.
-        for ant_name in phaseshort_tab_names:
+    out_dict = {}
 
-            if f"_ant{ant}.txt" in ant_name:
-                break
+    # (family, tab_type, number, file_info) for every file to read
+    read_list = []
 
-        phase_out = read_casa_txt(ant_name)
+    for family in families:
+        spec = caltable_specs[family]
 
-        table_dict['phase'][ant] = phase_out[0]
+        tab_files = select_caltable_files(file_index.get(family, {}), spec)
 
-        meta_dict['phase'][ant] = phase_out[1]
+        tab_types = list(tab_files.keys())
 
-    return table_dict, meta_dict
+        # Tables with more than one type (i.e., the bandpass amp and phase) need
+        # to have one of each per SPW.
+        for tab_type in tab_types[1:]:
+            if len(tab_files[tab_type]) != len(tab_files[tab_types[0]]):
+                raise ValueError(f"Number of {spec['label']} {tab_types[0]} tables does not match "
+                                 f"{spec['label']} {tab_type} tables.: "
+                                 f"Num {tab_types[0]} tables: {len(tab_files[tab_types[0]])}. "
+                                 f"Num {tab_type} tables: {len(tab_files[tab_type])}")
 
+            missing = set(tab_files[tab_types[0]]) ^ set(tab_files[tab_type])
+            if len(missing) > 0:
+                raise ValueError(f"{spec['label']} {tab_types[0]} and {tab_type} tables "
+                                 f"do not have the same {spec['key']} numbers: {sorted(missing)}")
 
-def read_ampgaincal_time_data_tables(inp_path):
-    '''
-    Read in the BP txt files for amp and phase.
-    '''
+        out_dict[family] = ({tab_type: {} for tab_type in tab_types},
+                            {tab_type: {} for tab_type in tab_types})
 
-    table_dict = dict()
-    meta_dict = dict()
+        for tab_type, number_dict in tab_files.items():
+            for number, file_info in number_dict.items():
+                read_list.append((family, tab_type, number, file_info))
 
-    # Table types:
-    tab_types = ["amp"]
-
-    for tab_type in tab_types:
-        table_dict[tab_type] = {}
-        meta_dict[tab_type] = {}
-
-    ampgaincal_tab_names = glob(f"{inp_path}/*finalampgaincal_time_amp*.txt")
+    def read_caltable(read_info):
+        file_info = read_info[3]
+        return read_casa_txt(file_info['path'], signature=index_signature(file_info),
+                             **read_kwargs)
 
-    # Sort by SPW and create a text
-    ant_nums = [int(tab.rstrip(".txt").split("ant")[1]) for tab in ampgaincal_tab_names]
+    if read_workers == 1 or len(read_list) <= 1:
+        outs = [read_caltable(read_info) for read_info in read_list]
+    else:
+        with ThreadPoolExecutor(max_workers=read_workers) as executor:
+            outs = list(executor.map(read_caltable, read_list))
 
-    for ant in ant_nums:
-
-        # There aren't many to loop through.
-        for ant_name in ampgaincal_tab_names:
-
-            if f"_ant{ant}.txt" in ant_name:
-                break
+    for (family, tab_type, number, _), out in zip(read_list, outs):
+        table_dict, meta_dict = out_dict[family]
 
-        amp_out = read_casa_txt(ant_name)
+        table_dict[tab_type][number] = out[0]
+        meta_dict[tab_type][number] = out[1]
 
-        table_dict['amp'][ant] = amp_out[0]
+        if preview_rows is not None:
+            table_dict[tab_type][number] = decimate_table(out[0], preview_rows)
 
-        meta_dict['amp'][ant] = amp_out[1]
+    if compact_dtypes:
+        for family, (table_dict, _) in out_dict.items():
+            print_compact_report(family, [tab for tables in table_dict.values()
+                                          for tab in tables.values()])
 
-    return table_dict, meta_dict
+    return out_dict
 
 
-def read_ampgaincal_freq_data_tables(inp_path):
+def read_bpcal_data_tables(inp_path, **kwargs):
     '''
-    Read in the BP txt files for amp and phase.
+    Read in the BP txt files for amp and phase. See `read_caltables`.
     '''
+    return read_caltables(inp_path, families=['bandpass'], **kwargs)['bandpass']
 
-    table_dict = dict()
-    meta_dict = dict()
-
-    # Table types:
-    tab_types = ["amp"]
-
-    for tab_type in tab_types:
-        table_dict[tab_type] = {}
-        meta_dict[tab_type] = {}
-
-    ampgaincal_tab_names = glob(f"{inp_path}/*finalampgaincal_freq_amp*.txt")
-
-    # Sort by SPW and create a text
-    ant_nums = [int(tab.rstrip(".txt").split("ant")[1]) for tab in ampgaincal_tab_names]
-
-    for ant in ant_nums:
-
-        # There aren't many to loop through.
-        for ant_name in ampgaincal_tab_names:
-
-            if f"_ant{ant}.txt" in ant_name:
-                break
-
-        amp_out = read_casa_txt(ant_name)
-
-        table_dict['amp'][ant] = amp_out[0]
 
-        meta_dict['amp'][ant] = amp_out[1]
-
-    return table_dict, meta_dict
+def read_delay_data_tables(inp_path, **kwargs):
+    '''
+    Read in the delay txt files per antenna. See `read_caltables`.
+    '''
+    return read_caltables(inp_path, families=['delay'], **kwargs)['delay']
 
 
-def read_phasegaincal_data_tables(inp_path):
+def read_BPinitialgain_data_tables(inp_path, **kwargs):
     '''
-    Read in the BP txt files for amp and phase.
+    Read in the initial BP phase gain txt files per antenna. See `read_caltables`.
     '''
+    return read_caltables(inp_path, families=['BPinitialgain'], **kwargs)['BPinitialgain']
 
-    table_dict = dict()
-    meta_dict = dict()
-
-    # Table types:
-    tab_types = ["phase"]
 
-    for tab_type in tab_types:
-        table_dict[tab_type] = {}
-        meta_dict[tab_type] = {}
+def read_phaseshortgaincal_data_tables(inp_path, **kwargs):
+    '''
+    Read in the short phase gain txt files per antenna. See `read_caltables`.
+    '''
+    return read_caltables(inp_path, families=['phaseshortgaincal'], **kwargs)['phaseshortgaincal']
 
-    phaseshort_tab_names = glob(f"{inp_path}/*finalphasegaincal_time_phase*.txt")
 
-    # Sort by SPW and create a text
-    ant_nums = [int(tab.rstrip(".txt").split("ant")[1]) for tab in phaseshort_tab_names]
+def read_ampgaincal_time_data_tables(inp_path, **kwargs):
+    '''
+    Read in the amp gain vs. time txt files per antenna. See `read_caltables`.
+    '''
+    return read_caltables(inp_path, families=['ampgaincal_time'], **kwargs)['ampgaincal_time']
 
-    for ant in ant_nums:
 
-        # There aren't many to loop through.
-        for ant_name in phaseshort_tab_names:
+def read_ampgaincal_freq_data_tables(inp_path, **kwargs):
+    '''
+    Read in the amp gain vs. freq txt files per antenna. See `read_caltables`.
+    '''
+    return read_caltables(inp_path, families=['ampgaincal_freq'], **kwargs)['ampgaincal_freq']
 
-            if f"_ant{ant}.txt" in ant_name:
-                break
 
-        phase_out = read_casa_txt(ant_name)
+def read_phasegaincal_data_tables(inp_path, **kwargs):
+    '''
+    Read in the phase gain txt files per antenna. See `read_caltables`.
+    '''
+    return read_caltables(inp_path, families=['phasegaincal'], **kwargs)['phasegaincal']
 
-        table_dict['phase'][ant] = phase_out[0]
 
-        meta_dict['phase'][ant] = phase_out[1]
+# Columns and dtypes of the flagging fraction txt files. These have no header.
+# The frequency tables are all floats, as from np.loadtxt.
+flagfrac_freq_columns = {'spw': np.float64, 'channel': np.float64, 'freq': np.float64,
+                         'frac': np.float64}
+# The field is left to the reader as it can be the field number or name. The SPW
+# is left to the reader as well, so it is an integer unless written as e.g. "0.0".
+flagfrac_uvdist_columns = {'field': None, 'spw': None, 'uvdist': np.float64,
+                           'frac': np.float64}
 
-    return table_dict, meta_dict
 
+def read_numeric_txt(filename, columns, use_cache=True, cache_dir=None,
+                     refresh_cache=False, signature=None):
+    '''
+    Read a whitespace-delimited txt file without a header into a table using the
+    pandas C parser. `columns` is a dict of column name -> dtype (None to let the
+    parser choose). Uses the same binary cache as `read_casa_txt`.
+    '''
 
-def read_flagfrac_freq_data_tables(inp_path):
+    if use_cache and not refresh_cache:
+        out = load_cached_table(filename, cache_dir=cache_dir, signature=signature)
+        if out is not None:
+            return out[0]
 
-    table_dict = dict()
+    colnames = list(columns.keys())
+    dtypes = {colname: dtype for colname, dtype in columns.items() if dtype is not None}
 
-    template_name = '_flagfrac_freq.txt'
+    try:
+        # round_trip matches the values from np.loadtxt exactly.
+        df = pd.read_csv(filename, sep=r'\s+', names=colnames, header=None,
+                         dtype=dtypes, engine='c', comment='#',
+                         float_precision='round_trip')
+    except pd.errors.EmptyDataError:
+        return Table(names=colnames,
+                     dtype=[float if dtype is None else dtype for dtype in columns.values()])
 
-    flagfrac_tab_names = glob(f"{inp_path}/*{template_name}")
+    tab = Table()
+    for colname in colnames:
+        values = df[colname].to_numpy()
 
-    for tab_filename in flagfrac_tab_names:
+        if values.dtype.kind == 'O':
+            values = values.astype(str)
 
-        field_name = os.path.basename(tab_filename).split(template_name)[0].split('field_')[1]
+        tab.add_column(values, name=colname, copy=False)
 
-        data = np.loadtxt(tab_filename)
+    if use_cache:
+        write_cached_table(filename, tab, {}, cache_dir=cache_dir, signature=signature)
 
-        colnames = ['spw', 'channel', 'freq', 'frac']
+    return tab
 
-        table_dict[field_name] = Table(data, names=colnames)
 
-    return table_dict
+def read_flagfrac_data_tables(inp_path, tab_type, columns, use_cache=True,
+                              cache_dir=None, refresh_cache=False, file_index=None,
+                              read_workers=None):
+    '''
+    Read the "field_{fieldname}_{tab_type}.txt" flagging fraction files for all
+    fields in parallel. Returns a dict of field name -> table.
+    '''
 
+    if file_index is None:
+        file_index = build_field_txt_index(inp_path)
 
-def read_flagfrac_uvdist_data_tables(inp_path):
+    if read_workers is None:
+        read_workers = default_read_workers()
 
-    table_dict = dict()
+    file_infos = {fieldname: field_dict[tab_type][None]
+                  for fieldname, field_dict in file_index.items()
+                  if None in field_dict.get(tab_type, {})}
 
-    template_name = '_flagfrac_uvdist.txt'
+    def read_flagfrac_table(file_info):
+        return read_numeric_txt(file_info['path'], columns, use_cache=use_cache,
+                                cache_dir=cache_dir, refresh_cache=refresh_cache,
+                                signature=index_signature(file_info))
 
-    flagfrac_tab_names = glob(f"{inp_path}/*{template_name}")
+    if read_workers == 1 or len(file_infos) <= 1:
+        tables = [read_flagfrac_table(file_info) for file_info in file_infos.values()]
+    else:
+        with ThreadPoolExecutor(max_workers=read_workers) as executor:
+            tables = list(executor.map(read_flagfrac_table, file_infos.values()))
 
-    for tab_filename in flagfrac_tab_names:
+    return dict(zip(file_infos.keys(), tables))
 
-        field_name = os.path.basename(tab_filename).split(template_name)[0].split('field_')[1]
 
-        colnames = ['field', 'spw', 'uvdist', 'frac']
+def read_flagfrac_freq_data_tables(inp_path, **kwargs):
+    '''
+    Read the flagging fraction vs. frequency tables per field. See
+    `read_flagfrac_data_tables`.
+    '''
+    return read_flagfrac_data_tables(inp_path, 'flagfrac_freq', flagfrac_freq_columns,
+                                     **kwargs)
 
-        table_dict[field_name] = Table.read(tab_filename, names=colnames, format='ascii')
 
-    return table_dict
+def read_flagfrac_uvdist_data_tables(inp_path, **kwargs):
+    '''
+    Read the flagging fraction vs. uv-distance tables per field. See
+    `read_flagfrac_data_tables`.
+    '''
+    return read_flagfrac_data_tables(inp_path, 'flagfrac_uvdist', flagfrac_uvdist_columns,
+                                     **kwargs)
@@ -0,0 +1,154 @@
+'''
+Run a set of stages that depend on each other as a small dependency graph.
+
+Each stage is a function with its keyword arguments and the names of the stages
+that have to finish first. Stages whose dependencies are done run at the same
+time in a process pool, up to a fixed number of workers.
+'''
+
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from .instrument import (measure, start_instrumentation, stop_instrumentation,
+                         instrumentation_enabled, add_records)
+
+
+def stage_order(stages):
+    '''
+    Return the stage names in an order where every stage comes after its
+    dependencies. Raises a ValueError for unknown dependencies or cycles.
+    '''
+
+    for name, (_, _, depends_on) in stages.items():
+        for dep in depends_on:
+            if dep not in stages:
+                raise ValueError(f"Stage {name} depends on unknown stage {dep}.")
+
+    order = []
+    done = set()
+
+    while len(order) < len(stages):
+        ready = [name for name, (_, _, depends_on) in stages.items()
+                 if name not in done and all(dep in done for dep in depends_on)]
+
+        if len(ready) == 0:
+            remaining = [name for name in stages if name not in done]
+            raise ValueError(f"Stages {remaining} have circular dependencies.")
+
+        order.extend(ready)
+        done.update(ready)
+
+    return order
+
+
+def _timed_call(name, func, kwargs):
+    '''
+    Call `func` and return the wall time in seconds.
+    '''
+
+    t0 = time.perf_counter()
+
+    with measure('stage', name):
+        func(**kwargs)
+
+    return time.perf_counter() - t0
+
+
+def _stage_worker(name, func, kwargs, instrument=False):
+    '''
+    Run a stage in a pool process. Returns the wall time and the instrumentation
+    records from the stage.
+    '''
+
+    # Forked workers start with a copy of the parent's records, so always reset.
+    if instrument:
+        start_instrumentation()
+    else:
+        stop_instrumentation()
+
+    wall_time = _timed_call(name, func, kwargs)
+
+    return wall_time, stop_instrumentation()
+
+
+def run_stages(stages, max_workers=1):
+    '''
+    Run a dependency graph of stages.
+
+    Parameters
+    ----------
+    stages : dict
+        Stage name -> (function, kwargs dict, list of stage names it depends on).
+        The functions and kwargs need to be picklable when `max_workers` > 1.
+    max_workers : int, optional
+        Number of stages to run at the same time. With 1, the stages run one
+        after another in this process.
+
+    Returns
+    -------
+    stage_times : dict
+        Wall time in seconds for each stage, in the order the stages finished.
+    '''
+
+    order = stage_order(stages)
+
+    stage_times = {}
+
+    if max_workers is None or max_workers <= 1:
+        for name in order:
+            func, kwargs, _ = stages[name]
+
+            print(f"Starting stage {name}")
+            stage_times[name] = _timed_call(name, func, kwargs)
+
+        return stage_times
+
+    instrument = instrumentation_enabled()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+
+        running = {}
+
+        def submit_ready():
+            for name in order:
+                if name in stage_times or name in running.values():
+                    continue
+
+                if len(running) >= max_workers:
+                    break
+
+                func, kwargs, depends_on = stages[name]
+
+                if all(dep in stage_times for dep in depends_on):
+                    print(f"Starting stage {name}")
+                    future = executor.submit(_stage_worker, name, func, kwargs,
+                                             instrument=instrument)
+                    running[future] = name
+
+        submit_ready()
+
+        while len(running) > 0:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name = running.pop(future)
+
+                # Raise on the first failure. Leaving the executor waits for the
+                # running stages; the others are never started.
+                stage_times[name], records = future.result()
+
+                add_records(records)
+
+            submit_ready()
+
+    return stage_times
+
+
+def print_stage_times(stage_times):
+    '''
+    Print the wall time of each stage.
+    '''
+
+    print("Stage wall times:")
+    for name, wall_time in stage_times.items():
+        print(f"  {name}: {wall_time:.1f} s")
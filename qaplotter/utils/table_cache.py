@@ -0,0 +1,177 @@
+'''
+Persistent binary cache for the parsed CASA txt tables.
+
+The first read of a plotms txt export saves the parsed table as a structured
+numpy array (.npy) with a small JSON file holding the meta-data dict and the
+size and mtime of the source file. Later reads memory-map the .npy file
+when the source file is unchanged.
+
+The cache lives outside of the products folder. The default location is
+~/.cache/qaplotter, which can be changed with the QAPLOTTER_CACHE_DIR
+environment variable or the `cache_dir` keyword.
+'''
+
+import os
+import json
+import shutil
+import hashlib
+import warnings
+
+import numpy as np
+from astropy.table import Table
+
+osjoin = os.path.join
+
+# Bump when the layout of the cached files changes so old entries are ignored.
+CACHE_VERSION = 3
+
+DEFAULT_CACHE_DIR = osjoin(os.path.expanduser("~"), ".cache", "qaplotter")
+
+
+def get_cache_dir(cache_dir=None):
+    '''
+    Return the cache directory. Order of precedence is the `cache_dir` keyword,
+    the QAPLOTTER_CACHE_DIR environment variable, then ~/.cache/qaplotter.
+    '''
+
+    if cache_dir is None:
+        cache_dir = os.environ.get("QAPLOTTER_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+    return cache_dir
+
+
+def cache_filenames(filename, cache_dir=None):
+    '''
+    Names of the .npy and .json cache files for `filename`. The full path is hashed
+    so that tracks with identical txt file names do not collide.
+    '''
+
+    path_hash = hashlib.sha1(os.path.abspath(filename).encode()).hexdigest()[:16]
+
+    cache_root = osjoin(get_cache_dir(cache_dir),
+                        f"{os.path.basename(filename)}.{path_hash}")
+
+    return f"{cache_root}.npy", f"{cache_root}.json"
+
+
+def source_signature(filename):
+    '''
+    Size and mtime of the source file used to check if a cache entry is stale.
+    '''
+
+    stat = os.stat(filename)
+
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def load_cached_table(filename, cache_dir=None, signature=None):
+    '''
+    Return the cached (Table, meta_dict) for `filename`, or None when there is no
+    valid entry. A `signature` from an earlier stat call (e.g. from the
+    directory index) avoids another stat of the source file.
+    '''
+
+    if signature is None:
+        signature = source_signature(filename)
+
+    npy_name, json_name = cache_filenames(filename, cache_dir=cache_dir)
+
+    if not os.path.exists(npy_name) or not os.path.exists(json_name):
+        return None
+
+    try:
+        with open(json_name, 'r') as f:
+            cache_info = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cache_info.get('version') != CACHE_VERSION:
+        return None
+
+    if cache_info.get('signature') != signature:
+        return None
+
+    # Copy-on-write so in-place changes to the table never touch the cache file.
+    # A truncated .npy file (e.g. from a full disk) fails to map.
+    try:
+        data = np.load(npy_name, mmap_mode='c')
+    except (OSError, ValueError):
+        return None
+
+    tab = Table(data, copy=False)
+
+    # Categories of the integer-coded text columns. See `categorical`.
+    if len(cache_info['categories']) > 0:
+        tab.meta['categories'] = {colname: np.array(categories, dtype=str)
+                                  for colname, categories in cache_info['categories'].items()}
+
+    return tab, cache_info['meta']
+
+
+def write_cached_table(filename, tab, meta_dict, cache_dir=None, signature=None):
+    '''
+    Save a parsed table and its meta-data dict to the cache. Failures to write
+    only raise a warning.
+    '''
+
+    # Masks are not kept in the .npy format. These only appear for malformed
+    # txt files, so just skip caching them.
+    if tab.has_masked_columns:
+        return
+
+    if signature is None:
+        signature = source_signature(filename)
+
+    npy_name, json_name = cache_filenames(filename, cache_dir=cache_dir)
+
+    cache_info = {'version': CACHE_VERSION,
+                  'source': os.path.abspath(filename),
+                  'signature': signature,
+                  'meta': meta_dict,
+                  'categories': {colname: [str(val) for val in categories]
+                                 for colname, categories in
+                                 tab.meta.get('categories', {}).items()}}
+
+    try:
+        os.makedirs(os.path.dirname(npy_name), exist_ok=True)
+
+        # Write to temporary names first so a partial write is never read.
+        # np.save appends .npy if missing, so keep that suffix on the temp name.
+        tmp_npy_name = f"{npy_name[:-4]}.tmp{os.getpid()}.npy"
+        tmp_json_name = f"{json_name}.tmp{os.getpid()}"
+
+        np.save(tmp_npy_name, tab.as_array())
+
+        with open(tmp_json_name, 'w') as f:
+            json.dump(cache_info, f)
+
+        os.replace(tmp_npy_name, npy_name)
+        os.replace(tmp_json_name, json_name)
+
+    except OSError as exc:
+        warnings.warn(f"Unable to write cache for {filename}: {exc}")
+
+
+def clear_cache(cache_dir=None):
+    '''
+    Remove all cached tables.
+    '''
+
+    cache_dir = get_cache_dir(cache_dir)
+
+    if os.path.exists(cache_dir):
+        shutil.rmtree(cache_dir)
+
+
+def invalidate_cache(filenames, cache_dir=None):
+    '''
+    Remove the cache entries for the given txt files.
+    '''
+
+    if isinstance(filenames, str):
+        filenames = [filenames]
+
+    for filename in filenames:
+        for cache_name in cache_filenames(filename, cache_dir=cache_dir):
+            if os.path.exists(cache_name):
+                os.remove(cache_name)
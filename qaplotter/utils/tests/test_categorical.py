@@ -0,0 +1,51 @@
+
+import numpy as np
+from astropy.table import Table
+
+from ..categorical import (encode_categorical_columns, decode_column, group_rows,
+                           merge_categories)
+
+
+def test_group_rows():
+
+    tab = Table({'spw': [1, 0, 1, 0, 1], 'corr': ['LL', 'RR', 'RR', 'RR', 'LL'],
+                 'y': [0., 1., 2., 3., 4.]})
+    encode_categorical_columns(tab)
+
+    sorted_tab, groups = group_rows(tab, ['spw', 'corr'])
+
+    # Grouped by the codes of the corr column: LL -> 0, RR -> 1
+    assert list(groups.keys()) == [(0, 1), (1, 0), (1, 1)]
+
+    # The rows keep their order within each group.
+    np.testing.assert_array_equal(sorted_tab['y'][groups[0, 1]], [1., 3.])
+    np.testing.assert_array_equal(sorted_tab['y'][groups[1, 0]], [0., 4.])
+    np.testing.assert_array_equal(sorted_tab['y'][groups[1, 1]], [2.])
+
+    np.testing.assert_array_equal(decode_column(sorted_tab, 'corr'),
+                                  ['RR', 'RR', 'LL', 'LL', 'RR'])
+
+
+def test_group_rows_empty():
+
+    tab = Table({'spw': np.array([], dtype=int), 'y': np.array([])})
+
+    sorted_tab, groups = group_rows(tab, ['spw'])
+
+    assert len(sorted_tab) == 0
+    assert groups == {}
+
+
+def test_merge_categories():
+
+    tab1 = Table({'ant1name': ['ea02', 'ea05', 'ea02']})
+    tab2 = Table({'ant1name': ['ea01', 'ea05']})
+    encode_categorical_columns(tab1)
+    encode_categorical_columns(tab2)
+
+    all_codes, all_categories = merge_categories([tab1, tab2], 'ant1name')
+
+    np.testing.assert_array_equal(all_categories, ['ea01', 'ea02', 'ea05'])
+
+    np.testing.assert_array_equal(all_categories[all_codes[0]], ['ea02', 'ea05', 'ea02'])
+    np.testing.assert_array_equal(all_categories[all_codes[1]], ['ea01', 'ea05'])
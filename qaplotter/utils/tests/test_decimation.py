@@ -0,0 +1,129 @@
+
+import numpy as np
+import pytest
+
+from ..decimation import bin_extremes, MinMaxDecimator, ReservoirSample
+
+
+def test_bin_extremes():
+
+    rng = np.random.default_rng(0)
+
+    x = rng.random(10000)
+    y = rng.normal(size=10000)
+    y[1234] = 100.
+    y[4321] = -100.
+    y[50] = np.nan
+
+    keep = bin_extremes(x, y, 300)
+
+    assert len(keep) <= 300
+    assert np.all(np.diff(keep) > 0)
+
+    # The outliers are always kept and the NaN point is dropped.
+    assert 1234 in keep
+    assert 4321 in keep
+    assert 50 not in keep
+
+
+def test_bin_extremes_few_points():
+
+    keep = bin_extremes(np.arange(10.), np.arange(10.), 300)
+
+    np.testing.assert_array_equal(keep, np.arange(10))
+
+
+def test_minmax_decimator():
+
+    rng = np.random.default_rng(1)
+
+    y = rng.normal(size=5000)
+    y[2500] = 50.
+
+    decimator = MinMaxDecimator(100)
+
+    # Add in chunks, as the streaming reader does.
+    rows = np.arange(len(y))
+    for start in range(0, len(y), 700):
+        decimator.add({'y': y[start:start + 700], 'row': rows[start:start + 700]})
+
+    result = decimator.result()
+
+    assert len(result['y']) <= 100
+    assert 2500 in result['row']
+    assert y.min() in result['y']
+
+    np.testing.assert_array_equal(result['y'], y[result['row']])
+
+
+def test_reservoir_sample():
+
+    sample = ReservoirSample(50)
+
+    for start in range(0, 1000, 300):
+        rows = np.arange(start, min(start + 300, 1000))
+        sample.add({'row': rows, 'y': 2. * rows})
+
+    result = sample.result()
+
+    assert len(result['row']) == 50
+    assert len(np.unique(result['row'])) == 50
+    np.testing.assert_array_equal(result['y'], 2. * result['row'])
+
+    # Fewer rows than the sample size keeps them all.
+    sample = ReservoirSample(50)
+    sample.add({'row': np.arange(20)})
+
+    np.testing.assert_array_equal(np.sort(sample.result()['row']), np.arange(20))
+
+
+def expected_minmax_rows(y, max_rows):
+    '''
+    Indices of the rows `MinMaxDecimator` keeps from `y` once all of it is added:
+    the first smallest and last largest value in each bin of the final size.
+    '''
+
+    max_bins = max(max_rows // 2, 1)
+
+    bin_rows = 1
+    while (len(y) - 1) // bin_rows + 1 > max_bins:
+        bin_rows *= 2
+
+    keep = []
+    for start in range(0, len(y), bin_rows):
+        bin_y = y[start:start + bin_rows]
+
+        keep.append(start + np.argmin(bin_y))
+        keep.append(start + len(bin_y) - 1 - np.argmax(bin_y[::-1]))
+
+    return np.unique(keep), bin_rows
+
+
+@pytest.mark.parametrize(('nrows', 'max_rows', 'chunk_rows'),
+                         [(5000, 100, 700), (5000, 100, 1), (4096, 64, 4096),
+                          (1001, 37, 13), (50, 100, 7), (3, 2, 1)])
+def test_minmax_decimator_bin_extremes(nrows, max_rows, chunk_rows):
+
+    rng = np.random.default_rng(2)
+
+    y = rng.normal(size=nrows)
+    rows = np.arange(nrows)
+
+    decimator = MinMaxDecimator(max_rows)
+
+    for start in range(0, nrows, chunk_rows):
+        decimator.add({'y': y[start:start + chunk_rows], 'row': rows[start:start + chunk_rows]})
+
+        # Never more than max_rows, also while the bins are growing.
+        assert len(decimator.result()['row']) <= max_rows
+
+    keep, bin_rows = expected_minmax_rows(y, max_rows)
+
+    # The bins doubled in size as rows were added, and the rows kept are still
+    # the true extremes of each bin after merging pairs of the smaller bins.
+    assert decimator.bin_rows == bin_rows
+
+    result = decimator.result()
+
+    np.testing.assert_array_equal(np.sort(result['row']), keep)
+    np.testing.assert_array_equal(result['y'], y[result['row']])
@@ -0,0 +1,22 @@
+
+import pytest
+
+from ..file_index import parse_field_txt_name
+
+
+@pytest.mark.parametrize(('filename', 'expected'),
+                         [("field_3C286_amp_chan.txt", ("3C286", "amp_chan", None)),
+                          ("/data/field_3C286_amp_time.scan_12.txt", ("3C286", "amp_time", 12)),
+                          # Field names with underscores
+                          ("field_NGC_253_phase_uvdist.txt", ("NGC_253", "phase_uvdist", None)),
+                          ("field_M31_ampresid_uvwave.txt", ("M31", "ampresid_uvwave", None)),
+                          # Other tables with the name_type1_type2 format
+                          ("field_J0000+0000_flagfrac_freq.txt",
+                           ("J0000+0000", "flagfrac_freq", None)),
+                          ("field_3C286_amp_chan.scan_x.txt", None),
+                          ("field__amp_chan.txt", None),
+                          ("3C286_amp_chan.txt", None),
+                          ("field_3C286_amp_chan.png", None)])
+def test_parse_field_txt_name(filename, expected):
+
+    assert parse_field_txt_name(filename) == expected
@@ -0,0 +1,67 @@
+
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+from astropy.coordinates import EarthLocation
+import astropy.units as u
+
+from ..hover import customdata_ref, time_ref, stack_customdata
+
+
+def test_stack_customdata_typed_array():
+
+    columns = []
+    customdata_ref(columns, np.array([1, 2, 300]))
+    customdata_ref(columns, np.array([0, 1, 2]))
+
+    customdata = stack_customdata(columns)
+
+    assert customdata.dtype == np.int16
+    assert customdata.shape == (3, 2)
+
+    customdata_ref(columns, np.array([1.5, 2.25, 3.]))
+
+    customdata = stack_customdata(columns)
+
+    assert customdata.dtype == np.float64
+    np.testing.assert_array_equal(customdata[:, 0], [1, 2, 300])
+    np.testing.assert_array_equal(customdata[:, 2], [1.5, 2.25, 3.])
+
+    # Written as a binary typed array, not a list per point.
+    fig = go.Figure(go.Scatter(x=[0, 1, 2], y=[0, 1, 2], customdata=customdata))
+    trace = json.loads(fig.to_json())['data'][0]
+    assert trace['customdata']['dtype'] == 'f8'
+    assert 'bdata' in trace['customdata']
+
+
+def test_stack_customdata_text():
+
+    columns = []
+    customdata_ref(columns, np.array([1, 2]))
+    customdata_ref(columns, np.array(['ant1', 'ant2']))
+
+    customdata = stack_customdata(columns)
+
+    assert customdata.dtype == object
+    assert customdata[1, 1] == 'ant2'
+
+
+def test_time_ref(monkeypatch):
+
+    # The UTC times do not depend on the site, so avoid downloading the sites.
+    vla = EarthLocation.from_geodetic(-107.6 * u.deg, 34.08 * u.deg, 2124 * u.m)
+    monkeypatch.setattr(EarthLocation, 'of_site', lambda name: vla)
+
+    columns = []
+
+    # 2021/01/01/00:00:05.3 and 00:00:07.96 in MJD seconds
+    time_mjd = np.array([59215 * 86400. + 5.3, 59215 * 86400. + 7.96])
+
+    template = time_ref(columns, time_mjd)
+
+    assert template == "2021/01/01/00:00:05 + %{customdata[0]:.1f} s"
+    assert len(columns) == 1
+
+    # Cut to 0.1 s
+    np.testing.assert_allclose(columns[0], [0.3, 2.9])
@@ -0,0 +1,117 @@
+
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from .. import instrument
+from ..instrument import (start_instrumentation, stop_instrumentation, measure,
+                          summarize_records, current_rss)
+
+
+MB = 1024**2
+
+
+def allocate_and_free(nbytes, hold=0.):
+    data = np.ones(nbytes // 8)
+    time.sleep(hold)
+    del data
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'),
+                    reason="Memory is read from /proc/self")
+def test_measure_rss():
+
+    start_instrumentation()
+
+    try:
+        with measure('figure', 'large'):
+            data = np.ones(64 * MB // 8)
+
+        with measure('figure', 'small'):
+            pass
+
+    finally:
+        records = stop_instrumentation()
+
+    del data
+
+    large, small = records
+
+    assert large['rss_end'] - large['rss_start'] == large['rss_delta']
+
+    assert large['rss_delta'] > 32 * MB
+    assert abs(small['rss_delta']) < 32 * MB
+
+    assert large['peak_rss'] >= large['rss_end']
+    assert small['peak_rss'] >= small['rss_end']
+
+    summary = summarize_records(records)['figure']
+
+    assert summary['count'] == 2
+    assert summary['max_rss_delta'] == large['rss_delta']
+    assert summary['max_peak_rss'] == max(large['peak_rss'], small['peak_rss'])
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'),
+                    reason="Memory is read from /proc/self")
+def test_measure_peak_rss():
+
+    start_instrumentation()
+
+    try:
+        with measure('stage', 'outer'):
+
+            # Freed before the block ends, so only the peak shows it.
+            with measure('figure', 'large'):
+                allocate_and_free(256 * MB)
+
+            with measure('figure', 'small'):
+                pass
+
+    finally:
+        records = stop_instrumentation()
+
+    large, small, outer = records
+
+    assert abs(large['rss_delta']) < 64 * MB
+    assert large['peak_rss'] - large['rss_start'] > 192 * MB
+
+    # Each block has its own peak, not the largest of the process so far.
+    assert small['peak_rss'] < large['peak_rss'] - 192 * MB
+
+    # The peak of an inner block counts towards the blocks around it.
+    assert outer['peak_rss'] >= large['peak_rss']
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'),
+                    reason="Memory is read from /proc/self")
+def test_measure_peak_rss_sampled(monkeypatch):
+
+    # As when /proc/self/clear_refs cannot be written.
+    monkeypatch.setattr(instrument, '_hwm_resettable', False)
+
+    start_instrumentation()
+
+    try:
+        with measure('figure', 'large'):
+            allocate_and_free(256 * MB, hold=0.2)
+
+    finally:
+        records = stop_instrumentation()
+
+    large, = records
+
+    assert large['peak_rss'] - large['rss_start'] > 192 * MB
+
+
+def test_measure_off():
+
+    assert current_rss() is None or current_rss() > 0
+
+    # Nothing is recorded unless started.
+    with measure('figure', 'name'):
+        pass
+
+    assert stop_instrumentation() == []
@@ -0,0 +1,43 @@
+
+import os
+
+from ..manifest import (input_signatures, make_entry, is_up_to_date, load_manifest,
+                        save_manifest)
+
+
+def test_is_up_to_date(tmp_path):
+
+    output_folder = str(tmp_path / "products")
+    os.makedirs(output_folder)
+
+    txt_name = tmp_path / "field_3C286_amp_chan.txt"
+    txt_name.write_text("1 2 3\n")
+
+    (tmp_path / "products" / "3C286.html").write_text("")
+
+    inputs = input_signatures([str(txt_name)])
+    options = {'max_points_per_panel': None, 'corrs': ['RR', 'LL']}
+
+    manifest = load_manifest(output_folder)
+    manifest['figures']['3C286'] = make_entry(inputs, options, ['3C286.html'])
+    save_manifest(output_folder, manifest)
+
+    manifest = load_manifest(output_folder)
+
+    assert is_up_to_date(manifest, '3C286', inputs, options, output_folder)
+
+    # Unknown entry
+    assert not is_up_to_date(manifest, 'M31', inputs, options, output_folder)
+
+    # Different options
+    assert not is_up_to_date(manifest, '3C286', inputs, dict(options, corrs=['XX', 'YY']),
+                             output_folder)
+
+    # The input changed size
+    txt_name.write_text("1 2 3\n4 5 6\n")
+    assert not is_up_to_date(manifest, '3C286', input_signatures([str(txt_name)]), options,
+                             output_folder)
+
+    # The output is gone
+    os.remove(tmp_path / "products" / "3C286.html")
+    assert not is_up_to_date(manifest, '3C286', inputs, options, output_folder)
@@ -0,0 +1,152 @@
+
+import numpy as np
+
+from ..read_data import (read_casa_txt, read_casa_txt_fast, read_casa_txt_astropy,
+                         read_casa_txt_streaming, concatenate_tables,
+                         read_flagfrac_freq_data_tables, read_flagfrac_uvdist_data_tables)
+from ..categorical import decode_column, rename_categorical_column
+from .test_decimation import expected_minmax_rows
+from ...tests.helpers import write_plotms_txt
+
+
+def test_fast_and_astropy_readers_agree(tmp_path):
+
+    filename = write_plotms_txt(tmp_path / "field_3C286_amp_time.txt", 50)
+
+    tab_fast, meta_fast = read_casa_txt_fast(filename)
+    tab_astropy, meta_astropy = read_casa_txt_astropy(filename)
+
+    assert meta_fast == meta_astropy
+    assert meta_fast['vis'] == 'synthetic.ms'
+
+    # All of the data rows, including the first ones after the header.
+    assert len(tab_fast) == 50
+    assert len(tab_astropy) == 50
+
+    assert tab_fast.colnames == tab_astropy.colnames
+    assert tab_fast.meta['categories'].keys() == tab_astropy.meta['categories'].keys()
+
+    for colname, categories in tab_fast.meta['categories'].items():
+        np.testing.assert_array_equal(categories, tab_astropy.meta['categories'][colname])
+
+    for colname in tab_fast.colnames:
+        np.testing.assert_array_equal(tab_fast[colname], tab_astropy[colname])
+
+
+def test_flagfrac_dtypes(tmp_path):
+
+    # Whole numbers can be written as floats.
+    (tmp_path / "field_3C286_flagfrac_freq.txt").write_text("0.0 1.0 1.25 0.5\n1 2 1.3 0.1\n")
+    (tmp_path / "field_3C286_flagfrac_uvdist.txt").write_text("3C286 0 10.5 0.5\n"
+                                                              "3C286 1 12 0.1\n")
+
+    tab_freq = read_flagfrac_freq_data_tables(str(tmp_path), use_cache=False)['3C286']
+
+    # All floats, as from np.loadtxt.
+    assert all(tab_freq[colname].dtype == np.float64 for colname in tab_freq.colnames)
+    np.testing.assert_array_equal(tab_freq['spw'], [0, 1])
+    np.testing.assert_array_equal(tab_freq['channel'], [1, 2])
+
+    tab_uvdist = read_flagfrac_uvdist_data_tables(str(tmp_path), use_cache=False)['3C286']
+
+    assert tab_uvdist['field'].dtype.kind == 'U'
+    assert tab_uvdist['spw'].dtype.kind == 'i'
+    np.testing.assert_array_equal(tab_uvdist['uvdist'], [10.5, 12.])
+
+
+def test_concatenate_tables(tmp_path):
+
+    # Different antennas and correlations in each table.
+    tab1, _ = read_casa_txt_fast(write_plotms_txt(tmp_path / "a.txt", 30, nant=4, seed=1))
+    tab2, _ = read_casa_txt_fast(write_plotms_txt(tmp_path / "b.txt", 20, nant=8, seed=2,
+                                                  corrs=['LL']))
+    empty_tab = tab1[:0]
+
+    tab = concatenate_tables([tab1, empty_tab, tab2])
+
+    assert len(tab) == 50
+    assert tab.colnames == tab1.colnames
+
+    for colname in tab.colnames:
+        np.testing.assert_array_equal(decode_column(tab, colname),
+                                      np.concatenate([decode_column(tab1, colname),
+                                                      decode_column(tab2, colname)]))
+
+    # CASA 6.6 names the corr column "poln".
+    rename_categorical_column(tab2, 'corr', 'poln')
+
+    tab = concatenate_tables([tab1, tab2])
+
+    assert 'poln' not in tab.colnames
+    np.testing.assert_array_equal(decode_column(tab, 'corr')[30:], ['LL'] * 20)
+
+    # Tables with different columns fall back to vstack.
+    tab2.remove_column('obs')
+
+    tab = concatenate_tables([tab1, tab2])
+
+    assert len(tab) == 50
+    np.testing.assert_array_equal(decode_column(tab, 'ant2name'),
+                                  np.concatenate([decode_column(tab1, 'ant2name'),
+                                                  decode_column(tab2, 'ant2name')]))
+    assert tab['obs'].mask[30:].all()
+    assert not tab['obs'].mask[:30].any()
+
+
+def test_streaming_small_file(tmp_path):
+
+    filename = str(write_plotms_txt(tmp_path / "field_3C286_amp_time.txt", 300))
+
+    tab, meta_dict = read_casa_txt(filename, use_cache=False)
+
+    # Fewer rows than one chunk and than max_rows per group keeps every row.
+    for method in ['minmax', 'reservoir']:
+        stream_tab, stream_meta = read_casa_txt_streaming(filename, method=method)
+
+        assert stream_meta == meta_dict
+        assert stream_tab.colnames == tab.colnames
+        assert stream_tab.meta['categories'].keys() == tab.meta['categories'].keys()
+
+        for colname, categories in tab.meta['categories'].items():
+            np.testing.assert_array_equal(stream_tab.meta['categories'][colname], categories)
+
+        for colname in tab.colnames:
+            assert stream_tab[colname].dtype == tab[colname].dtype
+            np.testing.assert_array_equal(stream_tab[colname], tab[colname])
+
+
+def test_streaming_minmax_per_group(tmp_path):
+
+    filename = str(write_plotms_txt(tmp_path / "field_3C286_amp_time.txt", 3000, nspw=3,
+                                    corrs=['RR', 'RL', 'LR', 'LL']))
+
+    tab, _ = read_casa_txt_fast(filename)
+
+    max_rows = 40
+
+    # Many chunks, so the bins of each group double several times.
+    stream_tab, _ = read_casa_txt_streaming(filename, max_rows=max_rows, chunk_rows=97)
+
+    corr = decode_column(tab, 'corr')
+    stream_corr = decode_column(stream_tab, 'corr')
+
+    ngroups = 0
+
+    for spw in np.unique(tab['spw']):
+        for corr_name in np.unique(corr):
+
+            group = tab[(tab['spw'] == spw) & (corr == corr_name)]
+            stream_group = stream_tab[(stream_tab['spw'] == spw) & (stream_corr == corr_name)]
+
+            assert len(group) > max_rows
+            assert len(stream_group) <= max_rows
+
+            # The true smallest and largest y of each bin in the group.
+            keep, _ = expected_minmax_rows(np.asarray(group['y']), max_rows)
+
+            for colname in ['x', 'y', 'time', 'ant1', 'ant2', 'scan']:
+                np.testing.assert_array_equal(stream_group[colname], group[colname][keep])
+
+            ngroups += 1
+
+    assert ngroups == 12
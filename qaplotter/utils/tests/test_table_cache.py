@@ -0,0 +1,59 @@
+
+import os
+
+import numpy as np
+
+from ..read_data import read_casa_txt_fast
+from ..table_cache import load_cached_table, write_cached_table, invalidate_cache
+from ...tests.helpers import write_plotms_txt
+
+
+def test_table_cache_round_trip(tmp_path):
+
+    cache_dir = str(tmp_path / "cache")
+
+    filename = str(write_plotms_txt(tmp_path / "field_3C286_amp_chan.txt", 40))
+
+    assert load_cached_table(filename, cache_dir=cache_dir) is None
+
+    tab, meta_dict = read_casa_txt_fast(filename)
+
+    write_cached_table(filename, tab, meta_dict, cache_dir=cache_dir)
+
+    cached_tab, cached_meta = load_cached_table(filename, cache_dir=cache_dir)
+
+    assert cached_meta == meta_dict
+    assert cached_tab.colnames == tab.colnames
+
+    for colname in tab.colnames:
+        assert cached_tab[colname].dtype == tab[colname].dtype
+        np.testing.assert_array_equal(cached_tab[colname], tab[colname])
+
+    for colname, categories in tab.meta['categories'].items():
+        np.testing.assert_array_equal(cached_tab.meta['categories'][colname], categories)
+
+    # Changing the table in memory does not change the cache file.
+    cached_tab['y'][:] = -1.
+    np.testing.assert_array_equal(load_cached_table(filename, cache_dir=cache_dir)[0]['y'],
+                                  tab['y'])
+
+    invalidate_cache(filename, cache_dir=cache_dir)
+
+    assert load_cached_table(filename, cache_dir=cache_dir) is None
+
+
+def test_table_cache_stale(tmp_path):
+
+    cache_dir = str(tmp_path / "cache")
+
+    filename = str(write_plotms_txt(tmp_path / "field_3C286_amp_chan.txt", 40))
+
+    tab, meta_dict = read_casa_txt_fast(filename)
+    write_cached_table(filename, tab, meta_dict, cache_dir=cache_dir)
+
+    # A newer source file makes the entry stale.
+    write_plotms_txt(filename, 41)
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert load_cached_table(filename, cache_dir=cache_dir) is None
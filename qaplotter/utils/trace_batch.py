@@ -0,0 +1,72 @@
+'''
+Build the traces of a subplot figure as dicts and add them in one step.
+
+`fig.append_trace(go.Scattergl(...), row=row, col=col)` validates every
+property of the trace and looks up the subplot axes on each call. The figures
+here have hundreds to thousands of traces, so `TraceBatch` keeps each trace as a
+plain dict with the axis references of its subplot and makes the figure with all
+of the traces at the end.
+'''
+
+import plotly.graph_objects as go
+
+
+class TraceBatch(object):
+    '''
+    Collect the traces for the subplots of `fig`, a figure from `make_subplots`.
+
+    Parameters
+    ----------
+    fig : plotly.graph_objects.Figure
+        Figure with the subplot layout.
+    scatter_plot : plotly trace class, optional
+        Trace type to make, e.g. `go.Scattergl` or `go.Scatter`.
+    '''
+
+    def __init__(self, fig, scatter_plot=go.Scattergl):
+
+        self.fig = fig
+        self.trace_type = scatter_plot().type
+
+        self.traces = []
+
+        # (row, col) -> dict(xaxis=..., yaxis=...)
+        self._axis_refs = {}
+
+    def axis_refs(self, row, col):
+        '''
+        The `xaxis` and `yaxis` references (e.g. "x3", "y3") of the subplot in
+        `row` and `col`, counting from 1 like `append_trace`.
+        '''
+
+        if (row, col) not in self._axis_refs:
+            subplot = self.fig.get_subplot(row, col)
+
+            self._axis_refs[row, col] = \
+                dict(xaxis=subplot.xaxis.plotly_name.replace('axis', ''),
+                     yaxis=subplot.yaxis.plotly_name.replace('axis', ''))
+
+        return self._axis_refs[row, col]
+
+    def append(self, row, col, **trace_kwargs):
+        '''
+        Add a trace with the properties in `trace_kwargs` to the subplot in `row`
+        and `col`. The trace is added to the figure by `figure`.
+        '''
+
+        self.traces.append(dict(type=self.trace_type, **trace_kwargs,
+                                **self.axis_refs(row, col)))
+
+    def figure(self, validate=False):
+        '''
+        Return a new figure with the layout and subplot grid of `fig` and all of
+        the traces, in the order they were appended. With `validate=False`,
+        plotly does not check the trace properties.
+        '''
+
+        # The subplot grid is carried over the same way plotly does when
+        # pickling a figure, so `update_xaxes(row=..., col=...)` still works.
+        return go.Figure(dict(data=self.traces, layout=self.fig.layout,
+                              _grid_str=self.fig._grid_str,
+                              _grid_ref=self.fig._grid_ref),
+                         _validate=validate)
@@ -0,0 +1,172 @@
+'''
+Lazy, memoized access to the per-field txt tables of a track.
+'''
+
+from collections import OrderedDict
+
+from .read_data import read_field_data_tables
+from .instrument import measure
+from .file_index import build_field_txt_index, index_fieldnames, index_signature
+
+
+class TrackDataset(object):
+    '''
+    Load the per-field tables of a track on first use and keep them in memory so
+    each txt file is parsed at most once per run. One instance is shared by
+    `make_field_plots` and the target summary figures.
+
+    When the tables in memory exceed `max_bytes`, the least recently used fields
+    are dropped and will be read again if requested.
+
+    Parameters
+    ----------
+    folder : str
+        Folder with the per-field txt files (e.g. "scan_plots_txt").
+    max_bytes : int, optional
+        Memory cap for the loaded tables. Use None for no limit.
+    use_cache : bool, optional
+        Use the binary table cache. See `read_casa_txt`.
+    cache_dir : str, optional
+        Location of the binary table cache.
+    read_workers : int, optional
+        Threads used to read per-scan txt files. See `read_field_data_tables`.
+    file_index : dict, optional
+        Output of `build_field_txt_index` for `folder`. Created when not given.
+    compact_dtypes : bool, optional
+        Downcast the numeric columns when reading. See `compact_table`.
+    stream_above : int, optional
+        Reduce txt files larger than this many bytes while reading. See
+        `read_casa_txt_streaming`.
+    stream_kwargs : dict, optional
+        Keyword arguments for `read_casa_txt_streaming`.
+    preview_rows : int, optional
+        Reduce the tables to at most this many rows per SPW and correlation for
+        the preview figures. See `decimate_table`.
+    '''
+
+    def __init__(self, folder, max_bytes=4 * 1024**3, use_cache=True, cache_dir=None,
+                 read_workers=None, file_index=None, compact_dtypes=False,
+                 stream_above=None, stream_kwargs=None, preview_rows=None):
+
+        self.folder = folder
+        self.max_bytes = max_bytes
+
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+        self.read_workers = read_workers
+        self.compact_dtypes = compact_dtypes
+        self.stream_above = stream_above
+        self.stream_kwargs = stream_kwargs
+        self.preview_rows = preview_rows
+
+        if file_index is None:
+            file_index = build_field_txt_index(folder)
+        self.file_index = file_index
+
+        # fieldname -> (table_dict, meta_dict, nbytes), oldest first.
+        self._fields = OrderedDict()
+        self._nbytes = 0
+
+        # Count the reads from disk for checking that fields are not re-read.
+        self.nreads = {}
+
+    @property
+    def fieldnames(self):
+        '''
+        Sorted names of the fields with data in `folder`.
+        '''
+        return index_fieldnames(self.file_index)
+
+    @property
+    def nbytes(self):
+        '''
+        Memory used by the tables currently held.
+        '''
+        return self._nbytes
+
+    def txt_filenames(self, fieldname=None):
+        '''
+        Paths to all txt files, or only those for `fieldname`.
+        '''
+
+        if fieldname is None:
+            field_dicts = self.file_index.values()
+        else:
+            field_dicts = [self.file_index.get(fieldname, {})]
+
+        return [file_info['path']
+                for field_dict in field_dicts
+                for scan_dict in field_dict.values()
+                for file_info in scan_dict.values()]
+
+    def input_signatures(self, fieldname):
+        '''
+        Dict of path -> size and mtime for the txt files of `fieldname`, taken
+        from the index. See `manifest`.
+        '''
+
+        return {file_info['path']: index_signature(file_info)
+                for scan_dict in self.file_index.get(fieldname, {}).values()
+                for file_info in scan_dict.values()}
+
+    def read_field(self, fieldname):
+        '''
+        Return the (table_dict, meta_dict) for `fieldname`, reading from disk only
+        if the field is not already in memory.
+
+        The tables are shared between callers and should not be changed in place.
+        '''
+
+        if fieldname in self._fields:
+            self._fields.move_to_end(fieldname)
+            table_dict, meta_dict, _ = self._fields[fieldname]
+            return table_dict, meta_dict
+
+        with measure('read', fieldname):
+            table_dict, meta_dict = read_field_data_tables(fieldname, self.folder,
+                                                           use_cache=self.use_cache,
+                                                           cache_dir=self.cache_dir,
+                                                           file_index=self.file_index,
+                                                           read_workers=self.read_workers,
+                                                           compact_dtypes=self.compact_dtypes,
+                                                           stream_above=self.stream_above,
+                                                           stream_kwargs=self.stream_kwargs,
+                                                           preview_rows=self.preview_rows)
+
+        self.nreads[fieldname] = self.nreads.get(fieldname, 0) + 1
+
+        nbytes = sum(tab_data[colname].nbytes
+                     for tab_data in table_dict.values()
+                     for colname in tab_data.colnames)
+
+        self._fields[fieldname] = (table_dict, meta_dict, nbytes)
+        self._nbytes += nbytes
+
+        self._evict(keep=fieldname)
+
+        return table_dict, meta_dict
+
+    def _evict(self, keep=None):
+        '''
+        Drop the least recently used fields until under `max_bytes`.
+        '''
+
+        if self.max_bytes is None:
+            return
+
+        for fieldname in list(self._fields.keys()):
+            if self._nbytes <= self.max_bytes:
+                break
+
+            if fieldname == keep:
+                continue
+
+            self._nbytes -= self._fields.pop(fieldname)[2]
+
+    def clear(self):
+        '''
+        Drop all tables from memory.
+        '''
+
+        self._fields.clear()
+        self._nbytes = 0
@@ -0,0 +1,253 @@
+'''
+Make the QA plots for a track while the pipeline is still writing its products.
+
+The product folders are listed every `poll_interval` seconds. The txt files of
+each field and of each caltable family are followed separately, and the
+quicklook images as one group. Once the files of a field or family have stopped
+changing for `settle_time` seconds and it passes a completeness check, its stage
+of `make_all_plots` is run with `incremental=True` for the fields or families
+that are ready, so only their new or changed figures are remade (see
+`manifest`). A field that is still being written does not hold back the others.
+'''
+
+import os
+import time
+import warnings
+
+from .utils.manifest import path_signature
+from .utils.file_index import (build_field_txt_index, index_fieldnames, field_tab_types,
+                               build_caltable_txt_index, select_caltable_files,
+                               caltable_specs, index_signature)
+from .quicklook_target_imaging import quicklook_image_names
+from .track_set import make_all_plots, join_full_resolution
+
+
+def folder_snapshot(folder):
+    '''
+    Dict of name -> size and mtime for the entries in `folder`, or None if the
+    folder does not exist.
+    '''
+
+    if not os.path.isdir(folder):
+        return None
+
+    snapshot = {}
+
+    with os.scandir(folder) as entries:
+        for entry in entries:
+
+            if entry.name.startswith("."):
+                continue
+
+            try:
+                snapshot[entry.name] = path_signature(entry.path)
+            except OSError:
+                # Removed or renamed while listing. The next poll will see it.
+                continue
+
+    return snapshot
+
+
+def field_units(folder):
+    '''
+    Dict of field -> (snapshot, complete) for the fields with txt files in
+    `folder`. The snapshot is the size and mtime of each of the field's files.
+    A field is complete once it has the txt files for a target (3 tables) or a
+    calibrator (8 or 10 tables) and any of them has data.
+    '''
+
+    file_index = build_field_txt_index(folder)
+
+    fields_with_data = index_fieldnames(file_index)
+
+    units = {}
+
+    for field, field_dict in file_index.items():
+        snapshot = {file_info['path']: index_signature(file_info)
+                    for scan_dict in field_dict.values()
+                    for file_info in scan_dict.values()}
+
+        ntables = sum(tab_type in field_dict for tab_type in field_tab_types)
+
+        units[field] = (snapshot, ntables in [3, 8, 10] and field in fields_with_data)
+
+    return units
+
+
+def caltable_units(folder):
+    '''
+    Dict of caltable family -> (snapshot, complete) for the families with txt
+    files in `folder`. A family is complete when each of its table types (i.e.,
+    bandpass amp and phase) has files for the same SPWs or antennas.
+    '''
+
+    file_index = build_caltable_txt_index(folder)
+
+    units = {}
+
+    for family, family_index in file_index.items():
+        snapshot = {file_info['path']: index_signature(file_info)
+                    for type_dict in family_index.values()
+                    for number_dict in type_dict.values()
+                    for file_info in number_dict.values()}
+
+        tab_files = select_caltable_files(family_index, caltable_specs[family])
+
+        numbers = [set(number_dict) for number_dict in tab_files.values()]
+
+        complete = (all(len(these_numbers) > 0 for these_numbers in numbers) and
+                    all(these_numbers == numbers[0] for these_numbers in numbers[1:]))
+
+        units[family] = (snapshot, complete)
+
+    return units
+
+
+def quicklook_units(folder):
+    '''
+    The quicklook images are followed as one group: {"quicklook": (snapshot,
+    complete)}, complete when there are any images. Empty if `folder` does
+    not exist.
+    '''
+
+    snapshot = folder_snapshot(folder)
+
+    if snapshot is None:
+        return {}
+
+    return {'quicklook': (snapshot, len(quicklook_image_names(folder)) > 0)}
+
+
+def watch_track(folder_fields="scan_plots_txt",
+                folder_cals="final_caltable_txt",
+                folder_qlimg="quicklook_imaging",
+                poll_interval=30,
+                settle_time=120,
+                max_idle=3600,
+                stop_filename=None,
+                **plot_kwargs):
+    '''
+    Watch the product folders of a track and make the QA plots for each folder
+    as its files finish writing. Run from within the products folder, like
+    `make_all_plots`.
+
+    Parameters
+    ----------
+    folder_fields : str, optional
+        Folder where the txt files per field are written.
+    folder_cals : str, optional
+        Folder where the caltable txt files are written.
+    folder_qlimg : str, optional
+        Folder where the quicklook images are written.
+    poll_interval : float, optional
+        Seconds between listings of the folders.
+    settle_time : float, optional
+        Seconds without any change to the files of a field, caltable family or
+        the quicklook images before their plots are made. Files that are still
+        being written change size or mtime between listings.
+    max_idle : float, optional
+        Stop after this many seconds without changes once everything that is
+        complete has been plotted. None to watch until interrupted.
+    stop_filename : str, optional
+        Stop once this file exists (e.g. written by the pipeline when it finishes)
+        and everything that is complete has been plotted.
+    plot_kwargs : dict
+        Passed to `make_all_plots`.
+    '''
+
+    product_folders = {'field plots': folder_fields,
+                       'cal plots': folder_cals,
+                       'quicklook images': folder_qlimg}
+
+    unit_checks = {'field plots': field_units,
+                   'cal plots': caltable_units,
+                   'quicklook images': quicklook_units}
+
+    # (stage, field or family) -> the latest snapshot, when it last changed and
+    # the snapshot the plots were last made from.
+    snapshots = {}
+    last_change = {}
+    plotted = {}
+
+    last_activity = time.monotonic()
+
+    while True:
+
+        now = time.monotonic()
+
+        # Stage -> fields or families that have settled and are complete.
+        ready = {}
+        stages_to_run = []
+
+        # Whether any files changed within `settle_time`.
+        settling = False
+
+        for name, folder in product_folders.items():
+
+            ready[name] = []
+
+            for unit, (snapshot, complete) in unit_checks[name](folder).items():
+
+                key = (name, unit)
+
+                if snapshot != snapshots.get(key):
+                    snapshots[key] = snapshot
+                    last_change[key] = now
+                    last_activity = now
+                    settling = True
+                    continue
+
+                if now - last_change[key] < settle_time:
+                    settling = True
+                    continue
+
+                # Incomplete ones wait for more files.
+                if not complete:
+                    continue
+
+                ready[name].append(unit)
+
+                if snapshot != plotted.get(key) and name not in stages_to_run:
+                    stages_to_run.append(name)
+
+        if len(stages_to_run) > 0:
+
+            for name in stages_to_run:
+                print(f"Making {name} for {', '.join(ready[name])}")
+
+            try:
+                stage_times = make_all_plots(folder_fields=folder_fields,
+                                             folder_cals=folder_cals,
+                                             folder_qlimg=folder_qlimg,
+                                             incremental=True,
+                                             only_stages=['manual flagging log', 'homepage']
+                                             + stages_to_run,
+                                             only_fields=ready['field plots'],
+                                             only_families=ready['cal plots'],
+                                             **plot_kwargs)
+
+                # Finish a background full resolution pass before the next
+                # update can write to the same folders.
+                if isinstance(stage_times, tuple):
+                    join_full_resolution(stage_times[1])
+            except Exception as exc:
+                warnings.warn(f"Unable to make {', '.join(stages_to_run)}. "
+                              f"Raise exception {exc}")
+
+            # Failed stages are only tried again when their files change.
+            for name in stages_to_run:
+                for unit in ready[name]:
+                    plotted[name, unit] = snapshots[name, unit]
+
+            last_activity = time.monotonic()
+
+        elif not settling:
+            if stop_filename is not None and os.path.exists(stop_filename):
+                print(f"Found {stop_filename}. Stopping.")
+                break
+
+            if max_idle is not None and time.monotonic() - last_activity > max_idle:
+                print(f"No changes for {max_idle} s. Stopping.")
+                break
+
+        time.sleep(poll_interval)